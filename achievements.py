@@ -0,0 +1,116 @@
+"""Achievement registry and metric-driven progress engine.
+
+Every achievement is tied to one metric (total study minutes, gacha rolls,
+level, ...) and a goal. Events report metric values and the engine updates
+all achievements for that metric with a single UPDATE, so the cost of an
+event depends on the number of metrics it touches, not on how many
+achievements exist.
+"""
+from collections import namedtuple
+
+Achievement = namedtuple("Achievement", "name description metric goal")
+
+# Metrics. "Absolute" ones are reported as the current value (record);
+# counters are reported as increments (bump).
+SESSION_COUNT = "session_count"        # completed study sessions
+TOTAL_MINUTES = "total_minutes"        # minutes studied, all time
+TOTAL_CRYSTALS = "total_crystals"      # crystals earned from study, all time
+SESSIONS_60 = "sessions_60min"         # sessions of 60+ minutes
+SESSIONS_90 = "sessions_90min"         # sessions of 90+ minutes
+LEVEL = "level"
+ROLL_COUNT = "roll_count"              # gacha rolls performed
+TOTAL_ITEMS = "total_items"            # inventory rows owned
+UNIQUE_ITEMS = "unique_items"          # distinct item ids owned
+GOLD_ITEMS = "gold_items"              # gold-rarity items pulled
+ITEMS_USED = "items_used"              # items activated
+STREAK_DAYS = "streak_days"            # consecutive study days
+
+REGISTRY = [
+    # Beginner
+    Achievement('First Study', 'Complete your first study session', SESSION_COUNT, 1),
+    Achievement('Getting Started', 'Study for 30 minutes total', TOTAL_MINUTES, 30),
+    Achievement('First Roll', 'Perform your first gacha roll', ROLL_COUNT, 1),
+    Achievement('First Item', 'Acquire your first item', TOTAL_ITEMS, 1),
+    Achievement('Quick Start', 'Complete 3 study sessions', SESSION_COUNT, 3),
+
+    # Study time
+    Achievement('Study Rookie', 'Study for 1 hour total', TOTAL_MINUTES, 60),
+    Achievement('Study Novice', 'Study for 2 hours total', TOTAL_MINUTES, 120),
+    Achievement('Study Apprentice', 'Study for 5 hours total', TOTAL_MINUTES, 300),
+    Achievement('Study Warrior', 'Study for 10 hours total', TOTAL_MINUTES, 600),
+    Achievement('Study Expert', 'Study for 20 hours total', TOTAL_MINUTES, 1200),
+    Achievement('Study Master', 'Study for 50 hours total', TOTAL_MINUTES, 3000),
+    Achievement('Study Grandmaster', 'Study for 75 hours total', TOTAL_MINUTES, 4500),
+    Achievement('Study Legend', 'Study for 100 hours total', TOTAL_MINUTES, 6000),
+    Achievement('Study Mythic', 'Study for 150 hours total', TOTAL_MINUTES, 9000),
+    Achievement('Study God', 'Study for 200 hours total', TOTAL_MINUTES, 12000),
+
+    # Crystals
+    Achievement('Pocket Change', 'Earn 100 crystals', TOTAL_CRYSTALS, 100),
+    Achievement('Crystal Collector', 'Earn 1000 crystals', TOTAL_CRYSTALS, 1000),
+    Achievement('Crystal Hoarder', 'Earn 5000 crystals', TOTAL_CRYSTALS, 5000),
+    Achievement('Crystal Tycoon', 'Earn 10000 crystals', TOTAL_CRYSTALS, 10000),
+    Achievement('Crystal Magnate', 'Earn 25000 crystals', TOTAL_CRYSTALS, 25000),
+    Achievement('Crystal Emperor', 'Earn 50000 crystals', TOTAL_CRYSTALS, 50000),
+
+    # Gacha
+    Achievement('Gacha Beginner', 'Perform 10 gacha rolls', ROLL_COUNT, 10),
+    Achievement('Gacha Enthusiast', 'Perform 25 gacha rolls', ROLL_COUNT, 25),
+    Achievement('Gacha Master', 'Perform 50 gacha rolls', ROLL_COUNT, 50),
+    Achievement('Gacha Addict', 'Perform 100 gacha rolls', ROLL_COUNT, 100),
+    Achievement('Gacha Legend', 'Perform 250 gacha rolls', ROLL_COUNT, 250),
+
+    # Level
+    Achievement('Level 5', 'Reach level 5', LEVEL, 5),
+    Achievement('Level 10', 'Reach level 10', LEVEL, 10),
+    Achievement('Level 25', 'Reach level 25', LEVEL, 25),
+    Achievement('Level 50', 'Reach level 50', LEVEL, 50),
+    Achievement('Level 100', 'Reach level 100', LEVEL, 100),
+
+    # Collection
+    Achievement('Collector', 'Own 5 different items', UNIQUE_ITEMS, 5),
+    Achievement('Hoarder', 'Own 15 items total', TOTAL_ITEMS, 15),
+    Achievement('Item Master', 'Own 25 items total', TOTAL_ITEMS, 25),
+    Achievement('Treasure Hunter', 'Own all 6 unique items', UNIQUE_ITEMS, 6),
+
+    # Special
+    Achievement('Lucky Strike', 'Get a gold rarity item from gacha', GOLD_ITEMS, 1),
+    Achievement('Marathon Runner', 'Complete a 60 minute study session', SESSIONS_60, 1),
+    Achievement('Ultra Marathon', 'Complete a 90 minute study session', SESSIONS_90, 1),
+    Achievement('Power User', 'Activate an item 10 times', ITEMS_USED, 10),
+    Achievement('Consistency King', 'Study for 7 consecutive days', STREAK_DAYS, 7),
+]
+
+BY_NAME = {a.name: a for a in REGISTRY}
+METRICS = sorted({a.metric for a in REGISTRY})
+
+
+def rows_for(uid):
+    """(user_id, name, description, metric, goal) rows for seeding a user."""
+    return [(uid, a.name, a.description, a.metric, a.goal) for a in REGISTRY]
+
+
+def record(x, uid, values, now):
+    """Set progress for absolute metrics: one UPDATE per metric in ``values``.
+
+    Achievements whose goal is reached are marked completed (completed_at is
+    only stamped the first time). A completed achievement's progress never
+    goes down, e.g. when items it counted are used up.
+    """
+    for metric, v in values.items():
+        x.execute('''UPDATE achievements
+                     SET completed_at=CASE WHEN completed=0 AND goal<=? THEN ? ELSE completed_at END,
+                         completed=CASE WHEN goal<=? THEN 1 ELSE completed END,
+                         progress=CASE WHEN completed=1 THEN MAX(progress, ?) ELSE ? END
+                     WHERE user_id=? AND metric=?''', (v, now, v, v, v, uid, metric))
+
+
+def bump(x, uid, increments, now):
+    """Add to counter metrics: one UPDATE per metric in ``increments``."""
+    for metric, n in increments.items():
+        if not n: continue
+        x.execute('''UPDATE achievements
+                     SET completed_at=CASE WHEN completed=0 AND goal<=progress+? THEN ? ELSE completed_at END,
+                         completed=CASE WHEN goal<=progress+? THEN 1 ELSE completed END,
+                         progress=progress+?
+                     WHERE user_id=? AND metric=?''', (n, now, n, n, uid, metric))
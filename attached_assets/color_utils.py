@@ -1,7 +1,14 @@
 
 from PIL import Image
+from collections import OrderedDict
 import colorsys
 
+# Optional: array recolor engine (recolor_parts falls back to the per-pixel reference)
+try:
+    import numpy as np
+except Exception:
+    np = None
+
 def hex_to_rgb(h):
     h = h.lstrip("#")
     return tuple(int(h[i:i+2], 16) for i in (0,2,4))
@@ -34,8 +41,74 @@ def recolor_preserve_shade(img, mask, base_mean_rgb, target_rgb):
                 factor = Lp / L0
                 newL = max(0.0, min(1.0, factor * Lt))
                 # reuse target hue/sat, set luminance
-                r,g,b,a = set_luma(target_rgb+(255,), newL)
+                r,g,b,a = set_luma(target_rgb[:3], newL)
                 q[x,y] = (r,g,b, px[3])
     img = img.copy()
     img.alpha_composite(out)
     return img
+
+def _shade(rgb, L0, Lt, target_rgb):
+    # recolor_preserve_shade's per-pixel colour, for one source colour
+    newL = max(0.0, min(1.0, lum(rgb) / L0 * Lt))
+    return set_luma(target_rgb[:3], newL)[:3]
+
+# (base mean, target) -> {packed source rgb: recoloured rgb}, most recent last
+_LUTS = OrderedDict()
+LUT_LIMIT = 64
+
+def _lut(base_mean_rgb, target_rgb):
+    key = (tuple(base_mean_rgb[:3]), tuple(target_rgb[:3]))
+    lut = _LUTS.get(key)
+    if lut is None:
+        lut = _LUTS[key] = {}
+        while len(_LUTS) > LUT_LIMIT:
+            _LUTS.popitem(last=False)
+    else:
+        _LUTS.move_to_end(key)
+    return lut
+
+def _over(new_rgb, dst):
+    """PIL's alpha_composite of (new_rgb, dst alpha) over dst, in integer math."""
+    a = dst[:, 3].astype(np.uint32)
+    outa255 = a*255 + a*(255-a)
+    coef1 = a*(255*255*128) // np.maximum(outa255, 1)
+    coef2 = 255*128 - coef1
+    tmp = new_rgb*coef1[:, None] + dst[:, :3].astype(np.uint32)*coef2[:, None] + (0x80 << 7)
+    out = np.empty_like(dst)
+    out[:, :3] = ((((tmp >> 8) + tmp) >> 8) >> 7)
+    t = outa255 + 0x80
+    out[:, 3] = ((t >> 8) + t) >> 8
+    return np.where((a == 0)[:, None], dst, out)
+
+def recolor_parts(img, parts):
+    """recolor_preserve_shade for each (mask, base_mean_rgb, target_rgb) in order, in one array pass.
+
+    Sprites use few distinct colours, so each masked region is reduced to its
+    unique source colours, which are looked up in a per-(mean, target) table
+    filled with the reference per-pixel math; the result is pixel-identical
+    to chaining recolor_preserve_shade."""
+    if np is None:
+        for mask, mean, target in parts:
+            img = recolor_preserve_shade(img, mask, mean, tuple(target))
+        return img
+    if img.mode != "RGBA": img = img.convert("RGBA")
+    px = np.array(img)
+    for mask, mean, target in parts:
+        target = tuple(target)
+        sel = np.asarray(mask) > 0
+        if not sel.any(): continue
+        src = px[sel]
+        packed = (src[:, 0].astype(np.uint32) << 16) | (src[:, 1].astype(np.uint32) << 8) | src[:, 2]
+        uniq, inv = np.unique(packed, return_inverse=True)
+        lut = _lut(mean, target)
+        L0 = max(1e-4, lum(mean))
+        Lt = lum(target)
+        rows = []
+        for k in uniq.tolist():
+            c = lut.get(k)
+            if c is None:
+                c = lut[k] = _shade(((k >> 16) & 255, (k >> 8) & 255, k & 255), L0, Lt, target)
+            rows.append(c)
+        new = np.array(rows, dtype=np.uint32)[inv.reshape(-1)]
+        px[sel] = _over(new, src)
+    return Image.fromarray(px, "RGBA")
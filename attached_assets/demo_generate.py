@@ -8,8 +8,9 @@ variants = [
     ("male",   {"hair_color":"#1E1E1E","skin_color":"#E3BFA3","shirt_color":"#9CA3AF","pants_color":"#7B8794","shoes_color":"#434C5E"}),
 ]
 
-for i,(sex, ap) in enumerate(variants, start=1):
-    r = SpriteRendererRef(sex=sex)
-    img = r.render(ap)
-    img.save(f"sample_{i}_{sex}.png")
-print("Wrote sample sprites.")
+if __name__ == "__main__":
+    for i,(sex, ap) in enumerate(variants, start=1):
+        r = SpriteRendererRef(sex=sex)
+        img = r.render(ap)
+        img.save(f"sample_{i}_{sex}.png")
+    print("Wrote sample sprites.")
@@ -1,9 +1,38 @@
 
 from PIL import Image, ImageDraw, ImageStat, ImageFilter
-import os
-from color_utils import hex_to_rgb, recolor_preserve_shade
+import os, hashlib
+from color_utils import hex_to_rgb, recolor_parts
 
 ASSETS_DIR = os.path.join(os.path.dirname(__file__), "assets")
+MASK_CACHE_DIR = os.environ.get("SPRITE_MASK_CACHE") or os.path.join(os.path.dirname(os.path.abspath(__file__)), ".mask_cache")
+
+# Optional: all region masks in one array pass (falls back to the per-pixel reference)
+try:
+    import numpy as np
+except Exception:
+    np = None
+
+# Use the app's shared asset index when the package is importable
+try:
+    from studysaga.assets import index_for
+except Exception:
+    index_for = None
+
+# Shared layer memo and render cache, likewise optional
+try:
+    from studysaga.render_cache import LAYERS, RENDERS, render_key, file_stamp
+except Exception:
+    LAYERS = RENDERS = None
+try:
+    from studysaga.atlas import atlas_for
+except Exception:
+    atlas_for = None
+
+def _asset_path(name, ext=".png"):
+    if index_for is not None:
+        p = index_for(ASSETS_DIR).find(name, (ext,))
+        if p: return p
+    return os.path.join(ASSETS_DIR, name + ext)
 
 SEED_BOXES = {
     "female": {
@@ -30,6 +59,13 @@ def crop_mean(img, box):
     r,g,b,a = [int(v) for v in stat.mean]
     return (r,g,b,255)
 
+def region_tol(part):
+    return 40 if part == "skin" else 52
+
+def _finish_mask(mask):
+    mask = mask.filter(ImageFilter.BLUR)
+    return mask.point(lambda v: 255 if v>100 else 0)
+
 def make_mask_by_similarity(base, mean_rgb, tol=52):
     if base.mode != "RGBA": base = base.convert("RGBA")
     w,h = base.size
@@ -44,17 +80,84 @@ def make_mask_by_similarity(base, mean_rgb, tol=52):
             dist = ((r-mr)**2 + (g-mg)**2 + (b-mb)**2) ** 0.5
             if dist < tol:
                 q[x,y] = 255
-    mask = mask.filter(ImageFilter.BLUR)
-    mask = mask.point(lambda v: 255 if v>100 else 0)
-    return mask
+    return _finish_mask(mask)
+
+def make_masks_vectorized(base, means, tols):
+    """make_mask_by_similarity for every region in `means` in one NumPy pass.
+
+    Compares squared integer distances against tol**2, so for integer
+    tolerances (the ones used here) the masks are pixel-identical to the
+    reference; a fractional tol can only differ on pixels whose distance
+    rounds onto the boundary. BLUR + threshold still run through PIL."""
+    if base.mode != "RGBA": base = base.convert("RGBA")
+    arr = np.asarray(base)
+    parts = list(means)
+    centers = np.array([means[k][:3] for k in parts], dtype=np.int32)
+    d2 = np.zeros((len(parts),) + arr.shape[:2], dtype=np.int32)
+    for c in range(3):                      # (parts, h, w) without a (parts, h, w, 3) temporary
+        diff = arr[None, :, :, c].astype(np.int32) - centers[:, c, None, None]
+        d2 += diff * diff
+    limits = np.array([float(tols[k]) ** 2 for k in parts])[:, None, None]
+    hit = (d2 < limits) & (arr[None, :, :, 3] >= 16)
+    raw = hit.astype(np.uint8) * 255
+    return {k: _finish_mask(Image.fromarray(raw[i], "L")) for i, k in enumerate(parts)}
+
+def build_masks(base, means, tols):
+    if np is not None:
+        return make_masks_vectorized(base, means, tols)
+    return {k: make_mask_by_similarity(base, means[k], tol=tols[k]) for k in means}
+
+# Disk cache: one PNG per region under MASK_CACHE_DIR/<key>/
+def mask_cache_key(base, boxes, tols):
+    h = hashlib.sha256()
+    h.update(f"{base.mode}:{base.size}:".encode())
+    h.update(base.tobytes())
+    h.update(repr(sorted((k, tuple(boxes[k]), tols[k]) for k in boxes)).encode())
+    return h.hexdigest()[:32]
+
+def load_masks(key, parts, cache_dir=None):
+    d = os.path.join(cache_dir or MASK_CACHE_DIR, key)
+    masks = {}
+    try:
+        for k in parts:
+            with Image.open(os.path.join(d, k + ".png")) as im:
+                masks[k] = im.convert("L")
+    except (OSError, ValueError):
+        return None
+    return masks
+
+def save_masks(key, masks, cache_dir=None):
+    d = os.path.join(cache_dir or MASK_CACHE_DIR, key)
+    try:
+        os.makedirs(d, exist_ok=True)
+        for k, m in masks.items():
+            tmp = os.path.join(d, f".{k}.{os.getpid()}.tmp")
+            m.save(tmp, "PNG")
+            os.replace(tmp, os.path.join(d, k + ".png"))
+    except OSError as e:
+        print("mask cache write failed:", e)
+
+def _look(ap):
+    """The parts of an appearance dict that change the rendered pixels."""
+    look = {p: ap.get(p + "_color") for p in ("hair", "skin", "shirt", "pants", "shoes", "belt") if ap.get(p + "_color")}
+    if ap.get("has_glasses", False):
+        look["glasses"] = ap.get("glasses_color", "#000000")
+    if ap.get("has_mustache", False):
+        look["mustache"] = ap.get("facial_hair_color", "#2C1B18")
+    return look
 
 class SpriteRendererRef:
-    def __init__(self, sex="female", scale=1, bg=None):
+    def __init__(self, sex="female", scale=1, bg=None, mask_cache=True):
         self.sex = sex
         self.scale = scale
         self.bg = bg
-        fn = "base_female.png" if sex=="female" else "base_male.png"
-        base = Image.open(os.path.join(ASSETS_DIR, fn)).convert("RGBA")
+        self.mask_cache = mask_cache
+        path = _asset_path("base_female" if sex=="female" else "base_male")
+        atlas = atlas_for(ASSETS_DIR) if atlas_for else None
+        base = atlas.image(os.path.basename(path)) if atlas is not None else None
+        if base is None:
+            base = LAYERS.open(path) if LAYERS else Image.open(path).convert("RGBA")
+        self._base_stamp = file_stamp(path) if RENDERS else None
         if scale != 1:
             base = base.resize((base.width*scale, base.height*scale), Image.NEAREST)
         self.base = base
@@ -64,26 +167,30 @@ class SpriteRendererRef:
     def _ensure_masks(self):
         if self._masks is not None: return
         boxes = SEED_BOXES[self.sex]
+        tols = {k: region_tol(k) for k in boxes}
         means = {k: crop_mean(self.base, box) for k,box in boxes.items()}
-        masks = {k: make_mask_by_similarity(self.base, means[k], tol=52 if k!="skin" else 40) for k in boxes.keys()}
+        key = mask_cache_key(self.base, boxes, tols) if self.mask_cache else None
+        masks = load_masks(key, boxes) if key else None
+        if masks is None:
+            masks = build_masks(self.base, means, tols)
+            if key: save_masks(key, masks)
         self._means, self._masks = means, masks
 
     def render(self, ap:dict):
-        self._ensure_masks()
-        img = self.base.copy()
+        if RENDERS is None:
+            return self._render(ap)
+        key = render_key(renderer="ref-appearance", sex=self.sex, scale=self.scale, bg=self.bg,
+                         look=_look(ap), base=self._base_stamp)
+        return RENDERS.get_or_render(key, lambda: self._render(ap))
 
-        def apply(part, hex_color):
-            nonlocal img
+    def _render(self, ap):
+        self._ensure_masks()
+        parts = []
+        for part in ("hair", "skin", "shirt", "pants", "shoes", "belt"):
+            hex_color = ap.get(part + "_color")
             if hex_color:
-                img = recolor_preserve_shade(img, self._masks[part], self._means[part][:3], hex_to_rgb(hex_color))
-
-        apply("hair",  ap.get("hair_color"))
-        apply("skin",  ap.get("skin_color"))
-        apply("shirt", ap.get("shirt_color"))
-        apply("pants", ap.get("pants_color"))
-        apply("shoes", ap.get("shoes_color"))
-        if ap.get("belt_color"):
-            apply("belt", ap.get("belt_color"))
+                parts.append((self._masks[part], self._means[part][:3], hex_to_rgb(hex_color)))
+        img = recolor_parts(self.base, parts) if parts else self.base.copy()
 
         if self.bg:
             canvas = Image.new("RGBA", img.size, self.bg)
@@ -0,0 +1,60 @@
+"""Lookups/sec of asset resolution: per-call directory scans vs. AssetIndex.
+
+    python benchmarks/bench_asset_index.py [iterations]
+
+Resolves the prefixes main.py asks for on every home/study refresh and
+gacha roll (including the chest images, which are missing here and so hit
+the slowest path). "scan" is the old _find_asset (one existence check per
+extension, then one listdir per extension); Kivy's resource_find is
+replaced by a plain os.path.exists so the benchmark runs without Kivy.
+"""
+import os, sys, time
+
+sys.path.insert(0, os.path.join(os.path.dirname(os.path.abspath(__file__)), ".."))
+from studysaga.assets import AssetIndex
+
+ASSET_DIR = os.path.join(os.path.dirname(os.path.abspath(__file__)), "..", "attached_assets")
+EXTS = (".gif", ".png", ".jpg", ".jpeg")
+PREFIXES = ["background_home", "background_female", "background_male",
+            "chest_green", "chest_purple", "chest_blue", "chest_gold"]
+
+
+def scan_find(prefix, exts=EXTS):
+    for ext in exts:
+        p = os.path.join(ASSET_DIR, f"{prefix}{ext}")
+        if os.path.exists(p):
+            return p
+    try:
+        for ext in exts:
+            for f in os.listdir(ASSET_DIR):
+                name = f.lower()
+                if name.startswith(prefix.lower()) and name.endswith(ext):
+                    return os.path.join(ASSET_DIR, f)
+    except Exception:
+        pass
+    return ""
+
+
+def _rate(fn, n):
+    t0 = time.perf_counter()
+    for _ in range(n):
+        for p in PREFIXES:
+            fn(p)
+    return n * len(PREFIXES) / (time.perf_counter() - t0)
+
+
+def main(n=2000):
+    idx = AssetIndex(ASSET_DIR)
+    for p in PREFIXES:
+        assert os.path.normpath(idx.find(p) or ".") == os.path.normpath(scan_find(p) or "."), p
+    t0 = time.perf_counter(); idx.reload(); build = time.perf_counter() - t0
+    scan = _rate(scan_find, n)
+    cached = _rate(idx.find, n)
+    print(f"index build: {build * 1e3:.2f} ms ({len(idx._names)} files)")
+    print(f"{'resolver':<12}{'lookups/s':>14}")
+    print(f"{'scan':<12}{scan:>14.0f}")
+    print(f"{'AssetIndex':<12}{cached:>14.0f}  ({cached / scan:.0f}x)")
+
+
+if __name__ == "__main__":
+    main(int(sys.argv[1]) if len(sys.argv) > 1 else 2000)
@@ -0,0 +1,62 @@
+"""Ops/sec of the db.py helpers: connect-per-call vs. the shared connection.
+
+    python benchmarks/bench_db_connections.py [iterations]
+
+Runs against a throwaway database in a temp dir; never touches studysaga.sqlite3.
+"""
+import os, sys, time, sqlite3, tempfile
+
+sys.path.insert(0, os.path.join(os.path.dirname(os.path.abspath(__file__)), ".."))
+import db as DB
+
+
+def _legacy_conn():
+    c = sqlite3.connect(DB.DB_PATH)
+    c.row_factory = sqlite3.Row
+    return c
+
+def legacy_get_user(uid):
+    c = _legacy_conn(); x = c.cursor()
+    x.execute('SELECT * FROM users WHERE id=?', (uid,))
+    r = x.fetchone(); c.close()
+    return dict(r) if r else None
+
+def legacy_update_crystals(uid, amount):
+    c = _legacy_conn(); x = c.cursor()
+    x.execute('UPDATE users SET crystals=crystals+? WHERE id=?', (amount, uid))
+    c.commit()
+    x.execute('SELECT crystals FROM users WHERE id=?', (uid,))
+    v = x.fetchone()['crystals']; c.close()
+    return v
+
+
+def _rate(fn, n):
+    t0 = time.perf_counter()
+    for _ in range(n):
+        fn()
+    return n / (time.perf_counter() - t0)
+
+
+def main(n=2000):
+    with tempfile.TemporaryDirectory() as d:
+        DB.DB_PATH = os.path.join(d, "bench.sqlite3")
+        DB.bootstrap()
+        DB.create_user("bench@example.com", "pw")
+        uid = DB.auth_user("bench@example.com", "pw")["id"]
+
+        cases = [
+            ("get_user (read)",
+             lambda: legacy_get_user(uid), lambda: DB.get_user(uid)),
+            ("update_crystals (write)",
+             lambda: legacy_update_crystals(uid, 1), lambda: DB.update_crystals(uid, 1)),
+        ]
+        print(f"{'operation':<26}{'before ops/s':>14}{'after ops/s':>14}{'speed-up':>10}")
+        for name, before, after in cases:
+            b = _rate(before, n)
+            a = _rate(after, n)
+            print(f"{name:<26}{b:>14.0f}{a:>14.0f}{a / b:>9.1f}x")
+        DB.close_connections()
+
+
+if __name__ == "__main__":
+    main(int(sys.argv[1]) if len(sys.argv) > 1 else 2000)
@@ -0,0 +1,67 @@
+"""Reader/writer throughput of db.py under each PRAGMA profile.
+
+    python benchmarks/bench_db_profiles.py [seconds] [readers]
+
+For every profile (plus SQLite's own defaults, "rollback-journal") one
+writer thread completes study sessions while reader threads load the home
+screen data, all on a fresh database in a temp dir. Prints committed writes/s
+and reads/s.
+"""
+import os, sys, time, tempfile, threading
+
+sys.path.insert(0, os.path.join(os.path.dirname(os.path.abspath(__file__)), ".."))
+import db as DB
+from studysaga.dbprofiles import PROFILES
+
+CASES = dict(PROFILES)
+CASES["rollback-journal"] = {"journal_mode": "DELETE", "synchronous": "FULL", "busy_timeout": 10000}
+
+
+def _run(profile, seconds, readers):
+    with tempfile.TemporaryDirectory() as d:
+        DB.DB_PATH = os.path.join(d, "bench.sqlite3")
+        DB.configure_profile(profile)
+        DB.bootstrap(); DB.init_items()
+        DB.create_user("bench@example.com", "pw")
+        uid = DB.auth_user("bench@example.com", "pw")["id"]
+        DB.init_achievements(uid)
+
+        stop = time.perf_counter() + seconds
+        counts = {"reads": 0, "writes": 0, "errors": 0}
+        lock = threading.Lock()
+
+        def writer():
+            n = 0
+            while time.perf_counter() < stop:
+                try:
+                    DB.complete_study_session(uid, 25); n += 1
+                except Exception:
+                    with lock: counts["errors"] += 1
+            with lock: counts["writes"] += n
+
+        def reader():
+            n = 0
+            while time.perf_counter() < stop:
+                try:
+                    DB.get_user(uid); DB.get_daily_study(uid, 7); DB.get_achievements(uid); n += 1
+                except Exception:
+                    with lock: counts["errors"] += 1
+            with lock: counts["reads"] += n
+
+        threads = [threading.Thread(target=writer)] + [threading.Thread(target=reader) for _ in range(readers)]
+        for t in threads: t.start()
+        for t in threads: t.join()
+        DB.close_connections()
+    return counts["writes"] / seconds, counts["reads"] / seconds, counts["errors"]
+
+
+def main(seconds=3.0, readers=4):
+    print(f"{'profile':<20}{'writes/s':>10}{'reads/s':>10}{'errors':>8}")
+    for name, profile in CASES.items():
+        w, r, e = _run(profile, seconds, readers)
+        print(f"{name:<20}{w:>10.0f}{r:>10.0f}{e:>8}")
+
+
+if __name__ == "__main__":
+    main(float(sys.argv[1]) if len(sys.argv) > 1 else 3.0,
+         int(sys.argv[2]) if len(sys.argv) > 2 else 4)
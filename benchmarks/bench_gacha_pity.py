@@ -0,0 +1,86 @@
+"""Rolls/sec of gacha.roll() with concurrent rollers, plus a crystal audit.
+
+    python benchmarks/bench_gacha_pity.py [rolls-per-thread]
+
+For each thread count, every thread rolls both for its own user and for one
+user shared by all threads. Afterwards every user's crystals must equal the
+starting balance minus the cost of the rolls that succeeded, inventory must
+hold exactly one copy per successful roll, no pity counter may exceed its
+limit and the crystal ledger must audit clean; the script exits 1 otherwise.
+Runs against a throwaway database in a temp dir; never touches
+studysaga.sqlite3.
+"""
+import os, sys, time, tempfile, threading
+
+sys.path.insert(0, os.path.join(os.path.dirname(os.path.abspath(__file__)), ".."))
+import db as DB
+import gacha
+
+TIER = "silver"
+START = 100_000
+
+
+def _user(email):
+    DB.create_user(email, "pw")
+    uid = DB.auth_user(email, "pw")["id"]
+    DB.init_achievements(uid)
+    DB.set_crystals(uid, START)
+    return uid
+
+
+def _audit(uid, ok):
+    u = DB.get_user(uid)
+    owned, _ = DB.inventory_counts(uid)
+    pr, pe = DB.get_pity(uid, TIER)
+    errors = []
+    if u["crystals"] != START - ok * gacha.COSTS[TIER]:
+        errors.append(f"crystals {u['crystals']} != {START - ok * gacha.COSTS[TIER]}")
+    if owned != ok:
+        errors.append(f"inventory {owned} != {ok} rolls")
+    if pr >= gacha.PITY_RARE[TIER] or pe >= gacha.PITY_EPIC[TIER]:
+        errors.append(f"pity out of range ({pr}, {pe})")
+    return errors + DB.audit_crystals(uid)
+
+
+def run(threads, n):
+    shared = _user(f"shared{threads}@example.com")
+    own = [_user(f"t{threads}-{i}@example.com") for i in range(threads)]
+    ok = {uid: 0 for uid in own + [shared]}
+    lock = threading.Lock()
+
+    def worker(uid):
+        mine = shared_ok = 0
+        for _ in range(n):
+            mine += gacha.roll(uid, TIER)[0]
+            shared_ok += gacha.roll(shared, TIER)[0]
+        with lock:
+            ok[uid] += mine
+            ok[shared] += shared_ok
+
+    ts = [threading.Thread(target=worker, args=(uid,)) for uid in own]
+    t0 = time.perf_counter()
+    for t in ts: t.start()
+    for t in ts: t.join()
+    elapsed = time.perf_counter() - t0
+    errors = [f"user {uid}: {e}" for uid, k in ok.items() for e in _audit(uid, k)]
+    return 2 * threads * n / elapsed, errors
+
+
+def main(n=200):
+    failed = 0
+    with tempfile.TemporaryDirectory() as d:
+        DB.DB_PATH = os.path.join(d, "bench.sqlite3")
+        DB.bootstrap(); DB.init_items()
+        print(f"{'threads':>8}{'rolls/s':>12}  audit")
+        for threads in (1, 2, 4, 8):
+            rate, errors = run(threads, n)
+            print(f"{threads:>8}{rate:>12.0f}  {'OK' if not errors else 'FAILED'}")
+            for e in errors:
+                print("   ", e)
+            failed += bool(errors)
+        DB.close_connections()
+    return 1 if failed else 0
+
+
+if __name__ == "__main__":
+    sys.exit(main(int(sys.argv[1]) if len(sys.argv) > 1 else 200))
@@ -0,0 +1,142 @@
+"""Frame times of the old GridLayout lists vs. the RecycleView lists.
+
+    python benchmarks/bench_list_frames.py [rows ...]      # default: 1000 10000 100000
+
+For each row count it measures, for the widget-per-row GridLayout the
+screens used to build and for a RecycleView fed through listview.apply_rows:
+  - build: time to (re)populate the list and draw the first frame
+  - frame: mean / worst frame while scrolling top to bottom
+  - update: time to refresh the list after one row's count changes
+The GridLayout case is skipped above --grid-max rows (default 10000); it
+needs minutes and gigabytes at 100k. Needs Kivy and a window (set
+KIVY_WINDOW/KIVY_GL_BACKEND for headless runs).
+"""
+import os, sys, time, argparse
+
+sys.path.insert(0, os.path.join(os.path.dirname(os.path.abspath(__file__)), ".."))
+os.environ.setdefault("KIVY_NO_ARGS", "1")
+os.environ.setdefault("KIVY_NO_CONSOLELOG", "1")
+
+from kivy.base import EventLoop
+from kivy.lang import Builder
+from kivy.metrics import dp
+from kivy.uix.boxlayout import BoxLayout
+from kivy.uix.button import Button
+from kivy.uix.gridlayout import GridLayout
+from kivy.uix.scrollview import ScrollView
+from kivy.uix.recycleview import RecycleView
+from kivy.properties import StringProperty, BooleanProperty
+from listview import apply_rows
+
+Builder.load_string('''
+<BenchRow>:
+    size_hint_y: None
+    height: dp(60)
+    spacing: dp(10)
+    Button:
+        text: root.title
+        size_hint_x: 0.78
+        opacity: 0.6 if root.active else 1
+    Button:
+        text: "Use"
+        size_hint_x: 0.20
+        disabled: root.active
+
+<BenchRV>:
+    viewclass: "BenchRow"
+    RecycleBoxLayout:
+        orientation: "vertical"
+        default_size: None, dp(60)
+        default_size_hint: 1, None
+        size_hint_y: None
+        height: self.minimum_height
+''')
+
+
+class BenchRow(BoxLayout):
+    title = StringProperty("")
+    active = BooleanProperty(False)
+
+
+class BenchRV(RecycleView):
+    pass
+
+
+def _rows(n, bump=None):
+    return [{"item_id": i, "title": f"Item {i} ({2 if i == bump else 1})\n+5% EXP · +5% Crystals",
+             "active": i % 7 == 0} for i in range(n)]
+
+
+def _frame():
+    t0 = time.perf_counter()
+    EventLoop.idle()
+    return time.perf_counter() - t0
+
+
+def _scroll(view, frames=60):
+    times = []
+    for f in range(frames + 1):
+        view.scroll_y = 1 - f / frames
+        times.append(_frame())
+    return sum(times) / len(times), max(times)
+
+
+def _grid(n):
+    """The old screens: a GridLayout in a ScrollView with two Buttons per row."""
+    sv = ScrollView()
+    grid = GridLayout(cols=1, size_hint_y=None, row_default_height=dp(60), row_force_default=True)
+    grid.bind(minimum_height=grid.setter("height"))
+    sv.add_widget(grid)
+
+    def fill(rows):
+        grid.clear_widgets()
+        for r in rows:
+            row = GridLayout(cols=2, size_hint=(1, None), height=dp(60), spacing=dp(10))
+            left = Button(text=r["title"], size_hint=(0.78, None), height=dp(58))
+            left.bind(on_release=lambda _b, item=dict(r): None)
+            use = Button(text="Use", size_hint=(0.20, None), height=dp(58), disabled=r["active"])
+            use.bind(on_release=lambda _b, i=r["item_id"]: None)
+            row.add_widget(left); row.add_widget(use)
+            grid.add_widget(row)
+    return sv, fill
+
+
+def _rv(n):
+    rv = BenchRV()
+    return rv, lambda rows: apply_rows(rv, rows, key="item_id")
+
+
+def measure(make, n):
+    win = EventLoop.window
+    view, fill = make(n)
+    win.add_widget(view)
+    t0 = time.perf_counter()
+    fill(_rows(n)); _frame()
+    build = time.perf_counter() - t0
+    mean, worst = _scroll(view)
+    t0 = time.perf_counter()
+    fill(_rows(n, bump=n // 2)); _frame()
+    update = time.perf_counter() - t0
+    win.remove_widget(view)
+    return build, mean, worst, update
+
+
+def main(argv=None):
+    ap = argparse.ArgumentParser(description="list rendering frame times")
+    ap.add_argument("rows", nargs="*", type=int, default=[1000, 10000, 100000])
+    ap.add_argument("--grid-max", type=int, default=10000)
+    args = ap.parse_args(argv)
+    EventLoop.ensure_window()
+    print(f"{'rows':>8} {'list':<12}{'build ms':>10}{'frame ms':>10}{'worst ms':>10}{'update ms':>11}")
+    for n in args.rows:
+        cases = [("RecycleView", _rv)]
+        if n <= args.grid_max:
+            cases.insert(0, ("GridLayout", _grid))
+        for name, make in cases:
+            build, mean, worst, update = measure(make, n)
+            print(f"{n:>8} {name:<12}{build * 1e3:>10.1f}{mean * 1e3:>10.2f}{worst * 1e3:>10.2f}{update * 1e3:>11.1f}")
+    EventLoop.close()
+
+
+if __name__ == "__main__":
+    main()
@@ -0,0 +1,74 @@
+"""Recolor time per avatar: chained recolor_preserve_shade vs. recolor_parts.
+
+    python benchmarks/bench_recolor.py [--scales 1 2 4] [--repeat 3]
+
+Renders the demo_generate.py variants' colour passes both ways on the same
+masks and checks the images are identical (MAX_DIFF = 0 per channel).
+"cold" is recolor_parts with empty colour tables, "warm" a repeat render
+of the same loadout. Exits 1 on a mismatch. Needs Pillow, NumPy and the
+base_<sex>.png sprites.
+"""
+import os, sys, time, argparse
+
+sys.path.insert(0, os.path.join(os.path.dirname(os.path.abspath(__file__)), "..", "attached_assets"))
+from PIL import ImageChops
+import color_utils
+from color_utils import hex_to_rgb, recolor_preserve_shade, recolor_parts
+from sprite_renderer_ref import SpriteRendererRef
+from demo_generate import variants
+
+MAX_DIFF = 0
+PARTS = ("hair", "skin", "shirt", "pants", "shoes", "belt")
+
+
+def _parts(r, ap):
+    r._ensure_masks()
+    return [(r._masks[p], r._means[p][:3], hex_to_rgb(ap[p + "_color"])) for p in PARTS if ap.get(p + "_color")]
+
+
+def _reference(base, parts):
+    img = base.copy()
+    for mask, mean, target in parts:
+        img = recolor_preserve_shade(img, mask, mean, target)
+    return img
+
+
+def _best(fn, repeat):
+    best, out = None, None
+    for _ in range(repeat):
+        t0 = time.perf_counter()
+        out = fn()
+        t = time.perf_counter() - t0
+        best = t if best is None else min(best, t)
+    return out, best
+
+
+def main(argv=None):
+    ap = argparse.ArgumentParser(description="recolor benchmark over the demo variants")
+    ap.add_argument("--scales", nargs="*", type=int, default=[1, 2, 4])
+    ap.add_argument("--repeat", type=int, default=3)
+    args = ap.parse_args(argv)
+    if color_utils.np is None:
+        sys.exit("NumPy is not installed")
+    failed = False
+    print(f"{'scale':>5} {'variant':<10}{'reference ms':>14}{'cold ms':>10}{'warm ms':>10}{'speed-up':>10}{'max diff':>10}")
+    for s in args.scales:
+        renderers = {}
+        for i, (sex, look) in enumerate(variants, start=1):
+            r = renderers.get(sex) or renderers.setdefault(sex, SpriteRendererRef(sex=sex, scale=s))
+            parts = _parts(r, look)
+            slow, t_ref = _best(lambda: _reference(r.base, parts), args.repeat)
+            color_utils._LUTS.clear()
+            _, t_cold = _best(lambda: recolor_parts(r.base, parts), 1)
+            fast, t_warm = _best(lambda: recolor_parts(r.base, parts), args.repeat)
+            diff = max(hi for _, hi in ImageChops.difference(slow, fast).getextrema())
+            failed |= diff > MAX_DIFF
+            print(f"{s:>5} {f'{i}_{sex}':<10}{t_ref * 1e3:>14.1f}{t_cold * 1e3:>10.2f}{t_warm * 1e3:>10.2f}"
+                  f"{t_ref / t_warm:>9.0f}x{diff:>10}")
+    if failed:
+        print(f"FAIL: recolor_parts differs from recolor_preserve_shade by more than {MAX_DIFF}")
+        sys.exit(1)
+
+
+if __name__ == "__main__":
+    main()
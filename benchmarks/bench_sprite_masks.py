@@ -0,0 +1,73 @@
+"""Region mask build time: per-pixel reference vs. the NumPy builder vs. the disk cache.
+
+    python benchmarks/bench_sprite_masks.py [--sex female|male] [--scales 1 2 3 4] [--image PATH]
+
+For each scale factor it builds the six region masks of SpriteRendererRef
+with make_mask_by_similarity (one Python loop per region), with
+make_masks_vectorized (one array pass) and from the disk cache, and checks
+that the vectorized masks match the reference: with the integer tolerances
+the renderer uses they must be identical (MAX_DIFF_PIXELS = 0). Exits 1 on a
+mismatch. Needs Pillow, NumPy and the base_<sex>.png sprites.
+"""
+import os, sys, time, argparse, tempfile
+
+sys.path.insert(0, os.path.join(os.path.dirname(os.path.abspath(__file__)), ".."))
+sys.path.insert(0, os.path.join(os.path.dirname(os.path.abspath(__file__)), "..", "attached_assets"))
+from PIL import Image, ImageChops
+import sprite_renderer_ref as ref
+
+MAX_DIFF_PIXELS = 0
+
+
+def _timed(fn):
+    t0 = time.perf_counter()
+    out = fn()
+    return out, time.perf_counter() - t0
+
+
+def _diff_pixels(a, b):
+    return sum(ImageChops.difference(a, b).point(lambda v: 1 if v else 0).histogram()[1:])
+
+
+def measure(base, boxes, cache_dir):
+    tols = {k: ref.region_tol(k) for k in boxes}
+    means = {k: ref.crop_mean(base, box) for k, box in boxes.items()}
+    slow, t_ref = _timed(lambda: {k: ref.make_mask_by_similarity(base, means[k], tol=tols[k]) for k in boxes})
+    fast, t_vec = _timed(lambda: ref.make_masks_vectorized(base, means, tols))
+    key = ref.mask_cache_key(base, boxes, tols)
+    ref.save_masks(key, fast, cache_dir)
+    cached, t_disk = _timed(lambda: ref.load_masks(key, boxes, cache_dir))
+    diff = max(_diff_pixels(slow[k], fast[k]) for k in boxes)
+    diff = max(diff, max(_diff_pixels(fast[k], cached[k]) for k in boxes))
+    return t_ref, t_vec, t_disk, diff
+
+
+def main(argv=None):
+    ap = argparse.ArgumentParser(description="sprite mask build benchmark")
+    ap.add_argument("--sex", choices=sorted(ref.SEED_BOXES), default="female")
+    ap.add_argument("--scales", nargs="*", type=int, default=[1, 2, 3, 4])
+    ap.add_argument("--image", help="base sprite (default: attached_assets/assets/base_<sex>.png)")
+    args = ap.parse_args(argv)
+    if ref.np is None:
+        sys.exit("NumPy is not installed")
+    path = args.image or ref._asset_path("base_" + args.sex)
+    if not os.path.exists(path):
+        sys.exit(f"base sprite not found: {path}")
+    src = Image.open(path).convert("RGBA")
+    boxes = ref.SEED_BOXES[args.sex]
+    failed = False
+    print(f"{'scale':>5}{'pixels':>10}{'reference ms':>14}{'numpy ms':>10}{'cache ms':>10}{'speed-up':>10}{'diff px':>9}")
+    with tempfile.TemporaryDirectory() as cache_dir:
+        for s in args.scales:
+            base = src if s == 1 else src.resize((src.width * s, src.height * s), Image.NEAREST)
+            t_ref, t_vec, t_disk, diff = measure(base, boxes, cache_dir)
+            failed |= diff > MAX_DIFF_PIXELS
+            print(f"{s:>5}{base.width * base.height:>10}{t_ref * 1e3:>14.1f}{t_vec * 1e3:>10.1f}"
+                  f"{t_disk * 1e3:>10.1f}{t_ref / t_vec:>9.0f}x{diff:>9}")
+    if failed:
+        print(f"FAIL: vectorized masks differ from the reference by more than {MAX_DIFF_PIXELS} pixels")
+        sys.exit(1)
+
+
+if __name__ == "__main__":
+    main()
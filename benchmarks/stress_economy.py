@@ -0,0 +1,145 @@
+"""Concurrent spend/credit stress run against both crystal stores.
+
+    python benchmarks/stress_economy.py [ops-per-thread] [threads]
+
+Every thread spends and earns crystals on one shared user, chosen so the
+balance keeps hitting zero. Afterwards, for db.py (users.crystals) and for
+studysaga.db (economy.crystals):
+  - the balance must equal start + credits - cost of the spends that succeeded
+    (no lost updates) and never be negative (no overdraft),
+  - the ledger must hold exactly one row per successful change and pass
+    Wallet.audit().
+The script exits 1 otherwise. For comparison it also runs studysaga's old
+read-check-write spend() under the same load and reports how far it
+overdrew (informational). Runs against throwaway databases in a temp dir.
+"""
+import os, sys, time, random, tempfile, threading
+
+sys.path.insert(0, os.path.join(os.path.dirname(os.path.abspath(__file__)), ".."))
+import db as DB
+from studysaga import db as SAGA
+
+START = 500
+COST = 7
+CREDIT = 5
+
+
+def legacy_spend(user_id, amount):
+    """studysaga.db.spend before the conditional debit: SELECT, compare, UPDATE."""
+    con = SAGA._get_conn(); cur = con.cursor()
+    cur.execute("SELECT crystals FROM economy WHERE user_id=?", (user_id,))
+    have = (cur.fetchone() or [0])[0]
+    if have < amount: con.close(); return False, have
+    time.sleep(0)       # let another spender in between the check and the write
+    cur.execute("UPDATE economy SET crystals = crystals - ? WHERE user_id=?", (amount, user_id))
+    con.commit(); cur.execute("SELECT crystals FROM economy WHERE user_id=?", (user_id,)); left = (cur.fetchone() or [0])[0]
+    con.close(); return True, left
+
+
+def hammer(spend, credit, threads, n):
+    """Run `threads` workers doing n random spends/credits; returns (spent_ok, credits, min_seen, seconds)."""
+    totals = {"spent": 0, "credits": 0, "min": START}
+    lock = threading.Lock()
+
+    def worker(seed):
+        rng = random.Random(seed)
+        spent = credits = 0
+        low = START
+        for _ in range(n):
+            if rng.random() < 0.7:
+                ok, left = spend(COST)
+                spent += ok
+            else:
+                left = credit(CREDIT)
+                credits += 1
+            low = min(low, left)
+        with lock:
+            totals["spent"] += spent
+            totals["credits"] += credits
+            totals["min"] = min(totals["min"], low)
+
+    ts = [threading.Thread(target=worker, args=(i,)) for i in range(threads)]
+    t0 = time.perf_counter()
+    for t in ts: t.start()
+    for t in ts: t.join()
+    return totals["spent"], totals["credits"], totals["min"], time.perf_counter() - t0
+
+
+def _check(name, balance, spent, credits, low, ledger_rows, problems):
+    expected = START + credits * CREDIT - spent * COST
+    errors = []
+    if balance != expected:
+        errors.append(f"balance {balance} != {expected} (lost updates)")
+    if low < 0 or balance < 0:
+        errors.append(f"balance went negative ({min(low, balance)})")
+    if ledger_rows != 2 + spent + credits:       # +2: the signup credit and the set_crystals row
+        errors.append(f"ledger has {ledger_rows} rows, expected {2 + spent + credits}")
+    errors += problems
+    return [f"{name}: {e}" for e in errors]
+
+
+def run_app(threads, n):
+    DB.create_user("stress@example.com", "pw")
+    uid = DB.auth_user("stress@example.com", "pw")["id"]
+    DB.set_crystals(uid, START)
+    spent, credits, low, secs = hammer(lambda a: DB.spend_crystals(uid, a, "stress"),
+                                       lambda a: DB.update_crystals(uid, a, "stress"), threads, n)
+    with DB._tx() as x:
+        x.execute(f"SELECT COUNT(*) FROM {DB.WALLET.ledger} WHERE user_id=?", (uid,))
+        rows = x.fetchone()[0]
+    return secs, _check("db.py", DB.get_user(uid)["crystals"], spent, credits, low, rows, DB.audit_crystals(uid))
+
+
+def run_saga(threads, n):
+    uid = 1
+    SAGA.set_crystals(uid, START)
+
+    def credit(a):
+        return SAGA._write(lambda cur: SAGA.WALLET.credit(cur, uid, a, "stress"))
+
+    spent, credits, low, secs = hammer(lambda a: SAGA.spend(uid, a, "stress"), credit, threads, n)
+    con = SAGA._get_conn(); cur = con.cursor()
+    cur.execute(f"SELECT COUNT(*) FROM {SAGA.WALLET.ledger} WHERE user_id=?", (uid,))
+    rows = cur.fetchone()[0]
+    problems = SAGA.WALLET.audit(cur, uid)
+    con.close()
+    return secs, _check("studysaga.db", SAGA.get_crystals(uid), spent, credits, low, rows, problems)
+
+
+def run_legacy(threads, n):
+    uid = 2
+    SAGA.set_crystals(uid, START)
+
+    def credit(a):
+        con = SAGA._get_conn()
+        con.execute("UPDATE economy SET crystals = crystals + ? WHERE user_id=?", (a, uid))
+        left = con.execute("SELECT crystals FROM economy WHERE user_id=?", (uid,)).fetchone()[0]
+        con.close()
+        return left
+
+    spent, credits, low, secs = hammer(lambda a: legacy_spend(uid, a), credit, threads, n)
+    return secs, min(low, SAGA.get_crystals(uid))
+
+
+def main(n=300, threads=8):
+    with tempfile.TemporaryDirectory() as d:
+        DB.DB_PATH = os.path.join(d, "app.sqlite3")
+        SAGA.DB_PATH = os.path.join(d, "saga.sqlite3")
+        DB.bootstrap(); SAGA.bootstrap()
+        errors = []
+        for name, fn in (("db.py", run_app), ("studysaga.db", run_saga)):
+            secs, errs = fn(threads, n)
+            print(f"{name:<14}{threads * n / secs:>10.0f} ops/s  {'OK' if not errs else 'FAILED'}")
+            errors += errs
+        secs, low = run_legacy(threads, n)
+        print(f"{'legacy spend':<14}{threads * n / secs:>10.0f} ops/s  lowest balance {low}"
+              f"{' (overdrawn)' if low < 0 else ''}")
+        DB.close_connections()
+    for e in errors:
+        print("   ", e)
+    return 1 if errors else 0
+
+
+if __name__ == "__main__":
+    args = [int(a) for a in sys.argv[1:3]]
+    sys.exit(main(*args))
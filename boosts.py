@@ -0,0 +1,113 @@
+"""In-process view of each user's active item boosts.
+
+The study screen and every session completion need the boosts that are
+active right now. BoostManager loads a user's active_items once and keeps
+them in a min-heap ordered by expires_at together with running totals, so
+reading the current EXP/crystal bonus is O(1) and expiring a boost is a
+heap pop done lazily on the next read. A user is reloaded when
+db.active_items_version() says this process activated an item for them, and
+at least every `max_age` seconds for boosts written by other processes.
+Expired rows are deleted from SQLite in batches by flush(), which start()
+runs on a background thread.
+"""
+import heapq, threading, time
+import db as DB
+
+
+class UserBoosts:
+    """One user's active boosts: a heap of (expires_at, active_items.id, row)."""
+
+    def __init__(self, rows):
+        self.heap = [(r["expires_at"], r["id"], r) for r in rows]
+        heapq.heapify(self.heap)
+        self.exp_pct = sum(r["boost_exp_pct"] or 0 for r in rows)
+        self.crystal_pct = sum(r["boost_crystal_pct"] or 0 for r in rows)
+
+    def expire(self, now):
+        """Drop boosts with expires_at <= now; returns how many were dropped."""
+        n = 0
+        while self.heap and self.heap[0][0] <= now:
+            _, _, r = heapq.heappop(self.heap)
+            self.exp_pct -= r["boost_exp_pct"] or 0
+            self.crystal_pct -= r["boost_crystal_pct"] or 0
+            n += 1
+        return n
+
+
+class BoostManager:
+    def __init__(self, max_age=30.0):
+        self.max_age = max_age
+        self._users = {}        # (DB_PATH, uid) -> (UserBoosts, active_items_version, loaded_at)
+        self._expired = {}      # (DB_PATH, uid) -> newest expires_at dropped, awaiting flush
+        self._lock = threading.Lock()
+        self._stop = None
+
+    def _user(self, uid, now):
+        key = (DB.DB_PATH, uid)
+        version, t = DB.active_items_version(uid), time.monotonic()
+        with self._lock:
+            hit = self._users.get(key)
+            if hit is None or hit[1] != version or t - hit[2] > self.max_age:
+                ub = UserBoosts(DB.get_active_items(uid, now))
+                self._users[key] = (ub, version, t)
+                return ub
+            ub = hit[0]
+            if ub.heap and ub.heap[0][0] <= now:
+                if ub.expire(now):
+                    self._expired[key] = max(self._expired.get(key, 0), now)
+            return ub
+
+    def totals(self, uid, now=None):
+        """(boost_exp_pct, boost_crystal_pct) summed over the user's active boosts."""
+        ub = self._user(uid, int(time.time()) if now is None else int(now))
+        return ub.exp_pct, ub.crystal_pct
+
+    def active(self, uid, now=None):
+        """The user's active boost rows (as get_active_items returns them), soonest to expire first."""
+        ub = self._user(uid, int(time.time()) if now is None else int(now))
+        with self._lock:
+            return [dict(r) for _, _, r in sorted(ub.heap)]
+
+    def invalidate(self, uid=None):
+        """Forget cached boosts (one user, or everyone)."""
+        with self._lock:
+            if uid is None:
+                self._users.clear()
+            else:
+                self._users.pop((DB.DB_PATH, uid), None)
+
+    def flush(self):
+        """Delete the expired rows seen so far, in one transaction."""
+        with self._lock:
+            pending, self._expired = self._expired, {}
+        by_path = {}
+        for (path, uid), cutoff in pending.items():
+            by_path.setdefault(path, []).append((uid, cutoff))
+        for path, rows in by_path.items():
+            DB.clean_expired_items_many(rows, path)
+        return len(pending)
+
+    def start(self, interval=60.0):
+        """Run flush() every `interval` seconds on a daemon thread until stop()."""
+        if self._stop is not None:
+            return
+        self._stop = stop = threading.Event()
+
+        def loop():
+            while not stop.wait(interval):
+                try:
+                    self.flush()
+                except Exception as e:
+                    print("boost flush error", e)
+        threading.Thread(target=loop, name="boost-flush", daemon=True).start()
+
+    def stop(self):
+        """Stop the background thread and flush what is pending."""
+        if self._stop is not None:
+            self._stop.set()
+            self._stop = None
+        self.flush()
+
+
+# Process-wide manager used by the app.
+BOOSTS = BoostManager()
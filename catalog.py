@@ -0,0 +1,61 @@
+"""Process-wide, read-mostly cache of the items table.
+
+The item catalog is tiny and only changes when items are seeded, yet almost
+every screen needs item names, rarities and boosts. ItemCatalog loads the
+table once and serves lookups by id, name and rarity from dicts. It reloads
+itself whenever the version reported by its owner changes; db.py bumps that
+version on every write to items (and it also changes with DB_PATH).
+"""
+import threading
+
+
+class ItemCatalog:
+    def __init__(self, load, version):
+        """`load()` returns the item rows as dicts; `version()` any comparable token."""
+        self._load = load
+        self._version_fn = version
+        self._lock = threading.Lock()
+        self._version = object()    # never equal to a real version
+        self._items = ()
+        self._by_id = {}
+        self._by_name = {}
+        self._by_rarity = {}
+
+    def _fresh(self):
+        v = self._version_fn()
+        if v != self._version:
+            with self._lock:
+                if v != self._version:
+                    items = tuple(self._load())
+                    by_rarity = {}
+                    for it in items:
+                        by_rarity.setdefault(it["rarity"], []).append(it)
+                    self._by_id = {it["id"]: it for it in items}
+                    self._by_name = {it["name"]: it for it in items}
+                    self._by_rarity = {r: tuple(v) for r, v in by_rarity.items()}
+                    self._items = items
+                    self._version = v
+        return self
+
+    def invalidate(self):
+        """Drop the cached rows; the next lookup reloads them."""
+        with self._lock:
+            self._version = object()
+
+    @property
+    def version(self):
+        return self._fresh()._version
+
+    # Lookups return the cached dicts; callers must treat them as read-only
+    # (use dict(it) before changing one).
+    def all(self):
+        return self._fresh()._items
+
+    def get(self, item_id):
+        return self._fresh()._by_id.get(item_id)
+
+    def by_name(self, name):
+        return self._fresh()._by_name.get(name)
+
+    def by_rarity(self, rarity):
+        return self._fresh()._by_rarity.get(rarity, ())
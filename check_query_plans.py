@@ -0,0 +1,87 @@
+
+# Query-plan audit for the hot db.py paths. Run:
+#   python check_query_plans.py
+# It builds a scratch database, exercises the helpers the app calls on every
+# screen/session/roll, captures each SQL statement they issue and runs
+# EXPLAIN QUERY PLAN on it. Exits with status 1 if any of them falls back to
+# a full table SCAN, or if a statement listed in REQUIRED never ran.
+import os, re, sys, tempfile
+import db as DB
+import gacha_engine as GACHA
+import gacha as PITY
+
+# Statements that are allowed to scan: whole-table reads by design.
+ALLOWED_SCANS = (
+    "SELECT * FROM items ORDER BY id",  # CATALOG (re)load, once per items version
+    "SELECT id FROM users",             # rebuild_user_stats() for every user
+)
+# Same, for statements whose bound parameters vary (matched as prefixes).
+ALLOWED_SCAN_PREFIXES = (
+    "SELECT it.*, p.rare_stacks",       # gacha.roll(): whole pool + this user's pity row
+)
+
+def _scenario(uid):
+    """The per-event helper calls made by main.py."""
+    DB.get_user(uid)
+    DB.get_study_sessions(uid, days=1)
+    DB.get_study_sessions(uid, days=7)
+    DB.get_daily_study(uid, days=7)
+    DB.complete_study_session(uid, 30)
+    DB.get_total_study_minutes(uid)
+    DB.get_items('gold')
+    GACHA.roll_many(uid, 'bronze', 10)
+    PITY.roll(uid, 'silver')
+    DB.update_crystals(uid, -10)
+    inv = DB.get_inventory(uid)
+    DB.get_inventory_summary(uid)
+    DB.get_inventory_summary(uid, 'co', 'gold', 0, 20)
+    DB.activate_item(uid, inv[0]['item_id'])
+    DB.bump_metric(uid, 'items_used')
+    DB.clean_expired_items(uid)
+    DB.get_active_items(uid)
+    DB.get_achievements(uid)
+    DB.init_achievements(uid)
+
+# Achievement writes made by the calls above (the rolls, the study session,
+# bump_metric, init_achievements); the audit fails if one is not exercised.
+# Traced SQL has its parameters inlined, hence the patterns.
+REQUIRED = {
+    "achievements.record": re.compile(r"UPDATE achievements SET completed_at=CASE WHEN completed=0 AND goal<=\d"),
+    "achievements.bump": re.compile(r"UPDATE achievements SET completed_at=CASE WHEN completed=0 AND goal<=progress\+"),
+}
+
+def main():
+    with tempfile.TemporaryDirectory() as d:
+        DB.DB_PATH = os.path.join(d, "plans.sqlite3")
+        DB.bootstrap(); DB.init_items()
+        DB.create_user("plan@example.com", "pw")
+        uid = DB.auth_user("plan@example.com", "pw")["id"]
+        DB.init_achievements(uid)
+
+        seen = []
+        con = DB._c()
+        con.set_trace_callback(lambda sql: seen.append(" ".join(sql.split())))
+        _scenario(uid)
+        con.set_trace_callback(None)
+
+        bad = 0
+        for name, pattern in REQUIRED.items():
+            if not any(pattern.match(sql) for sql in seen):
+                bad += 1
+                print("NOT EXERCISED:", name)
+        for sql in dict.fromkeys(seen):
+            if not sql.split(" ", 1)[0].upper() in ("SELECT", "UPDATE", "DELETE", "INSERT"):
+                continue
+            if sql in ALLOWED_SCANS or sql.startswith(ALLOWED_SCAN_PREFIXES):
+                continue
+            plan = [r["detail"] for r in con.execute("EXPLAIN QUERY PLAN " + sql)]
+            scans = [p for p in plan if p.startswith("SCAN ")]
+            if scans:
+                bad += 1
+                print("FULL SCAN:", sql, "\n    ", "; ".join(plan))
+        DB.close_connections()
+    print("query plans OK" if not bad else f"{bad} hot quer{'y' if bad == 1 else 'ies'} missing or doing a full scan")
+    return 1 if bad else 0
+
+if __name__ == "__main__":
+    sys.exit(main())
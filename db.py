@@ -1,78 +1,194 @@
 
 import sqlite3, os, time, hashlib, secrets
+from datetime import date, datetime, timedelta
+from dataclasses import dataclass, field
+from dbconn import ConnectionManager, open_connection
+import achievements as ACH
+from leveling import CURVE
+from catalog import ItemCatalog
+from studysaga.economy import Wallet
 
 DB_PATH=os.environ.get('STUDYSAGA_DB','studysaga.sqlite3')
 
+# Time zone that decides which calendar day a study session counts towards
+# (daily_study rollup, streaks). None = the device's local time.
+STUDY_TZ=None
+if os.environ.get('STUDYSAGA_TZ'):
+    from zoneinfo import ZoneInfo
+    STUDY_TZ=ZoneInfo(os.environ['STUDYSAGA_TZ'])
+
+# One long-lived connection per thread (see dbconn.py). DB_PATH is read lazily
+# so reassigning DB.DB_PATH switches databases on the next call.
+# Connections use the PRAGMA profile from STUDYSAGA_DB_PROFILE (default "mobile-safe").
+_conns=ConnectionManager(lambda: DB_PATH, pool_size=int(os.environ.get('STUDYSAGA_DB_POOL','0')))
+
+# users.crystals; every change is logged to crystal_ledger (see studysaga/economy.py)
+WALLET=Wallet('users','id')
+STARTING_CRYSTALS=100
+
 def _c():
-    c=sqlite3.connect(DB_PATH)
-    c.row_factory=sqlite3.Row
-    return c
+    """This thread's shared connection. Do not close it."""
+    return _conns.connection()
+
+def _tx(immediate=False):
+    """Context manager yielding a cursor; commits once at the outermost level."""
+    return _conns.transaction(immediate)
+
+def configure_pool(size, timeout=None):
+    """Let worker threads share a bounded pool of `size` connections (0 disables)."""
+    _conns.configure_pool(size, timeout)
+
+def configure_profile(profile):
+    """Use a named PRAGMA profile ("mobile-safe", "server-throughput") or a dict of PRAGMAs."""
+    _conns.configure_profile(profile)
+
+def close_connections():
+    _conns.close_all()
+
+def _has_table(cur, table):
+    cur.execute("SELECT 1 FROM sqlite_master WHERE type='table' AND name=?", (table,))
+    return cur.fetchone() is not None
 
 def _has_col(cur, table, col):
     cur.execute(f"PRAGMA table_info({table})")
     return any(r["name"]==col for r in cur.fetchall())
 
+INDEXES = [
+    "CREATE INDEX IF NOT EXISTS ix_study_sessions_user_start ON study_sessions(user_id, start_time, duration_minutes)",
+    "CREATE INDEX IF NOT EXISTS ix_achievements_user_metric ON achievements(user_id, metric)",
+    "CREATE INDEX IF NOT EXISTS ix_active_items_user_expires ON active_items(user_id, expires_at)",
+    "CREATE INDEX IF NOT EXISTS ix_items_rarity ON items(rarity)",
+    "CREATE INDEX IF NOT EXISTS ix_sessions_user ON sessions(user_id)",
+]
+
 def _migrate():
-    c=_c(); x=c.cursor()
-    # sessions.expires_at
-    x.execute("PRAGMA table_info(sessions)")
-    cols=[r["name"] for r in x.fetchall()]
-    if "expires_at" not in cols:
-        try:
-            x.execute("ALTER TABLE sessions ADD COLUMN expires_at INTEGER")
-            c.commit()
-        except sqlite3.OperationalError:
-            pass
-    # users schema: ensure columns exist
-    need_cols=[("nickname","TEXT DEFAULT ''"),
-               ("gender","TEXT DEFAULT 'female'"),
-               ("crystals","INTEGER DEFAULT 100"),
-               ("dark_mode","INTEGER DEFAULT 0"),
-               ("daily_goal_minutes","INTEGER DEFAULT 60"),
-               ("exp","INTEGER DEFAULT 0"),
-               ("level","INTEGER DEFAULT 1")]
-    x.execute("PRAGMA table_info(users)")
-    ucols=[r["name"] for r in x.fetchall()]
-    for name, decl in need_cols:
-        if name not in ucols:
+    with _tx() as x:
+        # sessions.expires_at
+        x.execute("PRAGMA table_info(sessions)")
+        cols=[r["name"] for r in x.fetchall()]
+        if "expires_at" not in cols:
             try:
-                x.execute(f"ALTER TABLE users ADD COLUMN {name} {decl}")
-                c.commit()
+                x.execute("ALTER TABLE sessions ADD COLUMN expires_at INTEGER")
+            except sqlite3.OperationalError:
+                pass
+        # users schema: ensure columns exist
+        need_cols=[("nickname","TEXT DEFAULT ''"),
+                   ("gender","TEXT DEFAULT 'female'"),
+                   ("crystals","INTEGER DEFAULT 100"),
+                   ("dark_mode","INTEGER DEFAULT 0"),
+                   ("daily_goal_minutes","INTEGER DEFAULT 60"),
+                   ("exp","INTEGER DEFAULT 0"),
+                   ("level","INTEGER DEFAULT 1"),
+                   ("total_exp","INTEGER")]
+        x.execute("PRAGMA table_info(users)")
+        ucols=[r["name"] for r in x.fetchall()]
+        for name, decl in need_cols:
+            if name not in ucols:
+                try:
+                    x.execute(f"ALTER TABLE users ADD COLUMN {name} {decl}")
+                except sqlite3.OperationalError:
+                    pass
+        
+        # users.total_exp: lifetime EXP that level/exp are derived from (leveling.py)
+        x.execute("SELECT id, level, exp FROM users WHERE total_exp IS NULL")
+        x.executemany("UPDATE users SET total_exp=? WHERE id=?",
+                      [(CURVE.total(r["level"] or 1, r["exp"] or 0), r["id"]) for r in x.fetchall()])
+        
+        # items.image_path
+        if not _has_col(x, "items", "image_path"):
+            try:
+                x.execute("ALTER TABLE items ADD COLUMN image_path TEXT")
             except sqlite3.OperationalError:
                 pass
-    
-    # items.image_path
-    if not _has_col(x, "items", "image_path"):
-        try:
-            x.execute("ALTER TABLE items ADD COLUMN image_path TEXT")
-            c.commit()
-        except sqlite3.OperationalError:
-            pass
-    
-    c.close()
+
+        # achievements.metric (drives ACH.record/ACH.bump); tag pre-existing rows by name
+        if not _has_col(x, "achievements", "metric"):
+            try:
+                x.execute("ALTER TABLE achievements ADD COLUMN metric TEXT")
+            except sqlite3.OperationalError:
+                pass
+        x.execute("SELECT 1 FROM achievements WHERE metric IS NULL LIMIT 1")
+        if x.fetchone():
+            x.executemany("UPDATE achievements SET metric=? WHERE name=? AND metric IS NULL",
+                          [(a.metric, a.name) for a in ACH.REGISTRY])
+
+        # secondary indexes for the hot per-user lookups (check_query_plans.py audits them)
+        x.execute("SELECT 1 FROM sqlite_master WHERE type='index' AND name='ux_achievements_user_name'")
+        if not x.fetchone():
+            # older builds could insert the same achievement twice; keep the most advanced copy
+            x.execute('''DELETE FROM achievements WHERE id NOT IN (
+                             SELECT id FROM (SELECT id, ROW_NUMBER() OVER (
+                                 PARTITION BY user_id, name ORDER BY completed DESC, progress DESC, id) AS rn
+                             FROM achievements) WHERE rn=1)''')
+            x.execute("CREATE UNIQUE INDEX ux_achievements_user_name ON achievements(user_id, name)")
+        x.execute("SELECT 1 FROM sqlite_master WHERE type='index' AND name='ux_items_name'")
+        if not x.fetchone():
+            # items are seeded by name (INSERT OR IGNORE); fold duplicate names onto the lowest id
+            x.execute('''CREATE TEMP TABLE item_dupes AS
+                         SELECT it.id AS dup, k.keep FROM items it
+                         JOIN (SELECT name, MIN(id) AS keep FROM items GROUP BY name) k ON k.name=it.name
+                         WHERE it.id<>k.keep''')
+            for table in ("inventory", "active_items"):
+                if table == "inventory" and not _has_table(x, "inventory"):
+                    continue
+                x.execute(f'''UPDATE {table} SET item_id=(SELECT keep FROM item_dupes WHERE dup=item_id)
+                              WHERE item_id IN (SELECT dup FROM item_dupes)''')
+            x.execute("DELETE FROM items WHERE id IN (SELECT dup FROM item_dupes)")
+            x.execute("DROP TABLE item_dupes")
+            x.execute("DROP INDEX IF EXISTS ix_items_name")
+            x.execute("CREATE UNIQUE INDEX ux_items_name ON items(name)")
+            _bump_items_version()
+
+        # legacy one-row-per-copy inventory: compact into inventory_stacks and keep the
+        # rows as inventory_legacy until drop_legacy_inventory() (migrate_once.py) removes them
+        if _has_table(x, "inventory"):
+            x.execute('''INSERT INTO inventory_stacks(user_id, item_id, quantity, first_acquired, last_acquired)
+                         SELECT user_id, item_id, COUNT(*), MIN(acquired_at), MAX(acquired_at)
+                         FROM inventory WHERE user_id IS NOT NULL AND item_id IS NOT NULL
+                         GROUP BY user_id, item_id
+                         ON CONFLICT(user_id, item_id) DO UPDATE SET
+                             quantity=quantity+excluded.quantity,
+                             first_acquired=MIN(first_acquired, excluded.first_acquired),
+                             last_acquired=MAX(last_acquired, excluded.last_acquired)''')
+            legacy, n = "inventory_legacy", 1
+            while _has_table(x, legacy):
+                legacy, n = f"inventory_legacy_{n}", n + 1
+            x.execute(f"ALTER TABLE inventory RENAME TO {legacy}")
+
+        for ddl in INDEXES:
+            x.execute(ddl)
+
+
+def drop_legacy_inventory():
+    """Drop the inventory_legacy* tables _migrate() kept; returns their names."""
+    with _tx() as x:
+        x.execute("SELECT name FROM sqlite_master WHERE type='table' AND name LIKE 'inventory\\_legacy%' ESCAPE '\\'")
+        names = [r['name'] for r in x.fetchall()]
+        for name in names:
+            x.execute(f"DROP TABLE {name}")
+    return names
 
 
 def ensure_admin_user():
     """Create 'admin' user with password 'admin' if missing, and set crystals to 1000."""
-    c=_c(); x=c.cursor()
-    # find exact email 'admin'
-    x.execute('SELECT id FROM users WHERE email=?', ('admin',))
-    r = x.fetchone()
-    if not r:
-        # create admin
-        x.execute('INSERT INTO users(email,password_hash,gender,crystals) VALUES (?,?,?,?)',
-                  ('admin', _hash('admin'), 'male', 1000))
-        c.commit()
-    else:
-        # update crystals to 1000
-        x.execute('UPDATE users SET crystals=? WHERE id=?', (1000, r['id']))
-        c.commit()
-    c.close()
+    with _tx(immediate=True) as x:
+        # find exact email 'admin'
+        x.execute('SELECT id FROM users WHERE email=?', ('admin',))
+        r = x.fetchone()
+        if not r:
+            # create admin
+            x.execute('INSERT INTO users(email,password_hash,gender,crystals) VALUES (?,?,?,0)',
+                      ('admin', _hash('admin'), 'male'))
+            WALLET.adjust(x, x.lastrowid, 1000, 'admin')
+        else:
+            # update crystals to 1000
+            WALLET.set(x, r['id'], 1000, 'admin')
 
 
 def bootstrap():
-    c=_c(); x=c.cursor()
-    x.executescript('''
+    # executescript() commits any open transaction first, so it runs on the
+    # bare connection rather than inside _tx().
+    _c().executescript('''
     CREATE TABLE IF NOT EXISTS users(
         id INTEGER PRIMARY KEY,
         email TEXT UNIQUE,
@@ -83,7 +199,8 @@ def bootstrap():
         dark_mode INTEGER DEFAULT 0,
         daily_goal_minutes INTEGER DEFAULT 60,
         exp INTEGER DEFAULT 0,
-        level INTEGER DEFAULT 1
+        level INTEGER DEFAULT 1,
+        total_exp INTEGER DEFAULT 0
     );
     CREATE TABLE IF NOT EXISTS sessions(
         token TEXT PRIMARY KEY,
@@ -109,13 +226,14 @@ def bootstrap():
         description TEXT,
         image_path TEXT
     );
-    CREATE TABLE IF NOT EXISTS inventory(
-        id INTEGER PRIMARY KEY AUTOINCREMENT,
+    CREATE TABLE IF NOT EXISTS inventory_stacks(
         user_id INTEGER,
         item_id INTEGER,
-        acquired_at INTEGER,
-        equipped INTEGER DEFAULT 0
-    );
+        quantity INTEGER NOT NULL DEFAULT 0,
+        first_acquired INTEGER,
+        last_acquired INTEGER,
+        PRIMARY KEY(user_id, item_id)
+    ) WITHOUT ROWID;
     CREATE TABLE IF NOT EXISTS achievements(
         id INTEGER PRIMARY KEY AUTOINCREMENT,
         user_id INTEGER,
@@ -124,7 +242,8 @@ def bootstrap():
         progress INTEGER DEFAULT 0,
         goal INTEGER DEFAULT 100,
         completed INTEGER DEFAULT 0,
-        completed_at INTEGER
+        completed_at INTEGER,
+        metric TEXT
     );
     CREATE TABLE IF NOT EXISTS active_items(
         id INTEGER PRIMARY KEY AUTOINCREMENT,
@@ -133,452 +252,622 @@ def bootstrap():
         activated_at INTEGER,
         expires_at INTEGER
     );
+    CREATE TABLE IF NOT EXISTS gacha_pity(
+        user_id INTEGER,
+        tier TEXT,
+        rare_stacks INTEGER DEFAULT 0,
+        epic_stacks INTEGER DEFAULT 0,
+        PRIMARY KEY(user_id, tier)
+    ) WITHOUT ROWID;
     ''')
-    c.commit(); c.close()
+    with _tx() as x:
+        WALLET.create(x)
     _migrate()
+    _ensure_user_stats()
+    _ensure_daily_study()
 
 def _hash(p): return hashlib.sha256(('studysaga'+p).encode()).hexdigest()
 
 def create_user(email,pw):
-    c=_c(); x=c.cursor()
     try:
-        x.execute('INSERT INTO users(email,password_hash) VALUES (?,?)',(email,_hash(pw)))
-        c.commit(); ok=True
+        with _tx() as x:
+            x.execute('INSERT INTO users(email,password_hash,crystals) VALUES (?,?,0)',(email,_hash(pw)))
+            WALLET.adjust(x, x.lastrowid, STARTING_CRYSTALS, 'signup')
+        return True
     except sqlite3.IntegrityError:
-        ok=False
-    c.close(); return ok
+        return False
 
 def auth_user(email,pw):
-    c=_c(); x=c.cursor(); x.execute('SELECT * FROM users WHERE email=?',(email,)); r=x.fetchone(); c.close()
+    with _tx() as x:
+        x.execute('SELECT * FROM users WHERE email=?',(email,)); r=x.fetchone()
     if not r or r['password_hash']!=_hash(pw): return None
     return dict(r)
 
 def issue_session(uid,hours=720):
     t=secrets.token_urlsafe(24); exp=int(time.time())+hours*3600
-    c=_c(); x=c.cursor()
-    # insert with expires_at regardless (column is ensured in _migrate)
-    x.execute('INSERT OR REPLACE INTO sessions(token,user_id,expires_at) VALUES (?,?,?)',(t,uid,exp))
-    c.commit(); c.close(); return t
+    with _tx() as x:
+        # insert with expires_at regardless (column is ensured in _migrate)
+        x.execute('INSERT OR REPLACE INTO sessions(token,user_id,expires_at) VALUES (?,?,?)',(t,uid,exp))
+    return t
 
 def set_gender(uid, gender):
-    c=_c(); x=c.cursor()
-    x.execute('UPDATE users SET gender=? WHERE id=?',(gender,uid))
-    c.commit(); c.close()
+    with _tx() as x:
+        x.execute('UPDATE users SET gender=? WHERE id=?',(gender,uid))
 
 def update_user_settings(uid, nickname, gender, dark_mode, daily_goal):
-    c=_c(); x=c.cursor()
-    x.execute('''UPDATE users SET nickname=?, gender=?, dark_mode=?, daily_goal_minutes=? 
-                 WHERE id=?''', (nickname, gender, dark_mode, daily_goal, uid))
-    c.commit(); c.close()
+    with _tx() as x:
+        x.execute('''UPDATE users SET nickname=?, gender=?, dark_mode=?, daily_goal_minutes=? 
+                     WHERE id=?''', (nickname, gender, dark_mode, daily_goal, uid))
 
 def get_user(uid):
-    c=_c(); x=c.cursor()
-    x.execute('SELECT * FROM users WHERE id=?', (uid,))
-    r=x.fetchone(); c.close()
+    with _tx() as x:
+        x.execute('SELECT * FROM users WHERE id=?', (uid,))
+        r=x.fetchone()
     return dict(r) if r else None
 
 
-def set_crystals(uid, value:int):
-    c=_c(); x=c.cursor()
-    x.execute('UPDATE users SET crystals=? WHERE id=?',(value, uid))
-    c.commit(); c.close()
-def update_crystals(uid, amount):
-    c=_c(); x=c.cursor()
-    x.execute('UPDATE users SET crystals=crystals+? WHERE id=?', (amount, uid))
-    c.commit()
-    x.execute('SELECT crystals FROM users WHERE id=?', (uid,))
-    new_val = x.fetchone()['crystals']
-    c.close()
-    return new_val
+def set_crystals(uid, value:int, reason='set'):
+    with _tx(immediate=True) as x:
+        return WALLET.set(x, uid, value, reason)
+def update_crystals(uid, amount, reason='adjust'):
+    """Add `amount` (negative allowed, unchecked); returns the new balance."""
+    with _tx() as x:
+        return WALLET.adjust(x, uid, amount, reason)
+def spend_crystals(uid, amount, reason='spend', ref=None):
+    """Conditional debit: (True, balance) or (False, balance) with nothing changed."""
+    with _tx() as x:
+        left = WALLET.debit(x, uid, amount, reason, ref)
+        return (True, left) if left is not None else (False, WALLET.balance(x, uid))
+def crystal_history(uid, limit=50):
+    with _tx() as x:
+        return WALLET.history(x, uid, limit)
+def audit_crystals(uid=None):
+    with _tx() as x:
+        return WALLET.audit(x, uid)
+
+def _ensure_user_stats():
+    """Create the user_stats rollup; populate it from history the first time."""
+    with _tx() as x:
+        x.execute("SELECT 1 FROM sqlite_master WHERE type='table' AND name='user_stats'")
+        if x.fetchone():
+            return
+        x.execute('''CREATE TABLE user_stats(
+            user_id INTEGER PRIMARY KEY,
+            total_minutes INTEGER NOT NULL DEFAULT 0,
+            total_crystals INTEGER NOT NULL DEFAULT 0,
+            session_count INTEGER NOT NULL DEFAULT 0,
+            roll_count INTEGER NOT NULL DEFAULT 0,
+            current_streak INTEGER NOT NULL DEFAULT 0,
+            longest_streak INTEGER NOT NULL DEFAULT 0,
+            last_study_day TEXT
+        )''')
+        rebuild_user_stats()
+
+def _local_day(ts):
+    """Calendar date of a unix timestamp in STUDY_TZ."""
+    if STUDY_TZ is None:
+        return datetime.fromtimestamp(ts).date()
+    return datetime.fromtimestamp(ts, STUDY_TZ).date()
+
+def _ensure_daily_study():
+    """Create the per-day study rollup; populate it from history the first time."""
+    with _tx() as x:
+        x.execute("SELECT 1 FROM sqlite_master WHERE type='table' AND name='daily_study'")
+        if x.fetchone():
+            return
+        x.execute('''CREATE TABLE daily_study(
+            user_id INTEGER NOT NULL,
+            local_date TEXT NOT NULL,
+            minutes INTEGER NOT NULL DEFAULT 0,
+            crystals INTEGER NOT NULL DEFAULT 0,
+            PRIMARY KEY(user_id, local_date)
+        ) WITHOUT ROWID''')
+        rebuild_daily_study()
+
+def rebuild_daily_study(uid=None):
+    """Recompute daily_study from study_sessions (one user, or everyone if uid is None)."""
+    with _tx() as x:
+        if uid is None:
+            x.execute('DELETE FROM daily_study')
+            x.execute('SELECT user_id, start_time, duration_minutes, crystals_earned FROM study_sessions')
+        else:
+            x.execute('DELETE FROM daily_study WHERE user_id=?', (uid,))
+            x.execute('SELECT user_id, start_time, duration_minutes, crystals_earned FROM study_sessions WHERE user_id=?',
+                      (uid,))
+        days = {}
+        for r in x.fetchall():
+            key = (r['user_id'], _local_day(r['start_time']).isoformat())
+            m, c = days.get(key, (0, 0))
+            days[key] = (m + (r['duration_minutes'] or 0), c + (r['crystals_earned'] or 0))
+        x.executemany('INSERT INTO daily_study(user_id, local_date, minutes, crystals) VALUES (?,?,?,?)',
+                      [(u, d, m, c) for (u, d), (m, c) in days.items()])
+
+def get_daily_study(uid, days=7, today=None):
+    """Minutes/crystals studied per day for the last `days` days, oldest first.
+
+    Returns [{'date': date, 'minutes': int, 'crystals': int}, ...] with one
+    entry per day (zeros for days without study), read with a single range
+    query on the daily_study primary key.
+    """
+    today = today or _local_day(time.time())
+    first = today - timedelta(days=days-1)
+    with _tx() as x:
+        x.execute('''SELECT local_date, minutes, crystals FROM daily_study
+                     WHERE user_id=? AND local_date BETWEEN ? AND ?''', (uid, first.isoformat(), today.isoformat()))
+        got = {r['local_date']: r for r in x.fetchall()}
+    out = []
+    for i in range(days):
+        d = first + timedelta(days=i)
+        r = got.get(d.isoformat())
+        out.append({'date': d, 'minutes': r['minutes'] if r else 0, 'crystals': r['crystals'] if r else 0})
+    return out
+
+def _streak_days(days):
+    """(current, longest) run of consecutive dates in a sorted list of date objects."""
+    cur = longest = 0; prev = None
+    for d in days:
+        cur = cur + 1 if prev is not None and d - prev == timedelta(days=1) else 1
+        longest = max(longest, cur); prev = d
+    return cur, longest
+
+def rebuild_user_stats(uid=None):
+    """Recompute user_stats from study_sessions for one user, or all users if uid is None.
+
+    Rolls have no history table, so roll_count is taken from the roll
+    achievements, which counted every roll.
+    """
+    with _tx() as x:
+        if uid is None:
+            x.execute('SELECT id FROM users')
+            uids = [r['id'] for r in x.fetchall()]
+        else:
+            uids = [uid]
+        for u in uids:
+            x.execute('''SELECT COALESCE(SUM(duration_minutes),0) AS minutes, COALESCE(SUM(crystals_earned),0) AS crystals,
+                                COUNT(*) AS n FROM study_sessions WHERE user_id=?''', (u,))
+            t = x.fetchone()
+            x.execute('SELECT COALESCE(MAX(progress),0) AS rolls FROM achievements WHERE user_id=? AND metric=?',
+                      (u, ACH.ROLL_COUNT))
+            rolls = x.fetchone()['rolls']
+            x.execute('SELECT start_time FROM study_sessions WHERE user_id=?', (u,))
+            days = sorted({_local_day(r['start_time']) for r in x.fetchall()})
+            cur, longest = _streak_days(days)
+            x.execute('''INSERT OR REPLACE INTO user_stats(user_id, total_minutes, total_crystals, session_count,
+                                                           roll_count, current_streak, longest_streak, last_study_day)
+                         VALUES (?,?,?,?,?,?,?,?)''',
+                      (u, t['minutes'], t['crystals'], t['n'], rolls, cur, longest,
+                       days[-1].isoformat() if days else None))
+
+def get_user_stats(uid):
+    """Running totals for a user (zeros if they have none yet)."""
+    with _tx() as x:
+        x.execute('SELECT * FROM user_stats WHERE user_id=?', (uid,))
+        r = x.fetchone()
+    if r: return dict(r)
+    return {'user_id': uid, 'total_minutes': 0, 'total_crystals': 0, 'session_count': 0, 'roll_count': 0,
+            'current_streak': 0, 'longest_streak': 0, 'last_study_day': None}
+
+def _log_session(x, uid, minutes, crystals, now):
+    """Insert a study_sessions row and fold it into user_stats; returns the new stats row."""
+    start = now - minutes*60
+    x.execute('''INSERT INTO study_sessions(user_id, start_time, end_time, duration_minutes, crystals_earned)
+                 VALUES (?, ?, ?, ?, ?)''', (uid, start, now, minutes, crystals))
+    day = _local_day(start)
+    x.execute('''INSERT INTO daily_study(user_id, local_date, minutes, crystals) VALUES (?,?,?,?)
+                 ON CONFLICT(user_id, local_date) DO UPDATE SET minutes=minutes+excluded.minutes,
+                                                                crystals=crystals+excluded.crystals''',
+              (uid, day.isoformat(), minutes, crystals))
+    x.execute('INSERT OR IGNORE INTO user_stats(user_id) VALUES (?)', (uid,))
+    x.execute('SELECT current_streak, longest_streak, last_study_day FROM user_stats WHERE user_id=?', (uid,))
+    st = x.fetchone()
+    last = date.fromisoformat(st['last_study_day']) if st['last_study_day'] else None
+    streak = st['current_streak']
+    if last is None or day - last > timedelta(days=1):
+        streak = 1
+    elif day - last == timedelta(days=1):
+        streak += 1
+    # same day (or a back-dated session) leaves the streak as it is
+    x.execute('''UPDATE user_stats SET total_minutes=total_minutes+?, total_crystals=total_crystals+?,
+                        session_count=session_count+1, current_streak=?, longest_streak=MAX(longest_streak, ?),
+                        last_study_day=MAX(COALESCE(last_study_day, ''), ?)
+                 WHERE user_id=?''', (minutes, crystals, streak, streak, day.isoformat(), uid))
+    x.execute('SELECT * FROM user_stats WHERE user_id=?', (uid,))
+    return x.fetchone()
 
 def add_study_session(uid, duration_minutes, crystals_earned):
-    c=_c(); x=c.cursor()
     now = int(time.time())
-    x.execute('''INSERT INTO study_sessions(user_id, start_time, end_time, duration_minutes, crystals_earned)
-                 VALUES (?, ?, ?, ?, ?)''', (uid, now-duration_minutes*60, now, duration_minutes, crystals_earned))
-    c.commit(); c.close()
+    with _tx() as x:
+        _log_session(x, uid, duration_minutes, crystals_earned, now)
 
 def get_study_sessions(uid, days=7):
-    c=_c(); x=c.cursor()
     cutoff = int(time.time()) - days*24*3600
-    x.execute('''SELECT * FROM study_sessions WHERE user_id=? AND start_time>=? 
-                 ORDER BY start_time DESC''', (uid, cutoff))
-    r = [dict(row) for row in x.fetchall()]
-    c.close()
-    return r
-
+    with _tx() as x:
+        x.execute('''SELECT * FROM study_sessions WHERE user_id=? AND start_time>=? 
+                     ORDER BY start_time DESC''', (uid, cutoff))
+        return [dict(row) for row in x.fetchall()]
+
+
+# Bumped whenever this process changes the items table, so caches built
+# from it (CATALOG, gacha alias tables) know to rebuild.
+_items_version = 0
+
+def items_version():
+    """Changes whenever the items table (or the database file) changes."""
+    return (DB_PATH, _items_version)
+
+def _bump_items_version():
+    global _items_version
+    _items_version += 1
+
+def _load_items():
+    with _tx() as x:
+        x.execute('SELECT * FROM items ORDER BY id')
+        return [dict(row) for row in x.fetchall()]
+
+# Process-wide item catalog; every item lookup below goes through it.
+CATALOG = ItemCatalog(_load_items, items_version)
+
+_ITEM_COLS = 'name, type, rarity, boost_exp_pct, boost_crystal_pct, description, image_path'
+
+# (name, type, rarity, boost_exp_pct, boost_crystal_pct, description, image_path)
+BASE_ITEMS = [
+    ('Focus Tea', 'consumable', 'bronze', 6, 5, 'A warm brew that helps you lock in for a bit.', ''),
+    ('Pomodoro Timer', 'consumable', 'bronze', 8, 3, 'Tick-tock boost to short sprints.', ''),
+    ('Sticky Notes Storm', 'consumable', 'bronze', 5, 7, 'Notes everywhere—your brain loves it.', ''),
+    ('Desk Plant Buddy', 'consumable', 'bronze', 7, 6, 'Tiny chlorophyll, tiny productivity bump.', ''),
+    ('Blue Light Glasses', 'consumable', 'bronze', 9, 4, 'Less eye strain, more brain gain.', ''),
+    ('Midnight Oil', 'consumable', 'silver', 14, 10, 'Burn it wisely: longer focus streaks.', ''),
+    ('Flashcard Frenzy', 'consumable', 'silver', 16, 12, 'Your recall just found second gear.', ''),
+    ('Study Lo-Fi Mix', 'consumable', 'silver', 15, 14, 'Beats to level up your grind.', ''),
+    ('Mind Palace Kit', 'consumable', 'silver', 18, 11, 'Organize thoughts like royalty.', ''),
+    ('Habit Tracker Pro', 'consumable', 'silver', 13, 15, 'Consistency pays dividends.', ''),
+    ('Quantum Coffee', 'consumable', 'gold', 28, 22, 'Superposition of alert + calm.', ''),
+    ('Zen Master Candle', 'consumable', 'gold', 25, 24, 'Tranquility with turbocharged focus.', ''),
+    ('Lightning Keyboard', 'consumable', 'gold', 30, 20, 'Your WPM just crits.', ''),
+    ('Flow State Serum', 'consumable', 'gold', 27, 25, 'Slip into the zone on command.', ''),
+    ('Champion’s Checklist', 'consumable', 'gold', 26, 23, 'Plan it. Crush it. Repeat.', ''),
+]
 
 def ensure_item_by_name(name, type_, rarity, bx, bc, desc, img):
-    c=_c(); x=c.cursor()
-    x.execute('SELECT id FROM items WHERE name=?', (name,))
-    row = x.fetchone()
-    if not row:
-        x.execute('INSERT INTO items(name, type, rarity, boost_exp_pct, boost_crystal_pct, description, image_path) VALUES (?,?,?,?,?,?,?)',
+    with _tx() as x:
+        x.execute(f'INSERT OR IGNORE INTO items({_ITEM_COLS}) VALUES (?,?,?,?,?,?,?)',
                   (name, type_, rarity, bx, bc, desc, img))
-        c.commit()
-    c.close()
+        if x.rowcount > 0:
+            _bump_items_version()
 
 
 def init_items():
-    """Ensure base items exist (5 per rarity)."""
+    """Ensure base items exist (5 per rarity) with one INSERT OR IGNORE batch."""
     try:
-        ensure_item_by_name('Focus Tea', 'consumable', 'bronze', 6, 5, 'A warm brew that helps you lock in for a bit.', '')
-        ensure_item_by_name('Pomodoro Timer', 'consumable', 'bronze', 8, 3, 'Tick-tock boost to short sprints.', '')
-        ensure_item_by_name('Sticky Notes Storm', 'consumable', 'bronze', 5, 7, 'Notes everywhere—your brain loves it.', '')
-        ensure_item_by_name('Desk Plant Buddy', 'consumable', 'bronze', 7, 6, 'Tiny chlorophyll, tiny productivity bump.', '')
-        ensure_item_by_name('Blue Light Glasses', 'consumable', 'bronze', 9, 4, 'Less eye strain, more brain gain.', '')
-        ensure_item_by_name('Midnight Oil', 'consumable', 'silver', 14, 10, 'Burn it wisely: longer focus streaks.', '')
-        ensure_item_by_name('Flashcard Frenzy', 'consumable', 'silver', 16, 12, 'Your recall just found second gear.', '')
-        ensure_item_by_name('Study Lo-Fi Mix', 'consumable', 'silver', 15, 14, 'Beats to level up your grind.', '')
-        ensure_item_by_name('Mind Palace Kit', 'consumable', 'silver', 18, 11, 'Organize thoughts like royalty.', '')
-        ensure_item_by_name('Habit Tracker Pro', 'consumable', 'silver', 13, 15, 'Consistency pays dividends.', '')
-        ensure_item_by_name('Quantum Coffee', 'consumable', 'gold', 28, 22, 'Superposition of alert + calm.', '')
-        ensure_item_by_name('Zen Master Candle', 'consumable', 'gold', 25, 24, 'Tranquility with turbocharged focus.', '')
-        ensure_item_by_name('Lightning Keyboard', 'consumable', 'gold', 30, 20, 'Your WPM just crits.', '')
-        ensure_item_by_name('Flow State Serum', 'consumable', 'gold', 27, 25, 'Slip into the zone on command.', '')
-        ensure_item_by_name('Champion’s Checklist', 'consumable', 'gold', 26, 23, 'Plan it. Crush it. Repeat.', '')
+        with _tx() as x:
+            x.executemany(f'INSERT OR IGNORE INTO items({_ITEM_COLS}) VALUES (?,?,?,?,?,?,?)', BASE_ITEMS)
+            if x.rowcount > 0:
+                _bump_items_version()
     except Exception as e:
         print('init_items error', e)
 
 def get_items(rarity=None):
-    c=_c(); x=c.cursor()
     if rarity and rarity != 'all':
-        x.execute('SELECT * FROM items WHERE rarity=?', (rarity,))
-    else:
-        x.execute('SELECT * FROM items')
-    r = [dict(row) for row in x.fetchall()]
-    c.close()
-    return r
+        return [dict(it) for it in CATALOG.by_rarity(rarity)]
+    return [dict(it) for it in CATALOG.all()]
+
+def _with_item(row, *cols):
+    """Row dict extended with `cols` of its item from CATALOG (None if the item is gone)."""
+    it = CATALOG.get(row['item_id'])
+    if it is None:
+        return None
+    d = dict(row)
+    for c in cols:
+        d[c] = it[c]
+    return d
 
 def get_inventory(uid):
-    c=_c(); x=c.cursor()
-    x.execute('''SELECT i.id, i.user_id, i.item_id, i.acquired_at, i.equipped,
-                        it.name, it.type, it.rarity, it.boost_exp_pct, it.boost_crystal_pct, it.description
-                 FROM inventory i 
-                 JOIN items it ON i.item_id = it.id 
-                 WHERE i.user_id=?
-                 ORDER BY i.acquired_at DESC''', (uid,))
-    r = [dict(row) for row in x.fetchall()]
-    c.close()
-    return r
+    """One dict per owned item (a stack): item fields plus quantity and first/last acquired."""
+    with _tx() as x:
+        x.execute('''SELECT user_id, item_id, quantity, first_acquired, last_acquired
+                     FROM inventory_stacks
+                     WHERE user_id=?
+                     ORDER BY last_acquired DESC''', (uid,))
+        rows = [_with_item(row, 'name', 'type', 'rarity', 'boost_exp_pct', 'boost_crystal_pct', 'description')
+                for row in x.fetchall()]
+        return [r for r in rows if r]
+
+def inventory_counts(uid):
+    """(total copies, distinct items) the user owns; reads at most one row per catalog item."""
+    with _tx() as x:
+        x.execute('''SELECT COALESCE(SUM(quantity),0) AS total, COUNT(*) AS uniq
+                     FROM inventory_stacks WHERE user_id=?''', (uid,))
+        r = x.fetchone()
+        return r['total'], r['uniq']
+
+INVENTORY_PAGE = 50
+_RARITY_ORDER = "CASE it.rarity WHEN 'gold' THEN 0 WHEN 'silver' THEN 1 WHEN 'bronze' THEN 2 ELSE 9 END"
+
+def get_inventory_summary(uid, search='', tier='all', offset=0, limit=INVENTORY_PAGE):
+    """One page of the user's inventory stacks, gold first then by name.
+
+    Each dict has the item's fields plus item_id, count and active. The
+    name/tier filter is resolved to item ids through CATALOG, so SQL only
+    walks the user's stacks by primary key.
+    """
+    ids = None
+    if search or (tier and tier != 'all'):
+        s = (search or '').lower()
+        pool = CATALOG.by_rarity(tier) if tier and tier != 'all' else CATALOG.all()
+        ids = [it['id'] for it in pool if s in it['name'].lower()]
+        if not ids:
+            return []
+    now = int(time.time())
+    with _tx() as x:
+        x.execute(f'''SELECT st.item_id, st.quantity AS count, st.last_acquired,
+                             it.name, it.rarity, it.boost_exp_pct, it.boost_crystal_pct, it.description,
+                             EXISTS(SELECT 1 FROM active_items ai
+                                    WHERE ai.user_id=? AND ai.item_id=st.item_id AND ai.expires_at>?) AS active
+                      FROM inventory_stacks st
+                      JOIN items it ON it.id=st.item_id
+                      WHERE st.user_id=? {f"AND st.item_id IN ({_in(ids)})" if ids else ""}
+                      ORDER BY {_RARITY_ORDER}, lower(it.name)
+                      LIMIT ? OFFSET ?''', (uid, now, uid, *(ids or ()), limit, offset))
+        return [dict(row) for row in x.fetchall()]
+
+def grant_items(uid, item_ids, now=None):
+    """Add one copy per entry of `item_ids` (repeats allowed) to the user's stacks."""
+    now = int(time.time()) if now is None else int(now)
+    counts = {}
+    for i in item_ids:
+        counts[i] = counts.get(i, 0) + 1
+    with _tx() as x:
+        x.executemany('''INSERT INTO inventory_stacks(user_id, item_id, quantity, first_acquired, last_acquired)
+                         VALUES (?, ?, ?, ?, ?)
+                         ON CONFLICT(user_id, item_id) DO UPDATE SET
+                             quantity=quantity+excluded.quantity, last_acquired=excluded.last_acquired''',
+                      [(uid, i, n, now, now) for i, n in counts.items()])
 
 def add_to_inventory(uid, item_id):
-    c=_c(); x=c.cursor()
-    now = int(time.time())
-    x.execute('INSERT INTO inventory(user_id, item_id, acquired_at) VALUES (?, ?, ?)', (uid, item_id, now))
-    c.commit(); c.close()
+    grant_items(uid, [item_id])
 
 def get_achievements(uid):
-    c=_c(); x=c.cursor()
-    x.execute('SELECT * FROM achievements WHERE user_id=? ORDER BY completed DESC, id ASC', (uid,))
-    r = [dict(row) for row in x.fetchall()]
-    c.close()
-    return r
+    with _tx() as x:
+        x.execute('SELECT * FROM achievements WHERE user_id=? ORDER BY completed DESC, id ASC', (uid,))
+        return [dict(row) for row in x.fetchall()]
 
 def init_achievements(uid):
     """Initialize default achievements for a user - adds any missing achievements"""
-    c=_c(); x=c.cursor()
-    
-    # Get existing achievement names for this user
-    x.execute('SELECT name FROM achievements WHERE user_id=?', (uid,))
-    existing_names = set(row['name'] for row in x.fetchall())
-    
-    # Define all achievements
-    all_achs = [
-        # Beginner achievements (5)
-        (uid, 'First Study', 'Complete your first study session', 0, 1),
-        (uid, 'Getting Started', 'Study for 30 minutes total', 0, 30),
-        (uid, 'First Roll', 'Perform your first gacha roll', 0, 1),
-        (uid, 'First Item', 'Acquire your first item', 0, 1),
-        (uid, 'Quick Start', 'Complete 3 study sessions', 0, 3),
-        
-        # Study Time achievements (10)
-        (uid, 'Study Rookie', 'Study for 1 hour total', 0, 60),
-        (uid, 'Study Novice', 'Study for 2 hours total', 0, 120),
-        (uid, 'Study Apprentice', 'Study for 5 hours total', 0, 300),
-        (uid, 'Study Warrior', 'Study for 10 hours total', 0, 600),
-        (uid, 'Study Expert', 'Study for 20 hours total', 0, 1200),
-        (uid, 'Study Master', 'Study for 50 hours total', 0, 3000),
-        (uid, 'Study Grandmaster', 'Study for 75 hours total', 0, 4500),
-        (uid, 'Study Legend', 'Study for 100 hours total', 0, 6000),
-        (uid, 'Study Mythic', 'Study for 150 hours total', 0, 9000),
-        (uid, 'Study God', 'Study for 200 hours total', 0, 12000),
-        
-        # Crystal achievements (6)
-        (uid, 'Pocket Change', 'Earn 100 crystals', 0, 100),
-        (uid, 'Crystal Collector', 'Earn 1000 crystals', 0, 1000),
-        (uid, 'Crystal Hoarder', 'Earn 5000 crystals', 0, 5000),
-        (uid, 'Crystal Tycoon', 'Earn 10000 crystals', 0, 10000),
-        (uid, 'Crystal Magnate', 'Earn 25000 crystals', 0, 25000),
-        (uid, 'Crystal Emperor', 'Earn 50000 crystals', 0, 50000),
+    with _tx() as x:
+        # Insert only missing achievements (definitions live in achievements.py);
+        # the unique (user_id, name) index makes existing ones no-ops
+        x.executemany('''INSERT OR IGNORE INTO achievements(user_id, name, description, metric, goal)
+                         VALUES (?, ?, ?, ?, ?)''', ACH.rows_for(uid))
+        if x.rowcount > 0:
+            print(f"Added {x.rowcount} new achievements for user {uid}")
         
-        # Gacha achievements (5)
-        (uid, 'Gacha Beginner', 'Perform 10 gacha rolls', 0, 10),
-        (uid, 'Gacha Enthusiast', 'Perform 25 gacha rolls', 0, 25),
-        (uid, 'Gacha Master', 'Perform 50 gacha rolls', 0, 50),
-        (uid, 'Gacha Addict', 'Perform 100 gacha rolls', 0, 100),
-        (uid, 'Gacha Legend', 'Perform 250 gacha rolls', 0, 250),
-        
-        # Level achievements (5)
-        (uid, 'Level 5', 'Reach level 5', 0, 5),
-        (uid, 'Level 10', 'Reach level 10', 0, 10),
-        (uid, 'Level 25', 'Reach level 25', 0, 25),
-        (uid, 'Level 50', 'Reach level 50', 0, 50),
-        (uid, 'Level 100', 'Reach level 100', 0, 100),
-        
-        # Collection achievements (4)
-        (uid, 'Collector', 'Own 5 different items', 0, 5),
-        (uid, 'Hoarder', 'Own 15 items total', 0, 15),
-        (uid, 'Item Master', 'Own 25 items total', 0, 25),
-        (uid, 'Treasure Hunter', 'Own all 6 unique items', 0, 6),
-        
-        # Special achievements (5)
-        (uid, 'Lucky Strike', 'Get a gold rarity item from gacha', 0, 1),
-        (uid, 'Marathon Runner', 'Complete a 60 minute study session', 0, 1),
-        (uid, 'Ultra Marathon', 'Complete a 90 minute study session', 0, 1),
-        (uid, 'Power User', 'Activate an item 10 times', 0, 10),
-        (uid, 'Consistency King', 'Study for 7 consecutive days', 0, 7),
-    ]
-    
-    # Filter out achievements that already exist
-    new_achs = [ach for ach in all_achs if ach[1] not in existing_names]
-    
-    # Insert only new achievements
-    if new_achs:
-        x.executemany('''INSERT INTO achievements(user_id, name, description, progress, goal)
-                         VALUES (?, ?, ?, ?, ?)''', new_achs)
-        c.commit()
-        print(f"Added {len(new_achs)} new achievements for user {uid}")
-    
-    c.close()
-    
-    # Backfill progress for newly added achievements based on existing data
-    backfill_achievement_progress(uid)
-
-def update_achievement(uid, name, increment=1):
-    """Update achievement progress and mark as completed if goal reached"""
-    c=_c(); x=c.cursor()
-    
-    # Get current achievement
-    x.execute('SELECT * FROM achievements WHERE user_id=? AND name=?', (uid, name))
-    ach = x.fetchone()
-    
-    if not ach:
-        c.close()
-        return
-    
-    ach = dict(ach)
-    new_progress = ach['progress'] + increment
-    
-    # Check if completed
-    if new_progress >= ach['goal'] and not ach['completed']:
-        now = int(time.time())
-        x.execute('''UPDATE achievements SET progress=?, completed=1, completed_at=? 
-                     WHERE user_id=? AND name=?''', (new_progress, now, uid, name))
-    else:
-        x.execute('''UPDATE achievements SET progress=? 
-                     WHERE user_id=? AND name=?''', (new_progress, uid, name))
-    
-    c.commit()
-    c.close()
+        # Backfill progress for newly added achievements based on existing data
+        backfill_achievement_progress(uid)
 
 def get_total_study_minutes(uid):
     """Get total study minutes for user"""
-    c=_c(); x=c.cursor()
-    x.execute('SELECT SUM(duration_minutes) as total FROM study_sessions WHERE user_id=?', (uid,))
-    result = x.fetchone()
-    c.close()
-    return result['total'] or 0
+    return get_user_stats(uid)['total_minutes']
 
 def get_total_crystals_earned(uid):
     """Get total crystals earned from study sessions"""
-    c=_c(); x=c.cursor()
-    x.execute('SELECT SUM(crystals_earned) as total FROM study_sessions WHERE user_id=?', (uid,))
-    result = x.fetchone()
-    c.close()
-    return result['total'] or 0
-
-def set_achievement_progress(uid, name, new_progress):
-    """Set achievement progress to specific value and mark completed if goal reached"""
-    c=_c(); x=c.cursor()
-    
-    # Get current achievement
-    x.execute('SELECT * FROM achievements WHERE user_id=? AND name=?', (uid, name))
-    ach = x.fetchone()
-    
-    if not ach:
-        c.close()
-        return
-    
-    ach = dict(ach)
-    
-    # Check if should be completed
-    if new_progress >= ach['goal'] and not ach['completed']:
-        now = int(time.time())
-        x.execute('''UPDATE achievements SET progress=?, completed=1, completed_at=? 
-                     WHERE user_id=? AND name=?''', (new_progress, now, uid, name))
-    else:
-        x.execute('''UPDATE achievements SET progress=? 
-                     WHERE user_id=? AND name=?''', (new_progress, uid, name))
-    
-    c.commit()
-    c.close()
+    return get_user_stats(uid)['total_crystals']
 
 def update_exp(uid, amount):
-    """Add EXP and handle level-ups"""
-    c=_c(); x=c.cursor()
-    
-    # Get current user stats
-    x.execute('SELECT exp, level FROM users WHERE id=?', (uid,))
-    user = x.fetchone()
-    if not user:
-        c.close()
-        return 1
-    
-    current_exp = user['exp']
-    current_level = user['level']
-    new_exp = current_exp + amount
-    
-    # Calculate level-ups (100 EXP per level)
-    exp_per_level = 100
-    new_level = current_level
-    
-    while new_exp >= exp_per_level * new_level:
-        new_exp -= exp_per_level * new_level
-        new_level += 1
-    
-    # Update database
-    x.execute('UPDATE users SET exp=?, level=? WHERE id=?', (new_exp, new_level, uid))
-    c.commit()
-    c.close()
+    """Add EXP and handle level-ups (O(1) via leveling.CURVE, however many levels are gained)"""
+    with _tx() as x:
+        # Get current user stats
+        x.execute('SELECT exp, level, total_exp FROM users WHERE id=?', (uid,))
+        user = x.fetchone()
+        if not user:
+            return 1
+        
+        total = user['total_exp']
+        if total is None:
+            total = CURVE.total(user['level'], user['exp'])
+        total += amount
+        new_level, new_exp = CURVE.split(total)
+        
+        # Update database
+        x.execute('UPDATE users SET exp=?, level=?, total_exp=? WHERE id=?', (new_exp, new_level, total, uid))
     
     return new_level
 
-def get_active_items(uid):
+def get_active_items(uid, now=None):
     """Get all active items for a user"""
-    c=_c(); x=c.cursor()
-    now = int(time.time())
-    
-    # Get active items that haven't expired
-    x.execute('''SELECT ai.*, it.name, it.boost_exp_pct, it.boost_crystal_pct, it.rarity
-                 FROM active_items ai
-                 JOIN items it ON ai.item_id = it.id
-                 WHERE ai.user_id=? AND ai.expires_at > ?''', (uid, now))
-    r = [dict(row) for row in x.fetchall()]
-    c.close()
-    return r
-
-def activate_item(uid, inventory_id):
-    """Activate an item from inventory"""
-    c=_c(); x=c.cursor()
-    
-    # Get the item from inventory
-    x.execute('''SELECT i.*, it.rarity
-                 FROM inventory i
-                 JOIN items it ON i.item_id = it.id
-                 WHERE i.id=? AND i.user_id=?''', (inventory_id, uid))
-    inv_item = x.fetchone()
-    
-    if not inv_item:
-        c.close()
+    now = int(time.time()) if now is None else int(now)
+    with _tx() as x:
+        # Get active items that haven't expired
+        x.execute('''SELECT * FROM active_items
+                     WHERE user_id=? AND expires_at > ?''', (uid, now))
+        rows = [_with_item(row, 'name', 'boost_exp_pct', 'boost_crystal_pct', 'rarity') for row in x.fetchall()]
+        return [r for r in rows if r]
+
+# Bumped whenever this process adds an active_items row for a user, so
+# boosts.BOOSTS reloads that user (like CATALOG with items_version()).
+_active_versions = {}
+
+def active_items_version(uid):
+    """Changes whenever this process activates an item for `uid` (or DB_PATH changes)."""
+    return (DB_PATH, _active_versions.get(uid, 0))
+
+def activate_item(uid, item_id):
+    """Use one copy of an item from the user's stack and activate its boost"""
+    item = CATALOG.get(item_id)
+    if not item:
         return False, "Item not found"
-    
-    inv_item = dict(inv_item)
-    
-    # Check if item is already active
-    now = int(time.time())
-    x.execute('''SELECT COUNT(*) as cnt FROM active_items 
-                 WHERE user_id=? AND item_id=? AND expires_at > ?''', 
-              (uid, inv_item['item_id'], now))
-    if x.fetchone()['cnt'] > 0:
-        c.close()
-        return False, "Item already active"
-    
-    # Determine duration based on rarity (Bronze: 10min, Silver: 30min, Gold: 60min)
-    durations = {'bronze': 10*60, 'silver': 30*60, 'gold': 60*60}
-    duration = durations.get(inv_item['rarity'], 10*60)
-    expires_at = now + duration
-    
-    # Activate item
-    x.execute('''INSERT INTO active_items(user_id, item_id, activated_at, expires_at)
-                 VALUES (?, ?, ?, ?)''', (uid, inv_item['item_id'], now, expires_at))
-    
-    c.commit()
-    c.close()
+    with _tx(immediate=True) as x:
+        # Check if item is already active
+        now = int(time.time())
+        x.execute('''SELECT COUNT(*) as cnt FROM active_items 
+                     WHERE user_id=? AND item_id=? AND expires_at > ?''', 
+                  (uid, item_id, now))
+        if x.fetchone()['cnt'] > 0:
+            return False, "Item already active"
+        
+        # Take one copy off the stack; the row goes away with the last copy
+        x.execute('''UPDATE inventory_stacks SET quantity=quantity-1
+                     WHERE user_id=? AND item_id=? AND quantity>0''', (uid, item_id))
+        if x.rowcount != 1:
+            return False, "Item not found"
+        x.execute('DELETE FROM inventory_stacks WHERE user_id=? AND item_id=? AND quantity<=0', (uid, item_id))
+        
+        # Determine duration based on rarity (Bronze: 10min, Silver: 30min, Gold: 60min)
+        durations = {'bronze': 10*60, 'silver': 30*60, 'gold': 60*60}
+        duration = durations.get(item['rarity'], 10*60)
+        expires_at = now + duration
+        
+        # Activate item
+        x.execute('''INSERT INTO active_items(user_id, item_id, activated_at, expires_at)
+                     VALUES (?, ?, ?, ?)''', (uid, item_id, now, expires_at))
+    _active_versions[uid] = _active_versions.get(uid, 0) + 1
     return True, "Item activated!"
 
 def clean_expired_items(uid):
     """Remove expired items"""
-    c=_c(); x=c.cursor()
     now = int(time.time())
-    x.execute('DELETE FROM active_items WHERE user_id=? AND expires_at <= ?', (uid, now))
-    c.commit()
-    c.close()
+    with _tx() as x:
+        x.execute('DELETE FROM active_items WHERE user_id=? AND expires_at <= ?', (uid, now))
+
+def clean_expired_items_many(rows, path=None):
+    """Batched clean_expired_items: `rows` is [(user_id, cutoff timestamp), ...].
+
+    `path` names the database the rows came from when it may no longer be
+    DB_PATH; it then gets a short-lived connection of its own.
+    """
+    sql = 'DELETE FROM active_items WHERE user_id=? AND expires_at <= ?'
+    if path is not None and path != DB_PATH:
+        c = open_connection(path, _conns.profile)
+        try:
+            c.execute('BEGIN IMMEDIATE')
+            c.executemany(sql, rows)
+            c.execute('COMMIT')
+        finally:
+            c.close()
+        return
+    with _tx() as x:
+        x.executemany(sql, rows)
 
 def backfill_achievement_progress(uid):
-    """Backfill progress for achievements based on existing data"""
-    c=_c(); x=c.cursor()
-    
-    # Get existing user data
-    x.execute('SELECT * FROM users WHERE id=?', (uid,))
-    user = x.fetchone()
-    if not user:
-        c.close()
-        return
-    
-    user = dict(user)
-    
-    # Backfill study time achievements
-    total_study_minutes = get_total_study_minutes(uid)
-    if total_study_minutes > 0:
-        study_achievements = ['Getting Started', 'Study Rookie', 'Study Novice', 'Study Apprentice', 
-                            'Study Warrior', 'Study Expert', 'Study Master', 'Study Grandmaster', 
-                            'Study Legend', 'Study Mythic', 'Study God']
-        for ach_name in study_achievements:
-            x.execute('UPDATE achievements SET progress=? WHERE user_id=? AND name=? AND progress=0',
-                     (total_study_minutes, uid, ach_name))
-    
-    # Backfill crystal achievements
-    total_crystals = get_total_crystals_earned(uid)
-    if total_crystals > 0:
-        crystal_achievements = ['Pocket Change', 'Crystal Collector', 'Crystal Hoarder', 
-                               'Crystal Tycoon', 'Crystal Magnate', 'Crystal Emperor']
-        for ach_name in crystal_achievements:
-            x.execute('UPDATE achievements SET progress=? WHERE user_id=? AND name=? AND progress=0',
-                     (total_crystals, uid, ach_name))
-    
-    # Backfill level achievements
-    level = user.get('level', 1)
-    if level > 1:
-        level_achievements = ['Level 5', 'Level 10', 'Level 25', 'Level 50', 'Level 100']
-        for ach_name in level_achievements:
-            x.execute('UPDATE achievements SET progress=? WHERE user_id=? AND name=? AND progress=0',
-                     (level, uid, ach_name))
-    
-    # Backfill collection achievements
-    inventory = get_inventory(uid)
-    if len(inventory) > 0:
-        total_items = len(inventory)
-        unique_items = len(set(i['item_id'] for i in inventory))
+    """Recompute every metric derivable from stored data and refresh achievement progress"""
+    with _tx() as x:
+        x.execute('SELECT level FROM users WHERE id=?', (uid,))
+        user = x.fetchone()
+        if not user:
+            return
         
-        x.execute('UPDATE achievements SET progress=? WHERE user_id=? AND name=? AND progress=0',
-                 (unique_items, uid, 'Collector'))
-        x.execute('UPDATE achievements SET progress=? WHERE user_id=? AND name=? AND progress=0',
-                 (unique_items, uid, 'Treasure Hunter'))
-        x.execute('UPDATE achievements SET progress=? WHERE user_id=? AND name=? AND progress=0',
-                 (total_items, uid, 'Hoarder'))
-        x.execute('UPDATE achievements SET progress=? WHERE user_id=? AND name=? AND progress=0',
-                 (total_items, uid, 'Item Master'))
-    
-    # Check and mark completed achievements
-    x.execute('SELECT * FROM achievements WHERE user_id=? AND completed=0', (uid,))
-    achievements = x.fetchall()
-    for ach in achievements:
-        ach = dict(ach)
-        if ach['progress'] >= ach['goal']:
-            now = int(time.time())
-            x.execute('UPDATE achievements SET completed=1, completed_at=? WHERE id=?',
-                     (now, ach['id']))
-    
-    c.commit()
-    c.close()
+        st = get_user_stats(uid)
+        x.execute('''SELECT COUNT(*) AS s60, COALESCE(SUM(duration_minutes>=90),0) AS s90
+                     FROM study_sessions WHERE user_id=? AND duration_minutes>=60''', (uid,))
+        s = x.fetchone()
+        total, uniq = inventory_counts(uid)
+        
+        # Counters with no stored history (activations, gold pulls) are left as they are
+        ACH.record(x, uid, {
+            ACH.SESSION_COUNT: st['session_count'],
+            ACH.TOTAL_MINUTES: st['total_minutes'],
+            ACH.TOTAL_CRYSTALS: st['total_crystals'],
+            ACH.ROLL_COUNT: st['roll_count'],
+            ACH.STREAK_DAYS: st['longest_streak'],
+            ACH.SESSIONS_60: s['s60'],
+            ACH.SESSIONS_90: s['s90'],
+            ACH.LEVEL: user['level'] or 1,
+            ACH.TOTAL_ITEMS: total,
+            ACH.UNIQUE_ITEMS: uniq,
+        }, int(time.time()))
+
+
+def _in(names):
+    return ','.join('?'*len(names))
+
+
+@dataclass
+class StudyReward:
+    """What complete_study_session() granted, for the UI to display."""
+    minutes: int
+    crystals_earned: int
+    exp_earned: int
+    crystal_bonus_pct: int
+    exp_bonus_pct: int
+    crystals: int
+    exp: int
+    level: int
+    leveled_up: bool
+    completed_achievements: list = field(default_factory=list)
+
+def complete_study_session(uid, minutes, now=None, boosts=None):
+    """Record a finished study session and apply its whole reward in one transaction.
+
+    Writes the session row, credits crystals and EXP (with active boosts),
+    handles level-ups and updates every affected achievement with one
+    UPDATE per metric (see achievements.py), then commits once. `boosts`
+    is an (exp_pct, crystal_pct) pair from boosts.BOOSTS; without it the
+    active boosts are read from active_items.
+    """
+    now = int(time.time()) if now is None else int(now)
+    with _tx(immediate=True) as x:
+        if boosts is None:
+            x.execute('SELECT item_id FROM active_items WHERE user_id=? AND expires_at > ?', (uid, now))
+            items = [it for it in (CATALOG.get(r['item_id']) for r in x.fetchall()) if it]
+            boosts = (sum(it['boost_exp_pct'] or 0 for it in items),
+                      sum(it['boost_crystal_pct'] or 0 for it in items))
+        exp_bonus, crystal_bonus = boosts
+
+        # 1 crystal / 1 EXP per minute, plus active boosts
+        crystals_earned = minutes + int(minutes * crystal_bonus / 100)
+        exp_earned = minutes + int(minutes * exp_bonus / 100)
+
+        stats = _log_session(x, uid, minutes, crystals_earned, now)
+        WALLET.credit(x, uid, crystals_earned, 'study', now=now)
+        x.execute('SELECT level FROM users WHERE id=?', (uid,))
+        row = x.fetchone()
+        old_level = row['level'] if row else 1
+        level = update_exp(uid, exp_earned)
+        x.execute('SELECT crystals, exp FROM users WHERE id=?', (uid,))
+        user = x.fetchone()
+
+        x.execute('SELECT name FROM achievements WHERE user_id=? AND completed=0', (uid,))
+        pending = {r['name'] for r in x.fetchall()}
+
+        ACH.bump(x, uid, {ACH.SESSIONS_60: int(minutes >= 60),
+                          ACH.SESSIONS_90: int(minutes >= 90)}, now)
+        ACH.record(x, uid, {ACH.SESSION_COUNT: stats['session_count'],
+                            ACH.TOTAL_MINUTES: stats['total_minutes'],
+                            ACH.TOTAL_CRYSTALS: stats['total_crystals'],
+                            ACH.STREAK_DAYS: stats['longest_streak'],
+                            ACH.LEVEL: level}, now)
+
+        done = []
+        if pending:
+            x.execute(f'SELECT name FROM achievements WHERE user_id=? AND completed=1 AND name IN ({_in(pending)})',
+                      (uid, *pending))
+            done = [r['name'] for r in x.fetchall()]
+
+    return StudyReward(minutes=minutes, crystals_earned=crystals_earned, exp_earned=exp_earned,
+                       crystal_bonus_pct=crystal_bonus, exp_bonus_pct=exp_bonus,
+                       crystals=user['crystals'] if user else 0, exp=user['exp'] if user else 0,
+                       level=level, leveled_up=level > old_level, completed_achievements=done)
+
+
+def bump_metric(uid, metric, by=1):
+    """Advance a counter metric (e.g. ACH.ITEMS_USED) for a user."""
+    with _tx() as x:
+        ACH.bump(x, uid, {metric: by}, int(time.time()))
+
+def record_gacha_rolls(uid, items):
+    """Roll-count, collection and Lucky Strike bookkeeping after gacha pulls added `items`."""
+    now = int(time.time())
+    with _tx() as x:
+        total, uniq = inventory_counts(uid)
+        x.execute('''INSERT INTO user_stats(user_id, roll_count) VALUES (?, ?)
+                     ON CONFLICT(user_id) DO UPDATE SET roll_count=roll_count+excluded.roll_count''', (uid, len(items)))
+        x.execute('SELECT roll_count FROM user_stats WHERE user_id=?', (uid,))
+        rolls = x.fetchone()['roll_count']
+        ACH.bump(x, uid, {ACH.GOLD_ITEMS: sum(1 for it in items if it.get('rarity') == 'gold')}, now)
+        ACH.record(x, uid, {ACH.ROLL_COUNT: rolls, ACH.TOTAL_ITEMS: total, ACH.UNIQUE_ITEMS: uniq}, now)
+
+def get_pity(uid, tier):
+    """(rare_stacks, epic_stacks): pulls since the last rare/epic from this tier (gacha.py)."""
+    with _tx() as x:
+        x.execute('SELECT rare_stacks, epic_stacks FROM gacha_pity WHERE user_id=? AND tier=?', (uid, tier))
+        r = x.fetchone()
+        return (r['rare_stacks'], r['epic_stacks']) if r else (0, 0)
@@ -0,0 +1,216 @@
+"""Long-lived SQLite connections for db.py.
+
+Opening a sqlite3 connection costs far more than the tiny queries the app
+runs, so connections are kept open and reused: one per thread by default,
+or borrowed from a bounded pool for worker threads when one is configured.
+All access goes through ConnectionManager.transaction(), which nests, so a
+helper can call other helpers and everything commits once at the outermost
+level. Every connection gets the PRAGMA profile from studysaga.dbprofiles
+(WAL, synchronous, cache size, ...) when it is opened.
+"""
+import sqlite3, threading, queue
+from contextlib import contextmanager
+from studysaga.dbprofiles import apply_profile
+
+
+def open_connection(path, profile=None):
+    """A new connection to `path` set up like the managed ones (caller closes it)."""
+    # isolation_level=None: we issue BEGIN/COMMIT ourselves in transaction().
+    # check_same_thread=False so pooled connections can move between workers
+    # and close_all() can run from any thread.
+    c = sqlite3.connect(path, isolation_level=None, check_same_thread=False)
+    c.row_factory = sqlite3.Row
+    apply_profile(c, profile)
+    return c
+
+
+class ConnectionPool:
+    """Bounded set of connections shared between worker threads."""
+
+    def __init__(self, path, size=4, timeout=None, profile=None):
+        self.path = path
+        self.profile = profile
+        self.size = max(1, int(size))
+        self.timeout = timeout
+        self._idle = queue.LifoQueue()
+        self._created = 0
+        self._all = []
+        self._generation = 0    # bumped by close(); connections from older ones are not reused
+        self._born = {}         # connection -> generation it was opened in
+        self._lock = threading.Lock()
+
+    def acquire(self):
+        """Return an idle connection, opening one if under the size limit.
+
+        Blocks (up to ``timeout`` seconds) when every connection is in use;
+        raises queue.Empty if the timeout expires.
+        """
+        try:
+            return self._idle.get_nowait()
+        except queue.Empty:
+            pass
+        with self._lock:
+            if self._created < self.size:
+                c = open_connection(self.path, self.profile)
+                self._created += 1
+                self._all.append(c)
+                self._born[c] = self._generation
+                return c
+        return self._idle.get(timeout=self.timeout)
+
+    def release(self, c):
+        """Return a borrowed connection; one borrowed before close() is closed instead."""
+        with self._lock:
+            if self._born.get(c) == self._generation:
+                self._idle.put(c)
+                return
+        try: c.close()
+        except sqlite3.Error: pass
+
+    def close(self):
+        """Close the idle connections; borrowed ones are closed when released."""
+        with self._lock:
+            idle, self._idle = self._idle, queue.LifoQueue()
+            self._all = []
+            self._born = {}
+            self._created = 0
+            self._generation += 1
+        while True:
+            try:
+                c = idle.get_nowait()
+            except queue.Empty:
+                break
+            try: c.close()
+            except sqlite3.Error: pass
+
+
+class ConnectionManager:
+    """Hands out reusable connections and nestable transactions.
+
+    ``path`` may be a string or a zero-argument callable, so callers that
+    swap the database file at runtime (tests, tools) are picked up on the
+    next transaction. ``pool_size`` > 0 makes threads other than the main
+    thread borrow from a ConnectionPool instead of keeping their own.
+    ``profile`` names the PRAGMA profile (see studysaga.dbprofiles).
+    """
+
+    def __init__(self, path, pool_size=0, pool_timeout=None, profile=None):
+        self._path = path
+        self.profile = profile
+        self._local = threading.local()
+        self._lock = threading.Lock()
+        self._owned = []
+        self._generation = 0    # bumped by close_all(); threads reopen older connections
+        self._active = 0        # outermost transactions in progress, on any thread
+        self._pool = None
+        self.pool_size = pool_size
+        self.pool_timeout = pool_timeout
+
+    @property
+    def path(self):
+        return self._path() if callable(self._path) else self._path
+
+    def configure_pool(self, size, timeout=None):
+        """Enable (size > 0) or disable (size 0) the worker-thread pool."""
+        with self._lock:
+            if self._pool is not None:
+                self._pool.close()
+                self._pool = None
+            self.pool_size = size
+            self.pool_timeout = timeout
+
+    def configure_profile(self, profile):
+        """Switch PRAGMA profile; open connections are closed and reopened lazily."""
+        self.close_all()
+        self.profile = profile
+
+    def connection(self):
+        """Return this thread's connection, reopening it if the path changed."""
+        loc = self._local
+        path = self.path
+        c = getattr(loc, "conn", None)
+        if c is not None and loc.path == path and loc.generation == self._generation:
+            return c
+        if c is not None:
+            self._discard(c)
+        c = open_connection(path, self.profile)
+        loc.conn, loc.path, loc.generation = c, path, self._generation
+        with self._lock:
+            self._owned.append(c)
+        return c
+
+    def _discard(self, c):
+        with self._lock:
+            if c in self._owned:
+                self._owned.remove(c)
+        try: c.close()
+        except sqlite3.Error: pass
+
+    def _get_pool(self, path):
+        with self._lock:
+            if self._pool is None or self._pool.path != path:
+                if self._pool is not None:
+                    self._pool.close()
+                self._pool = ConnectionPool(path, self.pool_size, self.pool_timeout, self.profile)
+            return self._pool
+
+    def _pooled(self):
+        return self.pool_size > 0 and threading.current_thread() is not threading.main_thread()
+
+    @contextmanager
+    def transaction(self, immediate=False):
+        """Yield a cursor inside a transaction; commit on exit, roll back on error.
+
+        Nested calls on the same thread join the outer transaction. Pass
+        ``immediate=True`` for read-modify-write sequences so the write lock
+        is taken up front instead of on the first write; a nested call can
+        only ask for it if the outermost one took it (RuntimeError otherwise).
+        """
+        loc = self._local
+        if getattr(loc, "depth", 0):
+            if immediate and not loc.immediate:
+                raise RuntimeError("transaction(immediate=True) nested in a deferred transaction")
+            loc.depth += 1
+            try:
+                yield loc.active.cursor()
+            finally:
+                loc.depth -= 1
+            return
+
+        pool = self._get_pool(self.path) if self._pooled() else None
+        c = pool.acquire() if pool else self.connection()
+        with self._lock:
+            self._active += 1
+        try:
+            c.execute("BEGIN IMMEDIATE" if immediate else "BEGIN")
+            loc.active, loc.depth, loc.immediate = c, 1, immediate
+            yield c.cursor()
+            c.execute("COMMIT")
+        except BaseException:
+            if c.in_transaction:
+                c.execute("ROLLBACK")
+            raise
+        finally:
+            loc.active, loc.depth, loc.immediate = None, 0, False
+            with self._lock:
+                self._active -= 1
+            if pool:
+                pool.release(c)
+
+    def close_all(self):
+        """Close every connection this manager has opened.
+
+        Raises RuntimeError while any thread is inside transaction(); each
+        thread opens a fresh connection on its next call.
+        """
+        with self._lock:
+            if self._active:
+                raise RuntimeError(f"close_all() with {self._active} transaction(s) in progress")
+            owned, self._owned = self._owned, []
+            pool, self._pool = self._pool, None
+            self._generation += 1
+        for c in owned:
+            try: c.close()
+            except sqlite3.Error: pass
+        if pool is not None:
+            pool.close()
@@ -7,36 +7,73 @@ WEIGHTS = {'bronze':[0.85,0.13,0.02], 'silver':[0.70,0.25,0.05], 'gold':[0.55,0.
 PITY_RARE={'bronze':10, 'silver':7, 'gold':5}
 PITY_EPIC={'bronze':30, 'silver':20, 'gold':10}
 
-def roll(user_id: int, tier: str) -> Tuple[bool, Optional[dict], str, dict]:
-    cost=COSTS.get(tier,10)
-    if not DB.spend_crystals(user_id, cost):
-        return False, None, "Not enough crystals.", {}
-    pool=DB.pool_by_tier(tier)
-    if not pool: return False, None, "No items in pool.", {}
+# items.rarity is stored by name; pity works on groups (1 common, 2 rare, 3 epic+)
+RARITY_GROUP={'bronze':1, 'silver':2, 'gold':3}
+
+def rarity_group(item: dict) -> int:
+    r=item['rarity']
+    return min(max(r,1),3) if isinstance(r,int) else RARITY_GROUP.get(r,1)
+
+def pick_group(tier: str, pr: int, pe: int, groups: dict, rng=random) -> int:
+    """Rarity group for the next pull (1 common, 2 rare, 3 epic+).
 
-    pr,pe = DB.get_pity(user_id, tier)
+    pr/pe are pulls since the last rare/epic; `groups` maps group -> items
+    (only emptiness matters). Pity forces the group once a counter is about
+    to reach PITY_RARE/PITY_EPIC.
+    """
     force_rare = pr+1>=PITY_RARE.get(tier,10)
     force_epic = pe+1>=PITY_EPIC.get(tier,30)
 
     weights=WEIGHTS.get(tier,[0.8,0.18,0.02])
-    groups={1:[i for i in pool if i['rarity']==1],
-            2:[i for i in pool if i['rarity']==2],
-            3:[i for i in pool if i['rarity']>=3]}
-
     if force_epic and groups[3]:
-        grp=3
-    elif force_rare and (groups[2] or groups[3]):
-        grp=2 if groups[2] else 3
-    else:
-        grp = random.choices([1,2,3], weights=weights, k=1)[0]
-        if not groups.get(grp):
-            grp = 1 if groups[1] else (2 if groups[2] else 3)
-
-    item = random.choice(groups.get(grp, pool))
-    DB.add_item_to_inventory(user_id, item['id'])
-    DB.update_pity(user_id, tier, item['rarity'])
-    if item['rarity']>=3: DB.grant_achievement(user_id, "RARE_FIND")
-
-    pity = {"rare":PITY_RARE.get(tier,10), "rare_stacks": pr+1 if item['rarity']<2 else 0,
-            "epic":PITY_EPIC.get(tier,30), "epic_stacks": pe+1 if item['rarity']<3 else 0}
+        return 3
+    if force_rare and (groups[2] or groups[3]):
+        return 2 if groups[2] else 3
+    grp = rng.choices([1,2,3], weights=weights, k=1)[0]
+    if not groups.get(grp):
+        grp = 1 if groups[1] else (2 if groups[2] else 3)
+    return grp
+
+def next_pity(pr: int, pe: int, rarity: int) -> Tuple[int, int]:
+    """Pity counters after pulling an item of `rarity`."""
+    return (0 if rarity>=2 else pr+1), (0 if rarity>=3 else pe+1)
+
+# Pool plus this user's pity counters for the tier, in one read.
+_POOL_SQL = '''SELECT it.*, p.rare_stacks AS _rare_stacks, p.epic_stacks AS _epic_stacks
+                FROM items it LEFT JOIN gacha_pity p ON p.user_id=? AND p.tier=?'''
+
+def roll(user_id: int, tier: str) -> Tuple[bool, Optional[dict], str, dict]:
+    """Pay for, draw and grant one pull, updating the pity counters.
+
+    Everything happens in one BEGIN IMMEDIATE transaction, so concurrent
+    rolls for the same user can neither overspend nor lose a pity step.
+    """
+    cost=COSTS.get(tier,10)
+    with DB._tx(immediate=True) as x:
+        x.execute(_POOL_SQL, (user_id, tier))
+        pool=[dict(r) for r in x.fetchall()]
+        if not pool: return False, None, "No items in pool.", {}
+        pr, pe = pool[0]['_rare_stacks'] or 0, pool[0]['_epic_stacks'] or 0
+        for it in pool:
+            del it['_rare_stacks'], it['_epic_stacks']
+
+        if DB.WALLET.debit(x, user_id, cost, "gacha", ref=tier) is None:
+            return False, None, "Not enough crystals.", {}
+
+        groups={1:[],2:[],3:[]}
+        for it in pool:
+            groups[rarity_group(it)].append(it)
+        grp = pick_group(tier, pr, pe, groups)
+        item = random.choice(groups.get(grp) or pool)
+
+        pr, pe = next_pity(pr, pe, rarity_group(item))
+        DB.add_to_inventory(user_id, item['id'])
+        x.execute('''INSERT INTO gacha_pity(user_id, tier, rare_stacks, epic_stacks) VALUES (?, ?, ?, ?)
+                     ON CONFLICT(user_id, tier) DO UPDATE SET rare_stacks=excluded.rare_stacks,
+                                                              epic_stacks=excluded.epic_stacks''',
+                  (user_id, tier, pr, pe))
+        DB.record_gacha_rolls(user_id, [item])
+
+    pity = {"rare":PITY_RARE.get(tier,10), "rare_stacks": pr,
+            "epic":PITY_EPIC.get(tier,30), "epic_stacks": pe}
     return True, item, "Success", pity
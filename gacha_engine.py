@@ -0,0 +1,116 @@
+"""Gacha draws for the main app (bronze/silver/gold chests).
+
+Each tier's rarity odds and the item pool are folded into one Walker alias
+table per (tier, item-pool version), built once and then sampled in O(1)
+per pull. roll_many() pays for, draws and grants any number of pulls in a
+single transaction.
+"""
+import random, time
+import db as DB
+
+COSTS = {"bronze": 10, "silver": 30, "gold": 60}
+
+# Rarity odds (percent) per chest tier.
+RATES = {
+    "bronze": {"bronze": 90, "silver": 9, "gold": 1},
+    "silver": {"bronze": 70, "silver": 25, "gold": 5},
+    "gold": {"bronze": 50, "silver": 40, "gold": 10},
+}
+
+
+class AliasTable:
+    """Walker/Vose alias table: O(n) to build, O(1) per sample."""
+
+    def __init__(self, weights):
+        n = len(weights)
+        if n == 0:
+            raise ValueError("AliasTable needs at least one weight")
+        total = float(sum(weights))
+        scaled = [w * n / total for w in weights]
+        self.prob = [0.0] * n
+        self.alias = list(range(n))
+        small = [i for i, p in enumerate(scaled) if p < 1.0]
+        large = [i for i, p in enumerate(scaled) if p >= 1.0]
+        while small and large:
+            s, l = small.pop(), large.pop()
+            self.prob[s] = scaled[s]
+            self.alias[s] = l
+            scaled[l] -= 1.0 - scaled[s]
+            (small if scaled[l] < 1.0 else large).append(l)
+        for i in small + large:
+            self.prob[i] = 1.0
+
+    def sample(self, rng=random):
+        i = int(rng.random() * len(self.prob))
+        return i if rng.random() < self.prob[i] else self.alias[i]
+
+
+def item_weights(tier, items):
+    """Probability of each item for a tier.
+
+    A rarity is picked with the tier's odds, then an item of that rarity
+    uniformly; if a rarity has no items, any item is picked uniformly instead
+    (the same fallback do_gacha always had).
+    """
+    rates = RATES.get(tier, RATES["bronze"])
+    by_rarity = {}
+    for it in items:
+        by_rarity.setdefault(it["rarity"], []).append(it)
+    total = float(sum(rates.values()))
+    weights = [0.0] * len(items)
+    for rarity, pct in rates.items():
+        members = by_rarity.get(rarity)
+        p = pct / total
+        for i, it in enumerate(items):
+            if members:
+                if it["rarity"] == rarity:
+                    weights[i] += p / len(members)
+            else:
+                weights[i] += p / len(items)
+    return weights
+
+
+class GachaEngine:
+    def __init__(self, rng=None):
+        self.rng = rng or random
+        self._tables = {}   # tier -> (items_version, items, AliasTable)
+
+    def _table(self, tier):
+        version = DB.items_version()
+        cached = self._tables.get(tier)
+        if cached and cached[0] == version:
+            return cached[1], cached[2]
+        items = DB.get_items()
+        table = AliasTable(item_weights(tier, items)) if items else None
+        self._tables[tier] = (version, items, table)
+        return items, table
+
+    def draw(self, tier, n=1):
+        """n items drawn for a tier, without touching the user's state."""
+        items, table = self._table(tier)
+        if not table:
+            return []
+        return [items[table.sample(self.rng)] for _ in range(n)]
+
+    def roll_many(self, uid, tier, n=1):
+        """Pay for and grant n pulls in one transaction.
+
+        Returns (ok, items, crystals): ok is False (and nothing changes) if
+        the user cannot afford n pulls or the item pool is empty.
+        """
+        cost = COSTS.get(tier, COSTS["bronze"]) * n
+        now = int(time.time())
+        got = self.draw(tier, n)
+        with DB._tx(immediate=True) as x:
+            left = DB.WALLET.debit(x, uid, cost, "gacha", ref=f"{tier}x{n}", now=now) if got else None
+            if left is None:
+                got = []
+                left = DB.WALLET.balance(x, uid)
+            else:
+                DB.grant_items(uid, [it["id"] for it in got], now)
+                DB.record_gacha_rolls(uid, got)
+        return bool(got), got, left
+
+
+ENGINE = GachaEngine()
+roll_many = ENGINE.roll_many
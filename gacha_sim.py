@@ -0,0 +1,210 @@
+# Seeded Monte-Carlo check of the gacha rate tables. Run:
+#   python gacha_sim.py                 # 1,000,000 pulls per tier, report only
+#   python gacha_sim.py --check         # also exit 1 if a chi-square test fails
+#   python gacha_sim.py --pulls 5000000 --seed 7
+#
+# Three rate tables exist in the tree and all are simulated from their own
+# constants:
+#   chest  - gacha_engine.RATES (main app, no pity)
+#   pity   - gacha.WEIGHTS with PITY_RARE/PITY_EPIC (gacha.roll)
+#   saga   - studysaga.db.RARITY_WEIGHTS (roll_once/roll_ten)
+# With NumPy installed the draws are vectorized over the same structures the
+# game samples (the AliasTable's prob/alias arrays, _RARITY_CUM; the pity
+# table steps many long chains in lock-step after a burn-in, replaying a
+# sample of steps through pick_group/next_pity); without it the script falls
+# back to the real per-pull functions (AliasTable, gacha.pick_group,
+# _roll_rarity).
+import argparse, random, sys, time
+from collections import namedtuple
+
+try:
+    import numpy as np
+except Exception:
+    np = None
+
+import gacha as PITY
+import gacha_engine as CHEST
+from studysaga import db as SAGA
+
+# chi-square critical values at p = 0.001, by degrees of freedom
+CHI2_CRIT = {1: 10.828, 2: 13.816, 3: 16.266, 4: 18.467}
+
+SimResult = namedtuple("SimResult", "system tier cost labels configured counts tested pity_triggers seconds")
+
+
+def _norm(ws):
+    t = float(sum(ws))
+    return [w / t for w in ws]
+
+
+def simulate_chest(tier, pulls, seed):
+    labels = ["bronze", "silver", "gold"]
+    p = _norm([CHEST.RATES[tier][r] for r in labels])
+    pool = [{"id": i, "rarity": r} for r in labels for i in range(5)]
+    table = CHEST.AliasTable(CHEST.item_weights(tier, pool))
+    t0 = time.perf_counter()
+    if np is not None:
+        # AliasTable.sample, vectorized over the table's own prob/alias arrays
+        rng = np.random.default_rng(seed)
+        prob, alias = np.array(table.prob), np.array(table.alias)
+        col = (rng.random(pulls) * len(prob)).astype(np.int64)
+        item = np.where(rng.random(pulls) < prob[col], col, alias[col])
+        rarity = np.array([labels.index(it["rarity"]) for it in pool])
+        counts = np.bincount(rarity[item], minlength=3).tolist()
+    else:
+        rng = random.Random(seed)
+        counts = [0, 0, 0]
+        for _ in range(pulls):
+            counts[labels.index(pool[table.sample(rng)]["rarity"])] += 1
+    return SimResult("chest", tier, CHEST.COSTS[tier], labels, p, counts, counts, 0,
+                     time.perf_counter() - t0)
+
+
+class _FixedDraw(random.Random):
+    """Random whose random() returns `u`, to replay one vectorized draw through pick_group."""
+
+    def __init__(self, u):
+        super().__init__()
+        self.u = u
+
+    def random(self):
+        return self.u
+
+
+def _check_pity_steps(tier, pr, pe, u, grp, groups):
+    """Raise if a vectorized pity step differs from gacha.pick_group/next_pity."""
+    for i in range(len(u)):
+        want = PITY.pick_group(tier, int(pr[i]), int(pe[i]), groups, _FixedDraw(float(u[i])))
+        if want != grp[i]:
+            raise AssertionError(f"pity/{tier}: step (pr={pr[i]}, pe={pe[i]}, u={u[i]}) "
+                                 f"gave group {grp[i]}, pick_group says {want}")
+
+
+def simulate_pity(tier, pulls, seed, players=1000, burn_in=None, check_players=16):
+    """Pity table; `tested` holds only pulls where pity did not force the group.
+
+    The NumPy path steps `players` independent chains; the first `burn_in`
+    pulls of each (default 10 epic-pity cycles) are discarded so the counts
+    come from the chains' steady state, like one long pure-Python chain.
+    The first `check_players` chains are replayed through pick_group and
+    next_pity at every step.
+    """
+    labels = ["common", "rare", "epic+"]
+    p = _norm(PITY.WEIGHTS[tier])
+    pr_cap, pe_cap = PITY.PITY_RARE[tier], PITY.PITY_EPIC[tier]
+    groups = {1: [None], 2: [None], 3: [None]}
+    t0 = time.perf_counter()
+    if np is not None:
+        players = max(1, min(players, pulls))
+        steps = -(-pulls // players)
+        pulls = players * steps
+        burn_in = 10 * pe_cap if burn_in is None else burn_in
+        rng = np.random.default_rng(seed)
+        cw = np.cumsum(PITY.WEIGHTS[tier])
+        pr = np.zeros(players, np.int64); pe = np.zeros(players, np.int64)
+        counts = np.zeros(4, np.int64); tested = np.zeros(4, np.int64); forced = 0
+        for step in range(burn_in + steps):
+            u = rng.random(players)
+            f_epic = pe + 1 >= pe_cap
+            f_rare = (pr + 1 >= pr_cap) & ~f_epic
+            # random.choices: bisect_right(cum_weights, random() * total), capped at the last group
+            grp = np.minimum(1 + np.searchsorted(cw, u * cw[-1], side="right"), 3)
+            free = ~(f_epic | f_rare)
+            grp = np.where(f_epic, 3, np.where(f_rare, 2, grp))
+            k = check_players
+            _check_pity_steps(tier, pr[:k], pe[:k], u[:k], grp[:k], groups)
+            npr = np.where(grp >= 2, 0, pr + 1)
+            npe = np.where(grp >= 3, 0, pe + 1)
+            for i in range(min(k, players)):
+                if PITY.next_pity(int(pr[i]), int(pe[i]), int(grp[i])) != (npr[i], npe[i]):
+                    raise AssertionError(f"pity/{tier}: counters after group {grp[i]} differ from next_pity")
+            pr, pe = npr, npe
+            if step >= burn_in:
+                tested += np.bincount(grp[free], minlength=4)
+                counts += np.bincount(grp, minlength=4)
+                forced += int(players - free.sum())
+        counts, tested = counts[1:].tolist(), tested[1:].tolist()
+    else:
+        rng = random.Random(seed)
+        counts = [0, 0, 0]; tested = [0, 0, 0]; forced = 0
+        pr = pe = 0
+        for _ in range(pulls):
+            free = pr + 1 < pr_cap and pe + 1 < pe_cap
+            grp = PITY.pick_group(tier, pr, pe, groups, rng)
+            counts[grp - 1] += 1
+            if free: tested[grp - 1] += 1
+            else: forced += 1
+            pr, pe = PITY.next_pity(pr, pe, grp)
+    return SimResult("pity", tier, PITY.COSTS[tier], labels, p, counts, tested, forced,
+                     time.perf_counter() - t0)
+
+
+def simulate_saga(pulls, seed):
+    labels = [name for name, _ in SAGA.RARITY_WEIGHTS]
+    p = _norm([w for _, w in SAGA.RARITY_WEIGHTS])
+    t0 = time.perf_counter()
+    if np is not None:
+        # _roll_rarity: bisect_left over _RARITY_CUM, capped at the last name
+        cum = np.array(SAGA._RARITY_CUM, dtype=float)
+        u = np.random.default_rng(seed).uniform(0, cum[-1], size=pulls)
+        idx = np.minimum(np.searchsorted(cum, u, side="left"), len(labels) - 1)
+        counts = np.bincount(idx, minlength=len(labels)).tolist()
+    else:
+        random.seed(seed)   # _roll_rarity draws from the module-level RNG
+        counts = [0] * len(labels)
+        for _ in range(pulls):
+            counts[labels.index(SAGA._roll_rarity())] += 1
+    return SimResult("saga", "single", SAGA.GACHA_COST, labels, p, counts, counts, 0,
+                     time.perf_counter() - t0)
+
+
+def chi_square(res):
+    """(statistic, critical value) for the tested counts against the configured rates."""
+    n = sum(res.tested)
+    stat = sum((o - n * q) ** 2 / (n * q) for o, q in zip(res.tested, res.configured) if q > 0)
+    return stat, CHI2_CRIT[len(res.labels) - 1]
+
+
+def run_all(pulls, seed):
+    out = [simulate_chest(t, pulls, seed) for t in CHEST.RATES]
+    out += [simulate_pity(t, pulls, seed) for t in PITY.WEIGHTS]
+    out.append(simulate_saga(pulls, seed))
+    return out
+
+
+def report(results):
+    failed = 0
+    for r in results:
+        n = sum(r.counts)
+        top = r.counts[-1]
+        chi, crit = chi_square(r)
+        ok = chi <= crit
+        failed += not ok
+        print(f"\n[{r.system}/{r.tier}] {n:,} pulls in {r.seconds:.2f}s ({n / max(r.seconds, 1e-9):,.0f} pulls/s)")
+        print(f"  {'rarity':<10}{'configured':>11}{'observed':>10}")
+        for label, q, c in zip(r.labels, r.configured, r.counts):
+            print(f"  {label:<10}{q:>10.2%}{c / n:>10.2%}")
+        if r.pity_triggers:
+            print(f"  pity triggered on {r.pity_triggers / n:.2%} of pulls")
+        print(f"  crystals per {r.labels[-1]}: {r.cost * n / top:,.1f}" if top else
+              f"  no {r.labels[-1]} pulled")
+        print(f"  chi-square {chi:.2f} (critical {crit}) {'OK' if ok else 'FAIL'}")
+    return failed
+
+
+def main(argv=None):
+    ap = argparse.ArgumentParser(description="Monte-Carlo check of the gacha rate tables")
+    ap.add_argument("--pulls", type=int, default=1_000_000)
+    ap.add_argument("--seed", type=int, default=12345)
+    ap.add_argument("--check", action="store_true", help="exit 1 if any chi-square test fails")
+    args = ap.parse_args(argv)
+    print(f"engine: {'numpy ' + np.__version__ if np is not None else 'pure python'}, seed {args.seed}")
+    failed = report(run_all(args.pulls, args.seed))
+    if args.check and failed:
+        print(f"\n{failed} rate table(s) failed the chi-square check")
+        return 1
+    return 0
+
+
+if __name__ == "__main__":
+    sys.exit(main())
@@ -0,0 +1,48 @@
+"""EXP → level curve with a closed-form inverse.
+
+Players store a lifetime EXP total; level and the EXP shown inside the
+current level are derived from it by the curve, in O(1) no matter how many
+levels a grant crosses.
+"""
+import math
+
+
+class ArithmeticCurve:
+    """Level L → L+1 costs base*L EXP (the original 100, 200, 300, ... curve).
+
+    exp_to_reach(L) = base * L(L-1)/2, so the inverse is the positive root
+    of a quadratic; isqrt keeps it exact for arbitrarily large totals.
+    """
+
+    def __init__(self, base=100):
+        self.base = base
+
+    def exp_to_reach(self, level):
+        """Lifetime EXP needed to be at `level` (level 1 needs 0)."""
+        return self.base * level * (level - 1) // 2
+
+    def level_for_total(self, total):
+        """Highest level whose exp_to_reach() is <= total."""
+        if total <= 0:
+            return 1
+        # largest L with L(L-1) <= 2*total/base; L(L-1) is an integer, so
+        # flooring the right-hand side first keeps this exact
+        q = (2 * total) // self.base
+        return (1 + math.isqrt(1 + 4 * q)) // 2
+
+    def exp_for_next(self, level):
+        """EXP needed to go from `level` to `level + 1`."""
+        return self.exp_to_reach(level + 1) - self.exp_to_reach(level)
+
+    def split(self, total):
+        """(level, exp into that level) for a lifetime total."""
+        level = self.level_for_total(total)
+        return level, total - self.exp_to_reach(level)
+
+    def total(self, level, exp):
+        """Lifetime total for a (level, exp into level) pair."""
+        return self.exp_to_reach(level) + exp
+
+
+# The curve the game uses.
+CURVE = ArithmeticCurve(100)
@@ -0,0 +1,26 @@
+"""Data-model helpers for the recycled lists (inventory, achievements).
+
+The screens hand a RecycleView a list of plain dicts; only the rows on
+screen get widgets. apply_rows() updates that list in place when the rows
+are the same records as before, so a refresh that changes one count only
+re-renders that one row instead of rebuilding the whole view.
+"""
+
+
+def apply_rows(rv, rows, key):
+    """Make rv.data equal `rows`, touching as little as possible.
+
+    Returns the number of rows written: 0 when nothing changed, the number
+    of changed rows when the records (identified by `key`) are the same and
+    in the same order, otherwise len(rows) after a full reassignment.
+    """
+    old = rv.data
+    if len(old) != len(rows) or any(a.get(key) != b.get(key) for a, b in zip(old, rows)):
+        rv.data = rows
+        return len(rows)
+    changed = 0
+    for i, (a, b) in enumerate(zip(old, rows)):
+        if a != b:
+            old[i] = b      # ObservableList: the view refreshes just this index
+            changed += 1
+    return changed
@@ -1,42 +1,38 @@
 
-import os, time, random
+import os, time
 os.environ["KIVY_NO_ARGS"]="1"
 from kivy.core.window import Window
 from kivy.app import App
 from kivy.uix.screenmanager import ScreenManager, Screen, NoTransition
 from kivy.uix.boxlayout import BoxLayout
-from kivy.uix.label import Label
 from kivy.lang import Builder
 
-from kivy.resources import resource_add_path, resource_find
+from kivy.resources import resource_add_path
 from kivy.clock import Clock
 from kivy.uix.progressbar import ProgressBar
+from kivy.properties import StringProperty, ListProperty, BooleanProperty, NumericProperty, ObjectProperty
+
+from studysaga.assets import index_for
 
 # --- Asset path helpers ---
 ASSET_DIR = os.path.join(os.path.dirname(__file__), "attached_assets")
 
+# Listed once; re-listed when the directory changes (or ASSETS.reload())
+ASSETS = index_for(ASSET_DIR)
+
 def _find_asset(prefix: str, exts=(".gif", ".png", ".jpg", ".jpeg")) -> str:
     """Return a path to the first file in attached_assets that starts with prefix (without extension),
-    preferring .gif then .png, etc. Falls back to resource_find('attached_assets/<prefix>.<ext>')."""
-    # Try direct resource_find first for standard names
-    for ext in exts:
-        p = resource_find(f"attached_assets/{prefix}{ext}")
-        if p:
-            return p
-    # Fuzzy match by prefix in ASSET_DIR
-    try:
-        for ext in exts:
-            for f in os.listdir(ASSET_DIR):
-                name = f.lower()
-                if name.startswith(prefix.lower()) and name.endswith(ext):
-                    return os.path.join(ASSET_DIR, f)
-    except Exception:
-        pass
-    # As a last fallback return the literal path (may still work if cwd matches)
-    return ""
+    preferring .gif then .png, etc. Served from the shared asset index ("" if nothing matches)."""
+    return ASSETS.find(prefix, exts)
 
 import db as DB
 import auth as AUTH
+import achievements as ACH
+from leveling import CURVE as LEVELS
+import gacha_engine as GACHA
+from boosts import BOOSTS
+from listview import apply_rows
+from texture_cache import TEXTURES
 
 Window.clearcolor = (0.12,0.13,0.16,1)
 
@@ -71,6 +67,19 @@ class SettingsScreen(Screen):
 class AchievementsScreen(Screen):
     pass
 
+# RecycleView rows (styled in inventory.kv / achievements.kv); fed by plain dicts
+class InventoryRow(BoxLayout):
+    item_id = NumericProperty(0)
+    title = StringProperty("")
+    title_color = ListProperty([1, 1, 1, 1])
+    active = BooleanProperty(False)
+    item = ObjectProperty(None, allownone=True)
+
+class AchievementRow(BoxLayout):
+    name = StringProperty("")
+    desc = StringProperty("")
+    completed = BooleanProperty(False)
+
 # Theme object for KV files
 class Theme:
     bg = (0.12, 0.13, 0.16, 1)
@@ -100,6 +109,9 @@ class StudySagaApp(App):
         resource_add_path(ASSET_DIR)
         DB.bootstrap()
         DB.init_items()
+        BOOSTS.start()
+        # decode the first screen's background off the main thread (the gender one follows at login)
+        TEXTURES.preload([_find_asset("background_home") or _find_asset("background_empty")])
         
         self.sm = ScreenManager(transition=NoTransition())
         
@@ -123,6 +135,10 @@ class StudySagaApp(App):
         self.sm.current = "auth"
         return self.sm
 
+    def on_stop(self):
+        # write out any boost expiries still waiting for the background flush
+        BOOSTS.stop()
+
     def set_gender(self, gender: str):
         """Update the current user's gender and refresh backgrounds."""
         try:
@@ -133,11 +149,11 @@ class StudySagaApp(App):
             # Update study background immediately
             if hasattr(self, "study_screen") and self.study_screen and self.study_screen.ids.get("background_gif"):
                 bg = _find_asset("background_male" if gender=="male" else "background_female")
-                self.study_screen.ids.background_gif.source = bg
+                TEXTURES.show(self.study_screen.ids.background_gif, bg)
             # Update home background as well (if present)
             if hasattr(self, "home") and self.home and self.home.ids.get("background_gif"):
                 home_bg = _find_asset("background_home") or _find_asset("background_empty")
-                self.home.ids.background_gif.source = home_bg
+                TEXTURES.show(self.home.ids.background_gif, home_bg)
             self.set_msg(f"Gender set to {gender}.")
         except Exception as e:
             print("set_gender error:", e)
@@ -199,6 +215,8 @@ class StudySagaApp(App):
             "gender": user.get("gender","female")
         }
         
+        TEXTURES.preload([_find_asset("background_male" if self.profile["gender"] == "male" else "background_female")])
+
         # Initialize achievements if first login
         DB.init_achievements(user["id"])
         
@@ -219,17 +237,16 @@ class StudySagaApp(App):
             self.profile["level"] = user.get("level", 1)
         
         # Update today's goal progress
-        sessions = DB.get_study_sessions(self.profile["id"], days=1)
-        today_minutes = sum(s["duration_minutes"] for s in sessions)
+        today_minutes = DB.get_daily_study(self.profile["id"], days=1)[0]["minutes"]
         goal_minutes = user.get("daily_goal_minutes", 60)
         
         # Calculate EXP for next level
-        exp_needed = 100 * self.profile["level"]
+        exp_needed = LEVELS.exp_for_next(self.profile["level"])
         
         try:
             # Ensure home background is set (gif/png tolerant)
             try:
-                self.home.ids.background_gif.source = _find_asset('background_home') or _find_asset('background_empty')
+                TEXTURES.show(self.home.ids.background_gif, _find_asset('background_home') or _find_asset('background_empty'))
             except Exception:
                 pass
 
@@ -248,47 +265,32 @@ class StudySagaApp(App):
             # Set background based on gender
             gender = self.profile.get("gender", "female")
             if gender == "male":
-                self.study_screen.ids.background_gif.source = _find_asset("background_male")
+                TEXTURES.show(self.study_screen.ids.background_gif, _find_asset("background_male"))
             else:
-                self.study_screen.ids.background_gif.source = _find_asset("background_female")
+                TEXTURES.show(self.study_screen.ids.background_gif, _find_asset("background_female"))
             
-            # Show active items
-            DB.clean_expired_items(self.profile["id"])
-            active_items = DB.get_active_items(self.profile["id"])
+            # Show active items (cached in BOOSTS; expired ones are dropped lazily)
+            active_items = BOOSTS.active(self.profile["id"])
             if active_items:
                 items_text = ", ".join([f"{item['name']}" for item in active_items])
                 self.study_screen.ids.active_items.text = f"Active Boosts: {items_text}"
                 
                 # Calculate total effects
-                total_exp = sum(item.get('boost_exp_pct', 0) for item in active_items)
-                total_crystal = sum(item.get('boost_crystal_pct', 0) for item in active_items)
+                total_exp, total_crystal = BOOSTS.totals(self.profile["id"])
                 self.study_screen.ids.active_effects.text = f"Effect: EXP +{total_exp}%, Crystal +{total_crystal}%"
             else:
                 self.study_screen.ids.active_items.text = ""
                 self.study_screen.ids.active_effects.text = ""
             
-            # Get weekly sessions
-            sessions = DB.get_study_sessions(self.profile["id"], days=7)
-            
-            # Group by day of week
-            from datetime import datetime, timedelta
-            today = datetime.now()
-            week_data = {}
-            for i in range(7):
-                day = (today - timedelta(days=6-i)).date()
-                week_data[day] = 0
-            
-            for s in sessions:
-                day = datetime.fromtimestamp(s["start_time"]).date()
-                if day in week_data:
-                    week_data[day] += s["duration_minutes"]
+            # Minutes per day for the last 7 days (oldest first)
+            week_data = DB.get_daily_study(self.profile["id"], days=7)
             
             # Create week progress bars
             weekbars = self.study_screen.ids.weekbars
             weekbars.clear_widgets()
             
-            for day in sorted(week_data.keys()):
-                minutes = week_data[day]
+            for day in week_data:
+                minutes = day["minutes"]
                 max_min = 120  # max display
                 progress = min(1.0, minutes / max_min)
                 
@@ -355,71 +357,13 @@ class StudySagaApp(App):
         
         uid = self.profile["id"]
         
-        # Get active items and calculate bonuses
-        DB.clean_expired_items(uid)
-        active_items = DB.get_active_items(uid)
-        
-        crystal_bonus = 0
-        exp_bonus = 0
-        for item in active_items:
-            crystal_bonus += item.get("boost_crystal_pct", 0)
-            exp_bonus += item.get("boost_exp_pct", 0)
-        
-        # Calculate rewards (1 crystal per minute + bonuses)
-        base_crystals = self.study_duration
-        bonus_crystals = int(base_crystals * crystal_bonus / 100)
-        crystals_earned = base_crystals + bonus_crystals
-        
-        # Calculate EXP (1 EXP per minute + bonuses)
-        base_exp = self.study_duration
-        bonus_exp = int(base_exp * exp_bonus / 100)
-        exp_earned = base_exp + bonus_exp
-        
-        # Save session
-        DB.add_study_session(uid, self.study_duration, crystals_earned)
-        
-        # Update crystals and EXP
-        self.crystals = DB.update_crystals(uid, crystals_earned)
-        new_level = DB.update_exp(uid, exp_earned)
-        
-        # Update achievements
-        DB.update_achievement(uid, "First Study", 1)
-        DB.update_achievement(uid, "Quick Start", 1)
-        
-        total_study_minutes = DB.get_total_study_minutes(uid)
-        DB.set_achievement_progress(uid, "Getting Started", total_study_minutes)
-        DB.set_achievement_progress(uid, "Study Rookie", total_study_minutes)
-        DB.set_achievement_progress(uid, "Study Novice", total_study_minutes)
-        DB.set_achievement_progress(uid, "Study Apprentice", total_study_minutes)
-        DB.set_achievement_progress(uid, "Study Warrior", total_study_minutes)
-        DB.set_achievement_progress(uid, "Study Expert", total_study_minutes)
-        DB.set_achievement_progress(uid, "Study Master", total_study_minutes)
-        DB.set_achievement_progress(uid, "Study Grandmaster", total_study_minutes)
-        DB.set_achievement_progress(uid, "Study Legend", total_study_minutes)
-        DB.set_achievement_progress(uid, "Study Mythic", total_study_minutes)
-        DB.set_achievement_progress(uid, "Study God", total_study_minutes)
-        
-        # Marathon achievements
-        if self.study_duration >= 60:
-            DB.update_achievement(uid, "Marathon Runner", 1)
-        if self.study_duration >= 90:
-            DB.update_achievement(uid, "Ultra Marathon", 1)
-        
-        # Crystal achievements
-        total_crystals = DB.get_total_crystals_earned(uid)
-        DB.set_achievement_progress(uid, "Pocket Change", total_crystals)
-        DB.set_achievement_progress(uid, "Crystal Collector", total_crystals)
-        DB.set_achievement_progress(uid, "Crystal Hoarder", total_crystals)
-        DB.set_achievement_progress(uid, "Crystal Tycoon", total_crystals)
-        DB.set_achievement_progress(uid, "Crystal Magnate", total_crystals)
-        DB.set_achievement_progress(uid, "Crystal Emperor", total_crystals)
-        
-        # Level achievements
-        DB.set_achievement_progress(uid, "Level 5", new_level)
-        DB.set_achievement_progress(uid, "Level 10", new_level)
-        DB.set_achievement_progress(uid, "Level 25", new_level)
-        DB.set_achievement_progress(uid, "Level 50", new_level)
-        DB.set_achievement_progress(uid, "Level 100", new_level)
+        # Session row, crystals, EXP/level and achievements in one transaction
+        reward = DB.complete_study_session(uid, self.study_duration, boosts=BOOSTS.totals(uid))
+        self.crystals = reward.crystals
+        crystals_earned = reward.crystals_earned
+        exp_earned = reward.exp_earned
+        crystal_bonus = reward.crystal_bonus_pct
+        exp_bonus = reward.exp_bonus_pct
         
         # Update UI
         bonus_text = ""
@@ -465,79 +409,26 @@ class StudySagaApp(App):
         except:
             pass
         
-    def do_gacha(self, tier):
-        """Perform gacha roll with probability-based rarity selection"""
-        costs = {"bronze": 10, "silver": 30, "gold": 60}
-        cost = costs.get(tier, 10)
+    def do_gacha(self, tier, count=1):
+        """Perform `count` gacha rolls (paid, drawn and granted in one transaction)"""
+        uid = self.profile["id"]
+        ok, items, crystals = GACHA.roll_many(uid, tier, count)
+        self.crystals = crystals
         
-        if self.crystals < cost:
+        if not ok:
             try:
-                self.gacha_screen.ids.result.text = "[!] Not enough crystals!"
+                if crystals < GACHA.COSTS.get(tier, 10) * count:
+                    self.gacha_screen.ids.result.text = "[!] Not enough crystals!"
+                else:
+                    self.gacha_screen.ids.result.text = "No items available"
             except:
                 pass
             return
         
-        # Deduct crystals
-        self.crystals = DB.update_crystals(self.profile["id"], -cost)
-        
-        # Update Gacha achievements
-        uid = self.profile["id"]
-        DB.update_achievement(uid, "First Roll", 1)
-        DB.update_achievement(uid, "Gacha Beginner", 1)
-        DB.update_achievement(uid, "Gacha Enthusiast", 1)
-        DB.update_achievement(uid, "Gacha Master", 1)
-        DB.update_achievement(uid, "Gacha Addict", 1)
-        DB.update_achievement(uid, "Gacha Legend", 1)
-        
-        # Probability-based rarity selection
-        probabilities = {
-            "bronze": {"bronze": 90, "silver": 9, "gold": 1},
-            "silver": {"bronze": 70, "silver": 25, "gold": 5},
-            "gold": {"bronze": 50, "silver": 40, "gold": 10}
-        }
-        
-        # Get probability distribution for this tier
-        prob = probabilities.get(tier, probabilities["bronze"])
-        
-        # Random roll (0-100)
-        roll = random.randint(1, 100)
-        
-        # Determine rarity based on probability
-        if roll <= prob["bronze"]:
-            selected_rarity = "bronze"
-        elif roll <= prob["bronze"] + prob["silver"]:
-            selected_rarity = "silver"
-        else:
-            selected_rarity = "gold"
-        
-        # Get items of selected rarity
-        items = DB.get_items(selected_rarity)
-        if not items:
-            items = DB.get_items()
-        
         if items:
-            # Random item from selected rarity
-            item = random.choice(items)
-            
-            # Add to inventory
-            DB.add_to_inventory(uid, item["id"])
-            
-            # Update First Item achievement
-            DB.update_achievement(uid, "First Item", 1)
-            
-            # Update collection achievements
-            inventory = DB.get_inventory(uid)
-            total_items = len(inventory)
-            unique_items = len(set(i['item_id'] for i in inventory))
-            
-            DB.set_achievement_progress(uid, "Collector", unique_items)
-            DB.set_achievement_progress(uid, "Hoarder", total_items)
-            DB.set_achievement_progress(uid, "Item Master", total_items)
-            DB.set_achievement_progress(uid, "Treasure Hunter", unique_items)
-            
-            # Lucky Strike achievement (gold rarity)
-            if item["rarity"] == "gold":
-                DB.update_achievement(uid, "Lucky Strike", 1)
+            # Chest shows the best rarity pulled
+            order = {"bronze": 0, "silver": 1, "gold": 2}
+            item = max(items, key=lambda it: order.get(it["rarity"], 0))
             
             # Show chest image first
             chest_images = {
@@ -551,6 +442,8 @@ class StudySagaApp(App):
             try:
                 from kivy.uix.image import Image
                 card_stage = self.gacha_screen.ids.card_stage
+                for w in card_stage.children:
+                    TEXTURES.release(w)
                 card_stage.clear_widgets()
                 
                 # Clear previous result text
@@ -559,20 +452,25 @@ class StudySagaApp(App):
                 
                 # Show chest image
                 chest = Image(
-                    source=chest_img,
                     allow_stretch=True,
                     keep_ratio=True,
                     size_hint=(1, 1),
                     pos_hint={"center_x": 0.5, "center_y": 0.5}
                 )
+                TEXTURES.show(chest, chest_img)     # shared, already-decoded frames
                 card_stage.add_widget(chest)
                 
                 # Show result after 1 second
                 def show_result(dt):
+                    TEXTURES.release(chest)
                     card_stage.clear_widgets()
                     rarity_prefix = {"bronze": "[BRONZE]", "silver": "[SILVER]", "gold": "[GOLD]"}
                     prefix = rarity_prefix.get(item["rarity"], "[ITEM]")
-                    self.gacha_screen.ids.result.text = f"{prefix} {item['name']}\n{item['description']}"
+                    if len(items) == 1:
+                        self.gacha_screen.ids.result.text = f"{prefix} {item['name']}\n{item['description']}"
+                    else:
+                        self.gacha_screen.ids.result.text = "\n".join(
+                            f"{rarity_prefix.get(it['rarity'], '[ITEM]')} {it['name']}" for it in items)
                     self.gacha_screen.ids.pity.text = f"Crystals: {self.crystals}"
                 
                 Clock.schedule_once(show_result, 3.0)
@@ -581,125 +479,65 @@ class StudySagaApp(App):
                 import traceback
                 traceback.print_exc()
             
-            print(f"Gacha roll ({tier}): Got {item['name']}")
-        else:
-            try:
-                self.gacha_screen.ids.result.text = "No items available"
-            except:
-                pass
+            print(f"Gacha roll ({tier} x{len(items)}): Got {', '.join(it['name'] for it in items)}")
 
     # Inventory functions
     
 
     
-    def refresh_inventory(self, search="", tier="all"):
-            """Refresh inventory list (group duplicates) with a 'Use' button and detail popup on title click."""
+    def refresh_inventory(self, search="", tier="all", offset=0):
+            """Refresh one page of the inventory list (duplicates grouped) with a 'Use' button and detail popup on title click."""
             try:
-                from kivy.uix.button import Button
-                from kivy.uix.gridlayout import GridLayout
-                from kivy.metrics import dp
+                ids = self.inventory_screen.ids
                 
-                grid = self.inventory_screen.ids.grid
-                grid.clear_widgets()
-                
-                raw_items = DB.get_inventory(self.profile["id"])
-                active_items = DB.get_active_items(self.profile["id"])
-                active_item_ids = [ai["item_id"] for ai in active_items]
-                
-                # Filter
-                filtered = []
-                for it in raw_items:
-                    if search and search.lower() not in it["name"].lower():
-                        continue
-                    if tier != "all" and it["rarity"] != tier:
-                        continue
-                    filtered.append(it)
-                
-                # Group
-                grouped = {}
-                for it in filtered:
-                    key = it["item_id"]
-                    g = grouped.get(key)
-                    if not g:
-                        grouped[key] = {
-                            "any_inventory_id": it["id"],
-                            "item_id": it["item_id"],
-                            "name": it["name"],
-                            "rarity": it["rarity"],
-                            "boost_exp_pct": it["boost_exp_pct"],
-                            "boost_crystal_pct": it["boost_crystal_pct"],
-                            "description": it["description"],
-                            "count": 0
-                        }
-                    grouped[key]["count"] += 1
-                    if it["id"] > grouped[key]["any_inventory_id"]:
-                        grouped[key]["any_inventory_id"] = it["id"]
-                
-                # Sort
-                order = {"gold": 0, "silver": 1, "bronze": 2}
-                groups = list(grouped.values())
-                groups.sort(key=lambda g: (order.get(g["rarity"], 9), g["name"].lower()))
+                # grouped, filtered and paged in SQL; one extra row tells us if there is a next page
+                page = DB.INVENTORY_PAGE
+                groups = DB.get_inventory_summary(self.profile["id"], search, tier, offset, page + 1)
+                has_more = len(groups) > page
+                groups = groups[:page]
                 
+                rarity_colors = {
+                    "bronze": self.theme.bronze,
+                    "silver": self.theme.silver,
+                    "gold": self.theme.gold
+                }
+                rows = []
                 for g in groups:
-                    rarity_colors = {
-                        "bronze": self.theme.bronze,
-                        "silver": self.theme.silver,
-                        "gold": self.theme.gold
-                    }
-                    base_color = rarity_colors.get(g["rarity"], self.theme.text)
-                    is_active = g["item_id"] in active_item_ids
-                    
-                    title = f"{g['name']} ({g['count']})" + ("  [ACTIVE]" if is_active else "")
+                    title = f"{g['name']} ({g['count']})" + ("  [ACTIVE]" if g["active"] else "")
                     sub = f"+{g['boost_exp_pct']}% EXP · +{g['boost_crystal_pct']}% Crystals"
-                    
-                    # Title (click to open popup)
-                    left = Button(
-                        text=title + "\n" + sub,
-                        size_hint=(0.78, None),
-                        height=dp(58),
-                        color=base_color,
-                        background_color=self.theme.card
-                    )
-                    item_copy = dict(g)  # capture for lambda
-                    left.bind(on_release=lambda _b, item=item_copy: self.show_item_details(item))
-                    
-                    # 'Use' button
-                    inv_id = g["any_inventory_id"]
-                    use_btn = Button(
-                        text="Use",
-                        size_hint=(0.20, None),
-                        height=dp(58),
-                        background_color=self.theme.card,
-                        color=self.theme.text
-                    )
-                    if is_active:
-                        use_btn.disabled = True
-                        # grey-out both sides if active
-                        left.color = (0.6,0.6,0.6,1)
-                        left.opacity = 0.6
-                        use_btn.color = (0.6,0.6,0.6,1)
-                    else:
-                        use_btn.bind(on_release=lambda _b, inv_id=inv_id: self.use_item(inv_id))
-                    
-                    row = GridLayout(cols=2, size_hint=(1, None), height=dp(60), spacing=dp(10))
-                    row.add_widget(left)
-                    row.add_widget(use_btn)
-                    grid.add_widget(row)
+                    rows.append({
+                        "item_id": g["item_id"],
+                        "title": title + "\n" + sub,
+                        "title_color": list(rarity_colors.get(g["rarity"], self.theme.text)),
+                        "active": bool(g["active"]),
+                        "item": g,
+                    })
+                # only rows that changed are re-rendered (see listview.apply_rows)
+                apply_rows(ids.rv, rows, key="item_id")
+                
+                self._inventory_view = (search, tier, offset)
+                ids.prev_page.disabled = offset <= 0
+                ids.next_page.disabled = not has_more
             
             except Exception as e:
                 print(f"Error refreshing inventory: {e}")
 
-    def use_item(self, inventory_id):
-            """Consume one item from the grouped inventory and activate it."""
+    def inventory_page(self, step):
+            """Move the inventory list `step` pages forward (negative: back)."""
+            search, tier, offset = getattr(self, "_inventory_view", ("", "all", 0))
+            self.refresh_inventory(search, tier, max(0, offset + step * DB.INVENTORY_PAGE))
+
+    def use_item(self, item_id):
+            """Consume one item from its inventory stack and activate it."""
             try:
                 uid = self.profile["id"]
-                success, msg = DB.activate_item(uid, inventory_id)
+                success, msg = DB.activate_item(uid, item_id)
                 print(f"Use item result: {msg}")
                 # Achievement: Power User
                 if success:
-                    DB.update_achievement(uid, "Power User", 1)
+                    DB.bump_metric(uid, ACH.ITEMS_USED)
                 # Refresh list
-                self.refresh_inventory()
+                self.inventory_page(0)
                 # Toast/message if available
                 try:
                     self.set_msg(msg)
@@ -799,44 +637,20 @@ class StudySagaApp(App):
             return
         
         try:
-            grid = self.achievements_screen.ids.grid
-            grid.clear_widgets()
-            
             achievements = DB.get_achievements(self.profile["id"])
             
-            if not achievements:
-                label = Label(text="No achievements yet", color=self.theme.muted)
-                grid.add_widget(label)
-            else:
-                for ach in achievements:
-                    row = BoxLayout(orientation="vertical", size_hint_y=None, height=80, spacing=4)
-                    
-                    # Title (no status symbol - color indicates completion)
-                    title = Label(
-                        text=f"{ach['name']}", 
-                        color=self.theme.text if ach["completed"] else self.theme.muted,
-                        halign="left",
-                        valign="top",
-                        font_size="16sp"
-                    )
-                    title.text_size = (title.width, None)
-                    title.bind(size=lambda lb, *_: setattr(lb, 'text_size', (lb.width, None)))
-                    
-                    # Progress
-                    progress_pct = min(100, int(100 * ach["progress"] / ach["goal"])) if ach["goal"] > 0 else 0
-                    desc = Label(
-                        text=f"{ach['description']} ({ach['progress']}/{ach['goal']} - {progress_pct}%)",
-                        color=self.theme.muted,
-                        halign="left",
-                        valign="top",
-                        font_size="12sp"
-                    )
-                    desc.text_size = (desc.width, None)
-                    desc.bind(size=lambda lb, *_: setattr(lb, 'text_size', (lb.width, None)))
-                    
-                    row.add_widget(title)
-                    row.add_widget(desc)
-                    grid.add_widget(row)
+            rows = []
+            for ach in achievements:
+                # Progress (no status symbol - color indicates completion)
+                progress_pct = min(100, int(100 * ach["progress"] / ach["goal"])) if ach["goal"] > 0 else 0
+                rows.append({
+                    "name": ach["name"],
+                    "desc": f"{ach['description']} ({ach['progress']}/{ach['goal']} - {progress_pct}%)",
+                    "completed": bool(ach["completed"]),
+                })
+            if not rows:
+                rows = [{"name": "No achievements yet", "desc": "", "completed": False}]
+            apply_rows(self.achievements_screen.ids.rv, rows, key="name")
         except Exception as e:
             print(f"Error refreshing achievements: {e}")
 
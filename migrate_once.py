@@ -2,6 +2,19 @@
 # Optional one-off migration helper. You can run:
 #   python migrate_once.py
 # It will import db.py (which runs bootstrap + migrate) and exit.
+#   python migrate_once.py --rebuild-stats
+# additionally recomputes the user_stats and daily_study rollups from study_sessions.
+#   python migrate_once.py --drop-legacy-inventory
+# drops inventory_legacy, the per-copy rows kept when inventory was compacted
+# into inventory_stacks (check the stacks first; this cannot be undone).
+import sys
 import db as DB
 DB.bootstrap()
+if "--rebuild-stats" in sys.argv[1:]:
+    DB.rebuild_user_stats()
+    DB.rebuild_daily_study()
+    print("Rebuilt user_stats and daily_study.")
+if "--drop-legacy-inventory" in sys.argv[1:]:
+    dropped = DB.drop_legacy_inventory()
+    print("Dropped", ", ".join(dropped) if dropped else "nothing (no legacy inventory)")
 print("Migration complete. DB at:", DB.DB_PATH)
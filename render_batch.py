@@ -0,0 +1,247 @@
+"""Batch avatar rendering through a process pool.
+
+    python render_batch.py --db [PATH] --out renders/          # every user's loadout in studysaga's DB
+    python render_batch.py --jsonl specs.jsonl --out renders/   # one spec per line
+    python render_batch.py --appearance-db attached_assets/app.db --out renders/
+
+A spec is {"id": ..., "gender": ..., "loadout": {slot: file}, "scale": 6} for
+the layered SpriteRendererRef, or {"id": ..., "renderer": "appearance",
+"appearance": {...}, "scale": 1} for the recolouring renderer in
+attached_assets (the dict build_appearance() returns). Specs are streamed to
+worker processes in chunks with a bounded number in flight; each worker keeps
+one renderer per (renderer, gender, scale), so base images, layers and masks
+are loaded once per process. Finished renders are written atomically to
+<out>/<id>.png and appended to <out>/manifest.jsonl with their content key;
+a rerun skips ids whose key is unchanged, so an interrupted batch resumes
+where it stopped and an asset update re-renders only the avatars it touches.
+"""
+import os, sys, re, json, time, argparse, sqlite3, importlib.util
+from collections import defaultdict
+from concurrent.futures import ProcessPoolExecutor, FIRST_COMPLETED, wait
+
+from studysaga.render_cache import render_key, file_stamp
+
+ROOT = os.path.dirname(os.path.abspath(__file__))
+ATTACHED = os.path.join(ROOT, "attached_assets")
+LAYER_DIR = os.path.join(ROOT, "assets")
+DEFAULT_SCALE = {"layers": 6, "appearance": 1}
+MANIFEST = "manifest.jsonl"
+
+
+_attached = {}
+
+def _load_attached(name):
+    """attached_assets/<name>.py under a private module name (its module names clash with the app's)."""
+    mod = _attached.get(name)
+    if mod is None:
+        spec = importlib.util.spec_from_file_location(f"attached_{name}", os.path.join(ATTACHED, name + ".py"))
+        mod = importlib.util.module_from_spec(spec)
+        sys.path.insert(0, ATTACHED)        # for its own `from color_utils import ...`
+        try:
+            spec.loader.exec_module(mod)
+        finally:
+            sys.path.remove(ATTACHED)
+        _attached[name] = mod
+    return mod
+
+
+# spec sources
+def db_specs(path=None):
+    """One layered spec per user of studysaga's DB (profile gender + the rows get_loadout reads)."""
+    from studysaga import db as sdb
+    con = sqlite3.connect(path or sdb.DB_PATH)
+    try:
+        loadouts = defaultdict(dict)
+        for uid, slot, item in con.execute("SELECT user_id, slot, item FROM loadout"):
+            loadouts[uid][slot] = item
+        rows = con.execute("SELECT u.id, COALESCE(p.gender,'male') FROM users u "
+                           "LEFT JOIN profile p ON p.user_id=u.id ORDER BY u.id")
+        for uid, gender in rows:
+            yield {"id": f"user-{uid}", "gender": gender,
+                   "loadout": {s: loadouts[uid].get(s) for s in sdb.SLOTS}}
+    finally:
+        con.close()
+
+
+def jsonl_specs(path):
+    with open(path, encoding="utf-8") as f:
+        for n, line in enumerate(f, 1):
+            line = line.strip()
+            if line:
+                spec = json.loads(line)
+                spec.setdefault("id", f"line-{n}")
+                yield spec
+
+
+def appearance_db_specs(path):
+    """The player of an attached_assets DB, via its build_appearance()."""
+    db = _load_attached("db").DB(path)
+    yield {"id": "player", "renderer": "appearance", "appearance": db.build_appearance()}
+
+
+def _normalize(spec, scale=None):
+    spec = dict(spec)
+    kind = spec.setdefault("renderer", "layers")
+    spec["id"] = re.sub(r"[^A-Za-z0-9_.-]", "_", str(spec["id"]))
+    spec["scale"] = scale or spec.get("scale") or DEFAULT_SCALE[kind]
+    return spec
+
+
+def spec_key(spec):
+    """Content key of a spec: the spec itself plus the stamps of the files it reads."""
+    if spec["renderer"] == "appearance":
+        sex = spec["appearance"].get("sex", "male")
+        files = [os.path.join(ATTACHED, "assets", "base_female.png" if sex == "female" else "base_male.png")]
+    else:
+        files = [os.path.join(LAYER_DIR, "base_female.png" if spec.get("gender") == "female" else "base_male.png")]
+        files += [os.path.join(LAYER_DIR, f) for f in (spec.get("loadout") or {}).values() if f]
+    return render_key(spec={k: v for k, v in spec.items() if k != "id"}, files=[file_stamp(f) for f in files])
+
+
+# worker side
+_renderers = {}
+
+def _renderer(kind, gender, scale):
+    key = (kind, gender, scale)
+    r = _renderers.get(key)
+    if r is None:
+        if kind == "appearance":
+            r = _load_attached("sprite_renderer_ref").SpriteRendererRef(sex=gender, scale=scale)
+            r._ensure_masks()
+        else:
+            import sprite_renderer_ref
+            r = sprite_renderer_ref.SpriteRendererRef(scale=scale)
+            r.set_gender(gender)
+        _renderers[key] = r
+    return r
+
+
+def _render(spec):
+    # straight to the renderers' uncached paths: the output directory is the cache here
+    if spec["renderer"] == "appearance":
+        ap = spec["appearance"]
+        return _renderer("appearance", ap.get("sex", "male"), spec["scale"])._render(ap)
+    r = _renderer("layers", spec.get("gender", "male"), spec["scale"])
+    r.layers = {s: None for s in r.layers}
+    for slot, item in (spec.get("loadout") or {}).items():
+        if item: r.set_layer(slot, item)
+    return r._compose()
+
+
+def render_chunk(out_dir, chunk):
+    """Render and save each (spec, key) of `chunk`; returns (id, key, error or None) per spec."""
+    done = []
+    for spec, key in chunk:
+        path = os.path.join(out_dir, spec["id"] + ".png")
+        try:
+            img = _render(spec)
+            tmp = f"{path}.{os.getpid()}.tmp"
+            img.save(tmp, "PNG")
+            os.replace(tmp, path)
+            done.append((spec["id"], key, None))
+        except Exception as e:
+            done.append((spec["id"], key, f"{type(e).__name__}: {e}"))
+    return done
+
+
+# driver
+def _read_manifest(path):
+    done = {}
+    try:
+        with open(path, encoding="utf-8") as f:
+            for line in f:
+                try:
+                    rec = json.loads(line)
+                except ValueError:
+                    continue                # torn last line of an interrupted run
+                done[rec["id"]] = rec["key"]
+    except FileNotFoundError:
+        pass
+    return done
+
+
+def run(specs, out_dir, workers=None, chunk=16, scale=None, force=False, progress_every=2.0):
+    """Render `specs` into `out_dir`; returns counts, seconds and avatars/s."""
+    os.makedirs(out_dir, exist_ok=True)
+    manifest_path = os.path.join(out_dir, MANIFEST)
+    done = {} if force else _read_manifest(manifest_path)
+    workers = workers or os.cpu_count() or 1
+    stats = {"rendered": 0, "skipped": 0, "failed": 0}
+    t0 = time.perf_counter()
+    shown = [t0]
+
+    def progress(final=False):
+        now = time.perf_counter()
+        if final or now - shown[0] >= progress_every:
+            shown[0] = now
+            rate = stats["rendered"] / max(now - t0, 1e-9)
+            print(f"\r{stats['rendered']} rendered, {stats['skipped']} skipped, {stats['failed']} failed"
+                  f" - {rate:.1f} avatars/s", end="\n" if final else "", flush=True)
+
+    with open(manifest_path, "a", encoding="utf-8") as manifest, ProcessPoolExecutor(workers) as pool:
+        pending = set()
+
+        def collect():
+            finished, _ = wait(pending, return_when=FIRST_COMPLETED)
+            for fut in finished:
+                pending.discard(fut)
+                for sid, key, err in fut.result():
+                    if err:
+                        stats["failed"] += 1
+                        print(f"\nfailed {sid}: {err}", file=sys.stderr)
+                    else:
+                        stats["rendered"] += 1
+                        manifest.write(json.dumps({"id": sid, "key": key}) + "\n")
+            manifest.flush()
+            progress()
+
+        batch = []
+        for spec in specs:
+            spec = _normalize(spec, scale)
+            key = spec_key(spec)
+            if done.get(spec["id"]) == key and os.path.exists(os.path.join(out_dir, spec["id"] + ".png")):
+                stats["skipped"] += 1
+                continue
+            batch.append((spec, key))
+            if len(batch) >= chunk:
+                pending.add(pool.submit(render_chunk, out_dir, batch))
+                batch = []
+                if len(pending) >= workers * 2:
+                    collect()
+        if batch:
+            pending.add(pool.submit(render_chunk, out_dir, batch))
+        while pending:
+            collect()
+
+    stats["seconds"] = round(time.perf_counter() - t0, 3)
+    stats["per_second"] = round(stats["rendered"] / max(stats["seconds"], 1e-9), 1)
+    progress(final=True)
+    return stats
+
+
+def main(argv=None):
+    ap = argparse.ArgumentParser(description="render avatars in bulk")
+    src = ap.add_mutually_exclusive_group(required=True)
+    src.add_argument("--db", nargs="?", const="", help="studysaga DB (default: $STUDYSAGA_DB)")
+    src.add_argument("--jsonl", help="file with one spec per line")
+    src.add_argument("--appearance-db", help="attached_assets DB (renders its player)")
+    ap.add_argument("--out", default="renders")
+    ap.add_argument("--workers", type=int, default=None)
+    ap.add_argument("--chunk", type=int, default=16, help="specs per worker task")
+    ap.add_argument("--scale", type=int, default=None, help="override every spec's scale")
+    ap.add_argument("--force", action="store_true", help="ignore the manifest and re-render everything")
+    args = ap.parse_args(argv)
+    if args.jsonl:
+        specs = jsonl_specs(args.jsonl)
+    elif args.appearance_db:
+        specs = appearance_db_specs(args.appearance_db)
+    else:
+        specs = db_specs(args.db or None)
+    stats = run(specs, args.out, workers=args.workers, chunk=args.chunk, scale=args.scale, force=args.force)
+    print(f"{stats['rendered']} rendered in {stats['seconds']} s ({stats['per_second']} avatars/s), "
+          f"{stats['skipped']} up to date, {stats['failed']} failed")
+    sys.exit(1 if stats["failed"] else 0)
+
+
+if __name__ == "__main__":
+    main()
@@ -1,5 +1,7 @@
 from PIL import Image
 from pathlib import Path
+from studysaga.render_cache import LAYERS, RENDERS, render_key, file_stamp
+from studysaga.atlas import atlas_for
 
 ASSET_DIR = Path(__file__).resolve().parent / "assets"
 ORDER = ["bottom","shoes","top","hair","accessory"]
@@ -11,9 +13,20 @@ class SpriteRendererRef:
         self.scale = scale
     def set_gender(self, g): self.gender = "female" if g=="female" else "male"
     def set_layer(self, slot, item): self.layers[slot]=item
-    def _open(self, name): return Image.open(ASSET_DIR/name).convert("RGBA")
+    def _open(self, name):
+        atlas = atlas_for(ASSET_DIR)
+        img = atlas.image(name) if atlas is not None else None
+        return img if img is not None else LAYERS.open(ASSET_DIR/name)
+    def _base_name(self): return "base_female.png" if self.gender=="female" else "base_male.png"
+    def _key(self):
+        files = [self._base_name()] + [self.layers[s] for s in ORDER if self.layers.get(s)]
+        return render_key(renderer="layers", gender=self.gender, scale=self.scale,
+                          layers={s: self.layers.get(s) for s in ORDER},
+                          files={f: file_stamp(ASSET_DIR/f) for f in files})
     def render(self):
-        base = self._open("base_female.png" if self.gender=="female" else "base_male.png").copy()
+        return RENDERS.get_or_render(self._key(), self._compose)
+    def _compose(self):
+        base = self._open(self._base_name())
         canvas = Image.new("RGBA", base.size, (0,0,0,0))
         canvas.alpha_composite(base)
         for s in ORDER:
@@ -0,0 +1,95 @@
+"""Prefix -> file index over an asset directory.
+
+Screens look assets up by name prefix ("background_home", "chest_gold") and
+take the first match by extension priority. AssetIndex lists the directory
+once, answers lookups from memory and caches every answer (misses too). It
+re-lists when the directory's mtime changes (checked at most every
+`check_interval` seconds) or when reload() is called. index_for() hands out
+one shared index per directory, so main.py, studysaga.db and the sprite
+renderers all use the same one.
+"""
+import os, threading, time
+
+DEFAULT_EXTS = (".gif", ".png", ".jpg", ".jpeg")
+
+
+class AssetIndex:
+    def __init__(self, root, check_interval=2.0):
+        self.root = os.path.abspath(root)
+        self.check_interval = check_interval
+        self._lock = threading.Lock()
+        self._names = []        # sorted file names
+        self._lower = {}        # lower-case name -> name
+        self._found = {}        # (prefix, exts) -> path or ""
+        self._mtime = None
+        self._checked = None
+        self.generation = 0     # bumped on every re-list
+
+    def reload(self):
+        """Re-list the directory and drop every cached answer."""
+        try:
+            mtime = os.stat(self.root).st_mtime_ns
+            names = sorted(os.listdir(self.root))
+        except OSError:
+            mtime, names = None, []
+        with self._lock:
+            self._names = names
+            self._lower = {n.lower(): n for n in reversed(names)}
+            self._found = {}
+            self._mtime = mtime
+            self._checked = time.monotonic()
+            self.generation += 1
+
+    def _fresh(self):
+        now = time.monotonic()
+        if self._checked is None:
+            self.reload()
+        elif now - self._checked >= self.check_interval:
+            self._checked = now
+            try:
+                mtime = os.stat(self.root).st_mtime_ns
+            except OSError:
+                mtime = None
+            if mtime != self._mtime:
+                self.reload()
+
+    def find(self, prefix, exts=DEFAULT_EXTS):
+        """Path of `prefix` + ext for the first ext that exists, else of the first
+        file starting with `prefix` (case-insensitive) by ext priority; "" if none."""
+        self._fresh()
+        key = (prefix, tuple(exts))
+        hit = self._found.get(key)
+        if hit is not None:
+            return hit
+        p = prefix.lower()
+        name = next((self._lower[p + e] for e in key[1] if p + e in self._lower), None)
+        if name is None:
+            name = next((n for e in key[1] for n in self._names
+                         if n.lower().startswith(p) and n.lower().endswith(e)), None)
+        path = os.path.join(self.root, name) if name else ""
+        with self._lock:
+            self._found[key] = path
+        return path
+
+    def version(self):
+        """Changes whenever the directory has been re-listed (for callers caching derived data)."""
+        self._fresh()
+        return self.generation
+
+    def names(self, prefix, ext):
+        """Sorted file names starting with `prefix` and ending with `ext` (like glob(prefix*ext))."""
+        self._fresh()
+        return [n for n in self._names if n.startswith(prefix) and n.endswith(ext)]
+
+
+_indexes = {}
+_indexes_lock = threading.Lock()
+
+def index_for(root):
+    """The shared AssetIndex for `root`."""
+    root = os.path.abspath(root)
+    with _indexes_lock:
+        idx = _indexes.get(root)
+        if idx is None:
+            idx = _indexes[root] = AssetIndex(root)
+        return idx
@@ -0,0 +1,201 @@
+"""Sprite atlases for the layer PNGs (base_*, hair_*, top_*, accessory_*, ...).
+
+    python -m studysaga.atlas [ASSET_DIR] [--max-size 2048]
+
+build_atlas() shelf-packs every .png of a directory into one or a few raw
+RGBA pages under <dir>/.atlas/ and writes atlas.json with each sprite's
+(page, x, y, w, h) rectangle and the (mtime_ns, size) stamp of every source
+file. At runtime atlas_for() maps the pages read-only and hands out Pillow
+crops, so rendering an avatar opens no files. atlas_for() re-checks the
+index and the directory at most every CHECK_INTERVAL seconds, so a rebuilt
+atlas is picked up and one whose sources were added or removed is dropped.
+Each sprite's source PNG stamp is re-checked on the same interval; image()
+returns None for a sprite whose PNG changed since the build, and the
+renderers open the PNG instead.
+"""
+import os, sys, json, mmap, time, threading, argparse
+
+from PIL import Image
+
+ATLAS_DIR = ".atlas"
+INDEX = "atlas.json"
+VERSION = 1
+CHECK_INTERVAL = 2.0
+
+
+def _stamp(path):
+    st = os.stat(path)
+    return [st.st_mtime_ns, st.st_size]
+
+
+def _stamp_or_none(path):
+    try:
+        return _stamp(path)
+    except OSError:
+        return None
+
+
+def _sources(src_dir):
+    try:
+        return sorted(n for n in os.listdir(src_dir) if n.lower().endswith(".png"))
+    except OSError:
+        return []
+
+
+def _pack(sizes, max_size, padding):
+    """Shelf packing; `sizes` is [(name, w, h)]. Returns ({name: [page, x, y, w, h]}, [(page_w, page_h)])."""
+    area = sum((w + padding) * (h + padding) for _, w, h in sizes)
+    width = max([64] + [w + padding for _, w, _ in sizes])
+    while width * width < area and width < max_size:
+        width *= 2
+    width = min(width, max_size)
+    rects, pages = {}, []
+    page = x = y = shelf = 0
+    for name, w, h in sorted(sizes, key=lambda s: (-s[2], -s[1], s[0])):
+        if w + padding > width or h + padding > max_size:
+            raise ValueError(f"{name} ({w}x{h}) does not fit a {max_size}px atlas page")
+        if x + w + padding > width:
+            x, y, shelf = 0, y + shelf, 0
+        if y + h + padding > max_size:
+            pages.append((width, y))
+            page, x, y, shelf = page + 1, 0, 0, 0
+        rects[name] = [page, x, y, w, h]
+        x += w + padding
+        shelf = max(shelf, h + padding)
+    pages.append((width, y + shelf))
+    return rects, pages
+
+
+def build_atlas(src_dir, max_size=2048, padding=1):
+    """Pack every PNG of `src_dir` into <src_dir>/.atlas/; returns the index dict."""
+    names = _sources(src_dir)
+    images = {}
+    for n in names:
+        with Image.open(os.path.join(src_dir, n)) as im:
+            images[n] = im.convert("RGBA")
+    rects, sizes = _pack([(n, im.width, im.height) for n, im in images.items()], max_size, padding)
+    out = os.path.join(src_dir, ATLAS_DIR)
+    os.makedirs(out, exist_ok=True)
+    pages = [Image.new("RGBA", size, (0, 0, 0, 0)) for size in sizes]
+    for n, (p, x, y, _, _) in rects.items():
+        pages[p].paste(images[n], (x, y))
+    index = {"version": VERSION, "pages": [], "sprites": rects,
+             "sources": {n: _stamp(os.path.join(src_dir, n)) for n in names}}
+    for i, page in enumerate(pages):
+        fn = f"atlas_{i}.rgba"
+        with open(os.path.join(out, fn + ".tmp"), "wb") as f:
+            f.write(page.tobytes())
+        os.replace(os.path.join(out, fn + ".tmp"), os.path.join(out, fn))
+        index["pages"].append({"file": fn, "size": list(page.size)})
+    with open(os.path.join(out, INDEX + ".tmp"), "w", encoding="utf-8") as f:
+        json.dump(index, f, separators=(",", ":"))
+    os.replace(os.path.join(out, INDEX + ".tmp"), os.path.join(out, INDEX))
+    return index
+
+
+class Atlas:
+    def __init__(self, root, index, src_dir=None):
+        self.root = root
+        self.src_dir = src_dir or os.path.dirname(root)
+        self.sprites = index["sprites"]
+        self.sources = index["sources"]
+        self._pages = index["pages"]
+        self._maps = {}         # page -> mmap
+        self._images = {}       # page -> read-only Image over the mmap
+        self._crops = {}        # name -> Image
+        self._checked = {}      # name -> (checked_at, source unchanged)
+        self._lock = threading.Lock()
+
+    def __contains__(self, name):
+        return name in self.sprites
+
+    def names(self, prefix, ext):
+        """Sorted sprite names starting with `prefix` and ending with `ext`."""
+        return sorted(n for n in self.sprites if n.startswith(prefix) and n.endswith(ext))
+
+    def _page(self, i):
+        img = self._images.get(i)
+        if img is None:
+            with open(os.path.join(self.root, self._pages[i]["file"]), "rb") as f:
+                mm = mmap.mmap(f.fileno(), 0, access=mmap.ACCESS_READ)
+            img = Image.frombuffer("RGBA", tuple(self._pages[i]["size"]), mm, "raw", "RGBA", 0, 1)
+            self._maps[i], self._images[i] = mm, img
+        return img
+
+    def current(self, name):
+        """True if `name` is packed and its PNG is unchanged since the build
+        (the PNG is stat'ed at most every CHECK_INTERVAL seconds)."""
+        if name not in self.sprites:
+            return False
+        now = time.monotonic()
+        hit = self._checked.get(name)
+        if hit is not None and now - hit[0] < CHECK_INTERVAL:
+            return hit[1]
+        ok = _stamp_or_none(os.path.join(self.src_dir, name)) == self.sources.get(name)
+        self._checked[name] = (now, ok)
+        return ok
+
+    def image(self, name):
+        """RGBA image of sprite `name` (shared; copy before drawing on it), or None
+        if it is not packed or its PNG changed since the build."""
+        if not self.current(name):
+            return None
+        img = self._crops.get(name)
+        if img is None:
+            p, x, y, w, h = self.sprites[name]
+            with self._lock:
+                img = self._crops[name] = self._page(p).crop((x, y, x + w, y + h))
+        return img
+
+
+def load_atlas(src_dir):
+    """The Atlas built for `src_dir`, or None if there is none or it is out of date."""
+    root = os.path.join(src_dir, ATLAS_DIR)
+    try:
+        with open(os.path.join(root, INDEX), encoding="utf-8") as f:
+            index = json.load(f)
+    except (OSError, ValueError):
+        return None
+    if index.get("version") != VERSION or sorted(index["sources"]) != _sources(src_dir):
+        return None
+    try:
+        if any(_stamp(os.path.join(src_dir, n)) != s for n, s in index["sources"].items()):
+            return None
+    except OSError:
+        return None
+    return Atlas(root, index, src_dir)
+
+
+_atlases = {}           # src_dir -> (checked_at, (index stamp, dir stamp), Atlas or None)
+_atlases_lock = threading.Lock()
+
+def atlas_for(src_dir):
+    """The shared, validated Atlas for `src_dir` (None when it needs building)."""
+    src_dir = os.path.abspath(src_dir)
+    now = time.monotonic()
+    with _atlases_lock:
+        hit = _atlases.get(src_dir)
+        if hit and now - hit[0] < CHECK_INTERVAL:
+            return hit[2]
+        state = (_stamp_or_none(os.path.join(src_dir, ATLAS_DIR, INDEX)), _stamp_or_none(src_dir))
+        atlas = hit[2] if hit and hit[1] == state else load_atlas(src_dir)
+        _atlases[src_dir] = (now, state, atlas)
+        return atlas
+
+
+def main(argv=None):
+    here = os.path.dirname(os.path.dirname(os.path.abspath(__file__)))
+    ap = argparse.ArgumentParser(description="pack layer PNGs into atlas pages")
+    ap.add_argument("src", nargs="?", default=os.path.join(here, "assets"))
+    ap.add_argument("--max-size", type=int, default=2048)
+    ap.add_argument("--padding", type=int, default=1)
+    args = ap.parse_args(argv)
+    if not _sources(args.src):
+        sys.exit(f"no PNGs in {args.src}")
+    index = build_atlas(args.src, args.max_size, args.padding)
+    pages = ", ".join("x".join(map(str, p["size"])) for p in index["pages"])
+    print(f"{len(index['sprites'])} sprites -> {len(index['pages'])} page(s) ({pages}) in {os.path.join(args.src, ATLAS_DIR)}")
+
+
+if __name__ == "__main__":
+    main()
@@ -1,16 +1,28 @@
-import os, sqlite3, time, random
+import os, sqlite3, time, random, threading
+from bisect import bisect_left
+from itertools import accumulate
 from pathlib import Path
 from typing import Optional, Dict, List
+from .dbprofiles import apply_profile
+from .assets import index_for
+from .economy import Wallet
 
 DB_PATH = os.environ.get("STUDYSAGA_DB", "studysaga.sqlite3")
 GACHA_COST = 50
 TEN_ROLL_COST = 480
 
 SLOTS = ["hair","top","bottom","shoes","accessory"]
+STARTING_CRYSTALS = 300
+# economy.crystals; every change is logged to economy_ledger (see economy.py).
+# Its own ledger table: db.py's users.crystals logs to crystal_ledger.
+WALLET = Wallet("economy", "user_id", ledger="economy_ledger")
 RARITY_WEIGHTS = [("Common",70), ("Rare",20), ("Epic",8), ("Legendary",2)]
+_RARITY_NAMES = [n for n,_ in RARITY_WEIGHTS]
+_RARITY_CUM = list(accumulate(w for _,w in RARITY_WEIGHTS))
 
 def _get_conn():
-    return sqlite3.connect(DB_PATH, timeout=10, isolation_level=None)
+    con = sqlite3.connect(DB_PATH, timeout=10, isolation_level=None)
+    return apply_profile(con)
 
 def bootstrap():
     con = _get_conn(); cur = con.cursor()
@@ -48,6 +60,7 @@ def bootstrap():
         gender TEXT DEFAULT 'male',
         nickname TEXT DEFAULT ''
     )""")
+    WALLET.create(cur)
     con.commit(); con.close()
 
 def cleanup_expired_sessions(max_days=30):
@@ -64,28 +77,52 @@ def get_user_id_by_token(token: str) -> Optional[int]:
     return row[0] if row else None
 
 # economy
+def _open_account(cur, user_id):
+    """Create the user's economy row, crediting the starting crystals through the ledger."""
+    cur.execute("INSERT OR IGNORE INTO economy(user_id, crystals) VALUES(?, 0)", (user_id,))
+    if cur.rowcount == 1:
+        WALLET.adjust(cur, user_id, STARTING_CRYSTALS, "signup")
+
 def get_crystals(user_id: int) -> int:
     con = _get_conn(); cur = con.cursor()
-    cur.execute("INSERT OR IGNORE INTO economy(user_id, crystals) VALUES(?, 300)", (user_id,))
-    con.commit()
     cur.execute("SELECT crystals FROM economy WHERE user_id=?", (user_id,))
     row = cur.fetchone(); con.close()
-    return row[0] if row else 0
+    if row:
+        return row[0]
+    def go(cur):
+        _open_account(cur, user_id)
+        return WALLET.balance(cur, user_id)
+    return _write(go)
+
+def _write(fn):
+    """Run fn(cur) in one BEGIN IMMEDIATE transaction on a fresh connection."""
+    con = _get_conn(); cur = con.cursor()
+    try:
+        cur.execute("BEGIN IMMEDIATE")
+        out = fn(cur)
+        cur.execute("COMMIT")
+        return out
+    except Exception:
+        if con.in_transaction: cur.execute("ROLLBACK")
+        raise
+    finally:
+        con.close()
+
+def _debit(cur, user_id, amount, reason, ref=None):
+    _open_account(cur, user_id)
+    return WALLET.debit(cur, user_id, amount, reason, ref)
 
 def set_crystals(user_id: int, amount: int):
-    con = _get_conn(); cur = con.cursor()
-    cur.execute("INSERT OR REPLACE INTO economy(user_id, crystals) VALUES(?,?)", (user_id, amount))
-    con.commit(); con.close()
+    def go(cur):
+        _open_account(cur, user_id)
+        WALLET.set(cur, user_id, amount, "set")
+    _write(go)
 
-def spend(user_id: int, amount: int):
-    con = _get_conn(); cur = con.cursor()
-    cur.execute("INSERT OR IGNORE INTO economy(user_id, crystals) VALUES(?, 300)", (user_id,))
-    cur.execute("SELECT crystals FROM economy WHERE user_id=?", (user_id,))
-    have = (cur.fetchone() or [0])[0]
-    if have < amount: con.close(); return False, have
-    cur.execute("UPDATE economy SET crystals = crystals - ? WHERE user_id=?", (amount, user_id))
-    con.commit(); cur.execute("SELECT crystals FROM economy WHERE user_id=?", (user_id,)); left = (cur.fetchone() or [0])[0]
-    con.close(); return True, left
+def spend(user_id: int, amount: int, reason: str = "spend"):
+    def go(cur):
+        left = _debit(cur, user_id, amount, reason)
+        return (True, left) if left is not None else (False, WALLET.balance(cur, user_id))
+    return _write(go)
 
 # profile
 def set_gender(user_id: int, gender: str):
@@ -111,13 +148,26 @@ def get_profile(user_id: int):
     return (row[0], row[1] or "") if row else ("male","")
 
 # inventory
+def _assets():
+    return index_for(Path(__file__).resolve().parent.parent / "assets")
+
 def default_items() -> Dict[str, List[str]]:
-    base = Path(__file__).resolve().parent.parent / "assets"
-    out = {s: [] for s in SLOTS}
-    for s in SLOTS:
-        for p in sorted(base.glob(f"{s}_*.png")):
-            out[s].append(p.name)
-    return out
+    assets = _assets()
+    return {s: assets.names(f"{s}_", ".png") for s in SLOTS}
+
+# (asset index generation, slot list, slot -> items); rebuilt when the assets directory changes
+_pool = (None, None, None)
+_pool_lock = threading.Lock()
+
+def item_pool():
+    """Cached (slots, slot -> items) of default_items()."""
+    global _pool
+    gen = _assets().version()
+    with _pool_lock:
+        if _pool[0] != gen:
+            items = default_items()
+            _pool = (gen, list(items.keys()), items)
+        return _pool[1], _pool[2]
 
 def add_item(user_id: int, slot: str, item: str, rarity: str):
     con = _get_conn(); cur = con.cursor()
@@ -154,27 +204,35 @@ def _weighted_choice(pairs):
         up += w
     return pairs[-1][0]
 
+def _roll_rarity():
+    # _weighted_choice(RARITY_WEIGHTS) over the precomputed cumulative weights
+    i = bisect_left(_RARITY_CUM, random.uniform(0, _RARITY_CUM[-1]))
+    return _RARITY_NAMES[min(i, len(_RARITY_NAMES)-1)]
+
+def _roll(user_id: int, n: int, items, cost: int):
+    """Debit `cost` and grant `n` random items in one transaction; returns (ok, [(slot,item,rarity)], crystals)."""
+    if items:
+        slots = list(items.keys())
+    else:
+        slots, items = item_pool()
+    results = []
+    for _ in range(n):
+        rarity = _roll_rarity()
+        slot = random.choice(slots)
+        results.append((slot, random.choice(items[slot]), rarity))
+    now = int(time.time())
+    def go(cur):
+        left = _debit(cur, user_id, cost, "gacha", f"roll x{n}")
+        if left is None:
+            return False, [], WALLET.balance(cur, user_id)
+        cur.executemany("INSERT INTO inventory(user_id, slot, item, rarity, created_at) VALUES (?,?,?,?,?)",
+                        [(user_id, slot, item, rarity, now) for slot, item, rarity in results])
+        return True, results, left
+    return _write(go)
+
 def roll_once(user_id: int, items=None, cost=None):
-    items = items or default_items()
-    cost = GACHA_COST if cost is None else cost
-    ok, crystals = spend(user_id, cost)
-    if not ok: return False, None, crystals
-    rarity = _weighted_choice(RARITY_WEIGHTS)
-    slot = random.choice(list(items.keys()))
-    item = random.choice(items[slot])
-    add_item(user_id, slot, item, rarity)
-    return True, (slot, item, rarity), crystals
+    ok, results, crystals = _roll(user_id, 1, items, GACHA_COST if cost is None else cost)
+    return ok, (results[0] if ok else None), crystals
 
 def roll_ten(user_id: int, items=None, cost=None):
-    items = items or default_items()
-    cost = TEN_ROLL_COST if cost is None else cost
-    ok, crystals = spend(user_id, cost)
-    if not ok: return False, [], crystals
-    results=[]
-    for _ in range(10):
-        rarity = _weighted_choice(RARITY_WEIGHTS)
-        slot = random.choice(list(items.keys()))
-        item = random.choice(items[slot])
-        add_item(user_id, slot, item, rarity)
-        results.append((slot,item,rarity))
-    return True, results, get_crystals(user_id)
+    return _roll(user_id, 10, items, TEN_ROLL_COST if cost is None else cost)
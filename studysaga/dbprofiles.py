@@ -0,0 +1,55 @@
+"""Connection-time SQLite settings shared by db.py and studysaga.db.
+
+Both stores open connections with SQLite's defaults otherwise: a rollback
+journal (readers block the writer), synchronous=FULL and a tiny page cache.
+A profile is a named set of PRAGMAs applied right after connecting.
+"""
+import os
+
+PROFILES = {
+    # Phones/tablets: WAL so the UI can read while a session is being saved,
+    # but keep every commit durable and the memory footprint small.
+    "mobile-safe": {
+        "busy_timeout": 10000,      # ms; the 10 s sqlite3.connect(timeout=10) used before profiles
+        "journal_mode": "WAL",
+        "synchronous": "FULL",
+        "cache_size": -2000,        # KiB
+        "mmap_size": 0,
+        "temp_store": "DEFAULT",
+    },
+    # Desktop/server: trade the last few commits on power loss for throughput.
+    "server-throughput": {
+        "busy_timeout": 10000,
+        "journal_mode": "WAL",
+        "synchronous": "NORMAL",
+        "cache_size": -65536,       # KiB
+        "mmap_size": 256 * 1024 * 1024,
+        "temp_store": "MEMORY",
+    },
+}
+
+DEFAULT_PROFILE = os.environ.get("STUDYSAGA_DB_PROFILE", "mobile-safe")
+
+# busy_timeout goes first so a journal_mode switch can wait for other connections.
+_ORDER = ("busy_timeout", "journal_mode", "synchronous", "cache_size", "mmap_size", "temp_store")
+
+
+def resolve_profile(profile=None):
+    """Return the PRAGMA dict for a profile name, a dict, or None (the default)."""
+    if profile is None:
+        profile = DEFAULT_PROFILE
+    if isinstance(profile, dict):
+        return profile
+    try:
+        return PROFILES[profile]
+    except KeyError:
+        raise ValueError(f"unknown database profile {profile!r}; choose from {sorted(PROFILES)}")
+
+
+def apply_profile(con, profile=None):
+    """Apply a profile's PRAGMAs to a freshly opened connection."""
+    settings = resolve_profile(profile)
+    for key in _ORDER:
+        if key in settings:
+            con.execute(f"PRAGMA {key}={settings[key]}")
+    return con
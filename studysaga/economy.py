@@ -0,0 +1,129 @@
+"""Crystal balances: single-statement conditional debits and an append-only ledger.
+
+Both stores keep a balance column (users.crystals in db.py, economy.crystals
+in studysaga.db). A Wallet names that table and its key column. Every change
+is one UPDATE ... RETURNING on the caller's cursor (a debit only matches while
+the balance covers it, so concurrent spenders can neither overdraw nor lose
+each other's updates) followed by a crystal_ledger row with the delta, the
+resulting balance, a reason and an optional reference, all in the caller's
+transaction. Accounts start at 0 and get their starting balance as a ledger
+credit; create() gives balances from before the ledger an "opening" row.
+Triggers reject UPDATE/DELETE on the ledger; audit() checks that each
+account's rows chain and end at its live balance.
+"""
+import time
+
+LEDGER_DDL = [
+    """CREATE TABLE IF NOT EXISTS {ledger}(
+        id INTEGER PRIMARY KEY AUTOINCREMENT,
+        user_id INTEGER NOT NULL,
+        delta INTEGER NOT NULL,
+        balance INTEGER NOT NULL,
+        reason TEXT NOT NULL,
+        ref TEXT,
+        created_at INTEGER NOT NULL
+    )""",
+    "CREATE INDEX IF NOT EXISTS ix_{ledger}_user ON {ledger}(user_id, id)",
+    """CREATE TRIGGER IF NOT EXISTS {ledger}_no_update BEFORE UPDATE ON {ledger}
+       BEGIN SELECT RAISE(ABORT, '{ledger} is append-only'); END""",
+    """CREATE TRIGGER IF NOT EXISTS {ledger}_no_delete BEFORE DELETE ON {ledger}
+       BEGIN SELECT RAISE(ABORT, '{ledger} is append-only'); END""",
+]
+
+
+class Wallet:
+    def __init__(self, table, key, column="crystals", ledger="crystal_ledger"):
+        self.table, self.key, self.column, self.ledger = table, key, column, ledger
+        t, k, c = table, key, column
+        self._debit = f"UPDATE {t} SET {c}={c}-? WHERE {k}=? AND {c}>=? RETURNING {c}"
+        self._adjust = f"UPDATE {t} SET {c}={c}+? WHERE {k}=? RETURNING {c}"
+        self._set = f"UPDATE {t} SET {c}=? WHERE {k}=? RETURNING {c}"
+        self._get = f"SELECT {c} FROM {t} WHERE {k}=?"
+        self._log = (f"INSERT INTO {ledger}(user_id, delta, balance, reason, ref, created_at) "
+                     f"VALUES (?,?,?,?,?,?)")
+
+    def create(self, cur):
+        """Create the ledger and log an "opening" row for every account that has none."""
+        for ddl in LEDGER_DDL:
+            cur.execute(ddl.format(ledger=self.ledger))
+        t, k, c, l = self.table, self.key, self.column, self.ledger
+        cur.execute(f"""INSERT INTO {l}(user_id, delta, balance, reason, ref, created_at)
+                        SELECT {k}, {c}, {c}, 'opening', NULL, ? FROM {t}
+                        WHERE {c} IS NOT NULL AND NOT EXISTS (SELECT 1 FROM {l} WHERE user_id={t}.{k})""",
+                    (int(time.time()),))
+
+    def _record(self, cur, uid, delta, balance, reason, ref, now):
+        cur.execute(self._log, (uid, delta, balance, reason, None if ref is None else str(ref),
+                                int(time.time()) if now is None else now))
+
+    def balance(self, cur, uid):
+        cur.execute(self._get, (uid,))
+        row = cur.fetchone()
+        return row[0] if row else 0
+
+    def debit(self, cur, uid, amount, reason, ref=None, now=None):
+        """Take `amount` if the balance covers it; returns the new balance, or None (nothing changed)."""
+        if amount < 0:
+            raise ValueError("debit amount must be >= 0")
+        cur.execute(self._debit, (amount, uid, amount))
+        row = cur.fetchone()
+        if row is None:
+            return None
+        self._record(cur, uid, -amount, row[0], reason, ref, now)
+        return row[0]
+
+    def adjust(self, cur, uid, delta, reason, ref=None, now=None):
+        """Add `delta` (may be negative, unchecked); returns the new balance, or None for an unknown user."""
+        cur.execute(self._adjust, (delta, uid))
+        row = cur.fetchone()
+        if row is None:
+            return None
+        self._record(cur, uid, delta, row[0], reason, ref, now)
+        return row[0]
+
+    def credit(self, cur, uid, amount, reason, ref=None, now=None):
+        if amount < 0:
+            raise ValueError("credit amount must be >= 0")
+        return self.adjust(cur, uid, amount, reason, ref, now)
+
+    def set(self, cur, uid, value, reason, ref=None, now=None):
+        """Overwrite the balance (run inside a write transaction so the delta is exact)."""
+        old = self.balance(cur, uid)
+        cur.execute(self._set, (value, uid))
+        row = cur.fetchone()
+        if row is None:
+            return None
+        self._record(cur, uid, row[0] - old, row[0], reason, ref, now)
+        return row[0]
+
+    def history(self, cur, uid, limit=50):
+        cur.execute(f"SELECT id, delta, balance, reason, ref, created_at FROM {self.ledger} "
+                    f"WHERE user_id=? ORDER BY id DESC LIMIT ?", (uid, limit))
+        return [tuple(r) for r in cur.fetchall()]
+
+    def audit(self, cur, uid=None):
+        """Problems found in the ledger (empty if consistent): rows that do not
+        chain from the previous balance, accounts whose last row differs from
+        the live balance, and non-zero balances with no ledger rows at all."""
+        where = "WHERE user_id=?" if uid is not None else ""
+        args = (uid,) if uid is not None else ()
+        problems = []
+        cur.execute(f"""SELECT t.{self.key}, t.{self.column} FROM {self.table} t
+                        WHERE t.{self.column} != 0 {f"AND t.{self.key}=?" if uid is not None else ""}
+                          AND NOT EXISTS (SELECT 1 FROM {self.ledger} l WHERE l.user_id=t.{self.key})""", args)
+        for u, live in cur.fetchall():
+            problems.append(f"user {u}: balance {live} has no ledger rows")
+        cur.execute(f"""SELECT user_id, id, delta, balance, prev FROM (
+                            SELECT user_id, id, delta, balance,
+                                   LAG(balance) OVER (PARTITION BY user_id ORDER BY id) AS prev
+                            FROM {self.ledger} {where})
+                        WHERE prev IS NOT NULL AND prev + delta != balance""", args)
+        for u, i, d, b, p in cur.fetchall():
+            problems.append(f"user {u}: ledger row {i} goes {p} {d:+d} -> {b}")
+        cur.execute(f"""SELECT l.user_id, l.balance, t.{self.column} FROM {self.ledger} l
+                        JOIN {self.table} t ON t.{self.key}=l.user_id
+                        WHERE l.id IN (SELECT MAX(id) FROM {self.ledger} {where} GROUP BY user_id)
+                          AND l.balance != t.{self.column}""", args)
+        for u, b, live in cur.fetchall():
+            problems.append(f"user {u}: ledger ends at {b}, balance is {live}")
+        return problems
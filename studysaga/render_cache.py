@@ -0,0 +1,242 @@
+"""Content-addressed cache of rendered avatars and of the layer images they use.
+
+render_key() hashes a canonical JSON of whatever decides an avatar's pixels
+(renderer, gender, loadout, colours, scale and the stamps of the source
+files), so equal looks share one entry no matter how the caller spelled
+them. RenderCache keeps recent renders in an in-memory LRU and writes every
+render to a disk tier (PNG, or lossless WebP) under the user's cache
+directory that is trimmed back under a byte budget, least recently used
+first. LayerCache memoizes opened layer PNGs by path and re-opens a file
+only when its mtime or size changes.
+Images handed out are copies; the cached ones are never mutated.
+"""
+import os, sys, json, hashlib, threading
+from collections import OrderedDict
+
+from PIL import Image
+
+KEY_VERSION = 1
+
+
+def user_cache_dir(app="studysaga"):
+    """Per-user cache directory for `app` (the install directory may be read-only)."""
+    if sys.platform == "win32":
+        base = os.environ.get("LOCALAPPDATA") or os.path.expanduser(r"~\AppData\Local")
+    elif sys.platform == "darwin":
+        base = os.path.expanduser("~/Library/Caches")
+    else:
+        base = os.environ.get("XDG_CACHE_HOME") or os.path.expanduser("~/.cache")
+    return os.path.join(base, app)
+
+
+DEFAULT_DIR = os.environ.get("STUDYSAGA_RENDER_CACHE") or os.path.join(user_cache_dir(), "renders")
+
+
+def file_stamp(path):
+    """(mtime_ns, size) of `path`, or None if it does not exist."""
+    try:
+        st = os.stat(path)
+    except OSError:
+        return None
+    return (st.st_mtime_ns, st.st_size)
+
+
+def _canon(v):
+    if isinstance(v, str):
+        v = v.strip()
+        return v.lower() if v.startswith("#") else v
+    if isinstance(v, dict):
+        return {str(k): _canon(x) for k, x in v.items()}
+    if isinstance(v, (list, tuple)):
+        return [_canon(x) for x in v]
+    return v
+
+
+def render_key(**parts):
+    """Stable hex digest of `parts` (colours are case-folded, dict order ignored)."""
+    blob = json.dumps(_canon(dict(parts, v=KEY_VERSION)), sort_keys=True, separators=(",", ":"), default=str)
+    return hashlib.sha256(blob.encode()).hexdigest()[:40]
+
+
+def _nbytes(img):
+    return img.width * img.height * len(img.getbands())
+
+
+class LayerCache:
+    def __init__(self, max_entries=256):
+        self.max_entries = max_entries
+        self._entries = OrderedDict()       # path -> (stamp, RGBA image)
+        self._lock = threading.Lock()
+
+    def open(self, path):
+        """RGBA image of `path`, opened once per file version (read-only; copy before drawing)."""
+        path = os.fspath(path)
+        stamp = file_stamp(path)
+        if stamp is None:
+            raise FileNotFoundError(path)
+        with self._lock:
+            hit = self._entries.get(path)
+            if hit and hit[0] == stamp:
+                self._entries.move_to_end(path)
+                return hit[1]
+        with Image.open(path) as im:
+            img = im.convert("RGBA")
+        with self._lock:
+            self._entries[path] = (stamp, img)
+            self._entries.move_to_end(path)
+            while len(self._entries) > self.max_entries:
+                self._entries.popitem(last=False)
+        return img
+
+    def clear(self):
+        with self._lock:
+            self._entries.clear()
+
+
+class RenderCache:
+    def __init__(self, root=DEFAULT_DIR, memory_bytes=32 * 1024 * 1024, disk_bytes=64 * 1024 * 1024, fmt="PNG"):
+        self.root = root
+        self.memory_bytes = memory_bytes
+        self.disk_bytes = disk_bytes
+        self.fmt = fmt.upper()
+        self.ext = ".webp" if self.fmt == "WEBP" else ".png"
+        self._mem = OrderedDict()           # key -> (image, nbytes)
+        self._mem_used = 0
+        self._disk = None                   # file name -> size, least recently used first; filled on first disk access
+        self._disk_used = 0
+        self._lock = threading.Lock()
+        self.hits = self.disk_hits = self.misses = self.evictions = 0
+
+    # memory tier
+    def _remember(self, key, img):
+        n = _nbytes(img)
+        old = self._mem.pop(key, None)
+        if old:
+            self._mem_used -= old[1]
+        self._mem[key] = (img, n)
+        self._mem_used += n
+        while self._mem_used > self.memory_bytes and len(self._mem) > 1:
+            _, (_, m) = self._mem.popitem(last=False)
+            self._mem_used -= m
+
+    # disk tier
+    def _path(self, key):
+        return os.path.join(self.root, key + self.ext)
+
+    def _disk_index(self):
+        # under self._lock
+        if self._disk is None:
+            found = []
+            try:
+                for e in os.scandir(self.root):
+                    if e.name.endswith(self.ext):
+                        st = e.stat()
+                        found.append((st.st_mtime_ns, e.name, st.st_size))
+            except OSError:
+                pass
+            self._disk = OrderedDict((name, size) for _, name, size in sorted(found))
+            self._disk_used = sum(self._disk.values())
+        return self._disk
+
+    def _touch(self, name, size=None):
+        # mark `name` most recently used (and record its new size); under self._lock
+        disk = self._disk_index()
+        if size is not None:
+            self._disk_used += size - disk.get(name, 0)
+            disk[name] = size
+        if name in disk:
+            disk.move_to_end(name)
+
+    def _write(self, key, img):
+        path = self._path(key)
+        tmp = f"{path}.{os.getpid()}.{threading.get_ident()}.tmp"
+        try:
+            os.makedirs(self.root, exist_ok=True)
+            opts = {"lossless": True} if self.fmt == "WEBP" else {}
+            img.save(tmp, self.fmt, **opts)
+            os.replace(tmp, path)
+            size = os.path.getsize(path)
+        except OSError as e:
+            print("render cache write failed:", e)
+            return
+        with self._lock:
+            self._touch(os.path.basename(path), size)
+            self._trim()
+
+    def _trim(self):
+        # drop least recently used files until the running total fits; under self._lock
+        disk = self._disk_index()
+        while self._disk_used > self.disk_bytes and disk:
+            name, size = disk.popitem(last=False)
+            try:
+                os.remove(os.path.join(self.root, name))
+            except OSError:
+                pass
+            self._disk_used -= size
+            self.evictions += 1
+
+    def _read(self, key):
+        path = self._path(key)
+        try:
+            with Image.open(path) as im:
+                img = im.convert("RGBA")
+            os.utime(path)                  # mtime orders the files when the index is rebuilt
+        except (OSError, ValueError):
+            return None
+        return img
+
+    def get(self, key):
+        """Cached render for `key` (a copy), or None."""
+        with self._lock:
+            hit = self._mem.get(key)
+            if hit:
+                self._mem.move_to_end(key)
+                self.hits += 1
+                return hit[0].copy()
+        img = self._read(key)
+        with self._lock:
+            if img is None:
+                self.misses += 1
+                return None
+            self.disk_hits += 1
+            self._touch(key + self.ext)
+            self._remember(key, img)
+        return img.copy()
+
+    def put(self, key, img):
+        img = img.copy()
+        with self._lock:
+            self._remember(key, img)
+        self._write(key, img)
+
+    def get_or_render(self, key, render):
+        img = self.get(key)
+        if img is None:
+            img = render()
+            self.put(key, img)
+        return img
+
+    def clear(self, disk=False):
+        with self._lock:
+            self._mem.clear()
+            self._mem_used = 0
+            if disk:
+                for name in list(self._disk_index()):
+                    try:
+                        os.remove(os.path.join(self.root, name))
+                    except OSError:
+                        pass
+                self._disk = OrderedDict()
+                self._disk_used = 0
+
+    def stats(self):
+        with self._lock:
+            return {"memory_entries": len(self._mem), "memory_bytes": self._mem_used,
+                    "disk_entries": len(self._disk or {}), "disk_bytes": self._disk_used,
+                    "hits": self.hits, "disk_hits": self.disk_hits, "misses": self.misses,
+                    "evictions": self.evictions}
+
+
+# Shared by both sprite renderers.
+LAYERS = LayerCache()
+RENDERS = RenderCache()
@@ -0,0 +1,154 @@
+"""Decode-once texture cache for the background and chest animations.
+
+Image widgets decode an animated GIF into one texture per frame every time
+a new widget or source is set. TextureCache decodes each file once (on the
+calling thread, or ahead of time on a worker thread via preload()),
+uploads the frames on the main thread and hands the same CoreImage to
+every widget that shows that file. Entries are kept in LRU order under a
+byte budget (4 bytes per pixel per frame). An entry some widget is still
+showing keeps its frames alive, so it is never evicted and always counts
+against the budget; the cache can only go over budget by what is on screen.
+Hits, misses, evictions and decode time are counted for stats().
+"""
+import threading, time
+from collections import OrderedDict
+from weakref import WeakKeyDictionary, ref
+
+from kivy.clock import Clock
+from kivy.core.image import Image as CoreImage
+
+
+def _texture_bytes(core):
+    frames = getattr(core.image, "textures", None) or [core.texture]
+    return sum(t.width * t.height * 4 for t in frames if t is not None)
+
+
+class TextureCache:
+    def __init__(self, budget_bytes=96 * 1024 * 1024, anim_delay=0.1):
+        self.budget_bytes = budget_bytes
+        self.anim_delay = anim_delay
+        self._entries = OrderedDict()       # path -> (CoreImage, nbytes)
+        self._bytes = 0
+        self._lock = threading.Lock()
+        self._shown = WeakKeyDictionary()   # Image widget -> (path, CoreImage, on_texture callback)
+        self.hits = self.misses = self.evictions = 0
+        self.decode_seconds = 0.0
+
+    # decoding (any thread) / uploading (main thread)
+    def _decode(self, path):
+        t0 = time.perf_counter()
+        # anim_delay=-1: never start the animation clock from a worker thread
+        core = CoreImage(path, nocache=True, anim_delay=-1)
+        with self._lock:
+            self.decode_seconds += time.perf_counter() - t0
+        return core
+
+    def _store(self, path, core):
+        core.texture                        # uploads the frames (needs the GL context)
+        core.anim_delay = self.anim_delay
+        nbytes = _texture_bytes(core)
+        with self._lock:
+            old = self._entries.pop(path, None)
+            if old:
+                self._bytes -= old[1]
+            self._entries[path] = (core, nbytes)
+            self._bytes += nbytes
+            self._trim(keep=path)
+        return core
+
+    def _trim(self, keep=None):
+        # oldest first, skipping `keep` and whatever is on screen (under self._lock)
+        if self._bytes <= self.budget_bytes:
+            return
+        shown = {p for p, _, _ in list(self._shown.values())}
+        for p in list(self._entries):
+            if self._bytes <= self.budget_bytes:
+                break
+            if p == keep or p in shown:
+                continue
+            _, n = self._entries.pop(p)
+            self._bytes -= n
+            self.evictions += 1
+
+    def get(self, path):
+        """Shared CoreImage for `path` (decoded and uploaded on a miss); None for ""."""
+        if not path:
+            return None
+        with self._lock:
+            hit = self._entries.get(path)
+            if hit:
+                self._entries.move_to_end(path)
+                self.hits += 1
+                return hit[0]
+            self.misses += 1
+        return self._store(path, self._decode(path))
+
+    def preload(self, paths, background=True):
+        """Decode `paths` ahead of use; with background=True the decoding runs on
+        a worker thread and each upload is scheduled on the main thread."""
+        paths = [p for p in dict.fromkeys(paths) if p and p not in self._entries]
+        if not background:
+            for p in paths:
+                self._store(p, self._decode(p))
+            return None
+
+        def work():
+            for p in paths:
+                try:
+                    core = self._decode(p)
+                except Exception as e:
+                    print("texture preload error", p, e)
+                    continue
+                Clock.schedule_once(lambda _dt, p=p, core=core: self._store(p, core))
+        t = threading.Thread(target=work, name="texture-preload", daemon=True)
+        t.start()
+        return t
+
+    def release(self, widget):
+        """Stop feeding frames to `widget` (call before dropping a widget passed to show())."""
+        prev = self._shown.pop(widget, None)
+        if prev:
+            prev[1].unbind(on_texture=prev[2])
+            with self._lock:
+                self._trim()
+
+    def show(self, widget, path):
+        """Point an Image widget at `path` using the shared (animated) texture."""
+        prev = self._shown.get(widget)
+        if prev and prev[0] == path:
+            return
+        self.release(widget)
+        try:
+            core = self.get(path)
+        except Exception as e:          # missing/corrupt file: show nothing, like Image(source=...)
+            print("texture load error", path, e)
+            core = None
+        if core is None:
+            self._shown.pop(widget, None)
+            widget.texture = None
+            return
+        widget.source = ""                  # stop the widget's own loader
+        # Kivy holds bound callbacks strongly: keep only a weakref to the widget
+        # so a dropped widget can be collected, and unbind once it is gone.
+        wref = ref(widget)
+        def on_texture(*_):
+            w = wref()
+            if w is None:
+                core.unbind(on_texture=on_texture)
+            else:
+                w.texture = core.texture
+        core.bind(on_texture=on_texture)
+        on_texture()
+        if core.anim_available:
+            core.anim_reset(True)
+        self._shown[widget] = (path, core, on_texture)
+
+    def stats(self):
+        with self._lock:
+            return {"entries": len(self._entries), "bytes": self._bytes, "budget_bytes": self.budget_bytes,
+                    "hits": self.hits, "misses": self.misses, "evictions": self.evictions,
+                    "decode_ms": round(self.decode_seconds * 1000, 1)}
+
+
+# Shared by every screen.
+TEXTURES = TextureCache()